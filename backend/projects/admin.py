@@ -1,4 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import F
+from simulations.models import PricingTier
 from .models import SolarProject, ProjectImage, ProjectVideo
 
 
@@ -14,6 +16,13 @@ class ProjectVideoInline(admin.TabularInline):
     fields = ['title', 'video', 'video_url', 'description', 'order']
 
 
+class PricingTierInline(admin.TabularInline):
+    model = PricingTier
+    extra = 0
+    fields = ['min_panels', 'price_per_panel_usd']
+    verbose_name_plural = 'Tramos de Precio por Panel (vacío = precio por defecto)'
+
+
 @admin.register(SolarProject)
 class SolarProjectAdmin(admin.ModelAdmin):
     list_display = [
@@ -54,11 +63,34 @@ class SolarProjectAdmin(admin.ModelAdmin):
         })
     ]
     
-    inlines = [ProjectImageInline, ProjectVideoInline]
+    inlines = [ProjectImageInline, ProjectVideoInline, PricingTierInline]
     
     def funding_percentage(self, obj):
         return f"{obj.funding_percentage:.1f}%"
     funding_percentage.short_description = 'Financiamiento (%)'
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        
+        # Capacity reservations move available_power while the form is open:
+        # the other fields are saved as edited and an edit of it as a delta
+        obj.save(update_fields=[
+            field.name for field in obj._meta.concrete_fields
+            if not field.primary_key and field.name != 'available_power'
+        ])
+        if 'available_power' in form.changed_data:
+            delta = obj.available_power - form.initial['available_power']
+            applied = SolarProject.objects.filter(pk=obj.pk, available_power__gte=-delta).update(
+                available_power=F('available_power') + delta
+            )
+            if not applied:
+                self.message_user(
+                    request,
+                    f'No se pudo restar {-delta} kWp: la potencia disponible actual es menor',
+                    messages.WARNING
+                )
+        obj.refresh_from_db(fields=['available_power'])
 
 
 @admin.register(ProjectImage)
@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import InvestmentSimulation, TariffCategory, ExchangeRate, EnergyPrice
+from django.contrib import admin, messages
+from .models import (
+    InvestmentSimulation, InvestmentSimulationHistory, TariffCategory, TariffBlock, ExchangeRate, EnergyPrice,
+    PricingTier, SimulationJob, CapacityReservation, CapacityShard
+)
+from .resimulation import resimulate_simulations
+from .storage import materialize_simulations
 
 
 @admin.register(EnergyPrice)
@@ -14,7 +19,8 @@ class EnergyPriceAdmin(admin.ModelAdmin):
     fieldsets = [
         ('Configuración del Precio', {
             'fields': ['price_ars_per_kwh', 'description', 'effective_date', 'is_active'],
-            'description': 'Configure el precio actual de la energía eléctrica. Solo debe haber un precio activo a la vez.'
+            'description': 'Rige el precio activo con la fecha de vigencia más reciente que no sea futura. '
+                           'Para programar un cambio de precio, cargue uno nuevo con fecha de vigencia futura.'
         }),
         ('Metadatos', {
             'fields': ['created_at', 'updated_at'],
@@ -27,17 +33,49 @@ class EnergyPriceAdmin(admin.ModelAdmin):
         return super().get_queryset(request).order_by('-is_active', '-effective_date')
 
 
+@admin.register(PricingTier)
+class PricingTierAdmin(admin.ModelAdmin):
+    list_display = ['project', 'min_panels', 'price_per_panel_usd', 'updated_at']
+    list_filter = ['project']
+    readonly_fields = ['created_at', 'updated_at']
+    ordering = ['project', 'min_panels']
+    
+    fieldsets = [
+        ('Tramo de Precio', {
+            'fields': ['project', 'min_panels', 'price_per_panel_usd'],
+            'description': 'Los tramos sin proyecto son el precio por defecto. '
+                           'Si un proyecto tiene tramos propios, se usan solo esos.'
+        }),
+        ('Metadatos', {
+            'fields': ['created_at', 'updated_at'],
+            'classes': ['collapse']
+        })
+    ]
+
+
+class TariffBlockInline(admin.TabularInline):
+    model = TariffBlock
+    extra = 0
+    fields = ['from_kwh', 'price_ars_per_kwh']
+    verbose_name_plural = 'Bloques de Consumo (vacío = precio de energía único)'
+
+
 @admin.register(TariffCategory)
 class TariffCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'code', 'description', 'created_at']
+    list_display = ['name', 'code', 'description', 'fixed_charge_ars', 'tax_percentage', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'code', 'description']
     readonly_fields = ['created_at', 'updated_at']
+    inlines = [TariffBlockInline]
     
     fieldsets = [
         ('Información Básica', {
             'fields': ['name', 'code', 'description']
         }),
+        ('Cuadro Tarifario', {
+            'fields': ['fixed_charge_ars', 'tax_percentage'],
+            'description': 'El cargo fijo y los impuestos se aplican solo si la categoría tiene bloques de consumo.'
+        }),
         ('Metadatos', {
             'fields': ['created_at', 'updated_at'],
             'classes': ['collapse']
@@ -54,6 +92,17 @@ class ExchangeRateAdmin(admin.ModelAdmin):
     ordering = ['-date']
 
 
+class InvestmentSimulationHistoryInline(admin.TabularInline):
+    model = InvestmentSimulationHistory
+    extra = 0
+    fields = ['created_at', 'pricing_version', 'values']
+    readonly_fields = fields
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(InvestmentSimulation)
 class InvestmentSimulationAdmin(admin.ModelAdmin):
     list_display = [
@@ -66,8 +115,11 @@ class InvestmentSimulationAdmin(admin.ModelAdmin):
         'id', 'total_investment_usd', 'total_investment_ars',
         'installed_power_kw', 'annual_generation_kwh', 'monthly_generation_kwh',
         'monthly_savings_ars', 'annual_savings_ars', 'payback_period_years',
-        'bill_coverage_achieved', 'roi_annual', 'exchange_rate_used', 'created_at'
+        'bill_coverage_achieved', 'roi_annual', 'exchange_rate_used', 'created_at',
+        'snapshot', 'engine_version'
     ]
+    inlines = [InvestmentSimulationHistoryInline]
+    actions = ['resimulate_selected', 'materialize_selected']
     
     fieldsets = [
         ('Información del Usuario', {
@@ -90,6 +142,11 @@ class InvestmentSimulationAdmin(admin.ModelAdmin):
                 'bill_coverage_achieved', 'roi_annual', 'exchange_rate_used'
             ],
             'classes': ['collapse']
+        }),
+        ('Almacenamiento', {
+            'fields': ['snapshot', 'engine_version'],
+            'description': 'Las simulaciones compactas calculan sus resultados a partir del snapshot de precios.',
+            'classes': ['collapse']
         })
     ]
     
@@ -99,4 +156,66 @@ class InvestmentSimulationAdmin(admin.ModelAdmin):
     
     def has_change_permission(self, request, obj=None):
         # Make simulations read-only in admin
-        return False
\ No newline at end of file
+        return False
+    
+    @admin.action(description='Recalcular con los precios actuales')
+    def resimulate_selected(self, request, queryset):
+        totals = resimulate_simulations(queryset)
+        self.message_user(
+            request,
+            f"{totals['processed']} simulaciones recalculadas, {totals['updated']} con resultados nuevos "
+            f"(los anteriores quedan en el historial)",
+            messages.SUCCESS
+        )
+        if totals['stale']:
+            self.message_user(
+                request,
+                f"{totals['stale']} simulaciones compactas de otra versión del motor quedaron sin recalcular",
+                messages.WARNING
+            )
+    
+    @admin.action(description='Guardar los resultados en la fila (simulaciones compactas)')
+    def materialize_selected(self, request, queryset):
+        materialized = materialize_simulations(queryset)
+        self.message_user(request, f"{materialized} simulaciones compactas materializadas", messages.SUCCESS)
+
+
+@admin.register(SimulationJob)
+class SimulationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'processed', 'total', 'user', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['id', 'user__email']
+    readonly_fields = [
+        'id', 'kind', 'status', 'user', 'params', 'summary', 'total', 'processed', 'error',
+        'created_at', 'started_at', 'finished_at', 'heartbeat_at', 'claim_token'
+    ]
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CapacityReservation)
+class CapacityReservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'project', 'user', 'power_kw', 'status', 'expires_at', 'created_at']
+    list_filter = ['status', 'project', 'created_at']
+    search_fields = ['id', 'user__email', 'project__name']
+    readonly_fields = [
+        'id', 'project', 'user', 'simulation', 'power_kw', 'shard_index', 'status',
+        'expires_at', 'created_at', 'closed_at'
+    ]
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(CapacityShard)
+class CapacityShardAdmin(admin.ModelAdmin):
+    list_display = ['project', 'index', 'available_kw', 'updated_at']
+    list_filter = ['project']
+    readonly_fields = ['project', 'index', 'available_kw', 'updated_at']
+    ordering = ['project', 'index']
+    
+    def has_add_permission(self, request):
+        return False
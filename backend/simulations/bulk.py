@@ -0,0 +1,164 @@
+"""
+Bulk simulation of customer lists
+
+bulk_simulate() takes rows (bill, tariff category and one simulation input)
+read lazily from an NDJSON or CSV line stream, validates them and simulates
+them in chunks of BULK_CHUNK_SIZE rows, with one simulate_batch call per
+tariff category and simulation type. It yields one result per input row, in
+input order, so the caller can stream them out while memory stays bounded by
+the chunk size, whatever the size of the input.
+"""
+
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+from rest_framework.utils.encoders import JSONEncoder
+
+from projects.models import SolarProject
+
+from .models import TariffCategory
+from .pricing import PricingSnapshot, get_current_pricing
+from .results import SimulationResult
+from .serializers import BulkSimulationRowSerializer, SimulationResultSerializer
+from .simulation_engine import SIMULATION_INPUT_FIELDS, SolarInvestmentCalculator, quantize_batch_results
+
+
+BULK_CHUNK_SIZE = 1000
+
+# (line number, row or None, parse error or None)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def iter_ndjson_rows(lines: Iterable[bytes]) -> Iterator[ParsedRow]:
+    """One JSON object per line; blank lines are skipped"""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'JSON inválido'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Cada línea debe ser un objeto JSON'
+            continue
+        yield line_number, row, None
+
+
+def iter_csv_rows(lines: Iterable[bytes]) -> Iterator[ParsedRow]:
+    """CSV with a header row; empty cells count as missing values"""
+    reader = csv.DictReader(line.decode('utf-8-sig', errors='replace') for line in lines)
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in (None, '')}, None
+
+
+class BulkSimulator:
+    """Simulates chunks of rows for one project against one pricing snapshot"""
+
+    def __init__(
+        self,
+        project: SolarProject,
+        tariff_categories: Iterable[TariffCategory],
+        pricing: Optional[PricingSnapshot] = None
+    ):
+        self.project = project
+        self.pricing = pricing if pricing is not None else get_current_pricing()
+        # Rows may name a tariff category by code or by id
+        self.tariff_categories = {}
+        for tariff_category in tariff_categories:
+            self.tariff_categories[tariff_category.code] = tariff_category
+            self.tariff_categories[str(tariff_category.pk)] = tariff_category
+        self._calculators = {}
+
+    def _calculator(self, tariff_category: TariffCategory) -> SolarInvestmentCalculator:
+        calculator = self._calculators.get(tariff_category.pk)
+        if calculator is None:
+            calculator = self._calculators[tariff_category.pk] = SolarInvestmentCalculator(
+                self.project, tariff_category, pricing=self.pricing
+            )
+        return calculator
+
+    def simulate_chunk(self, rows: List[ParsedRow]) -> List[Dict[str, Any]]:
+        outputs: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+        groups = {}
+        # One serializer validates the whole chunk: building its fields costs more than validating a row
+        serializer = BulkSimulationRowSerializer()
+
+        for index, (line_number, row, error) in enumerate(rows):
+            ref = row.get('ref') if row is not None else None
+            if error is None:
+                try:
+                    data = serializer.run_validation(row)
+                except ValidationError as exc:
+                    error = as_serializer_error(exc)
+                else:
+                    tariff_category = self.tariff_categories.get(data['tariff_category'])
+                    if tariff_category is None:
+                        error = f"Categoría tarifaria no encontrada: {data['tariff_category']}"
+                    else:
+                        simulation_type, input_field = next(
+                            (simulation_type, input_field)
+                            for simulation_type, input_field in SIMULATION_INPUT_FIELDS.items()
+                            if data.get(input_field) is not None
+                        )
+                        groups.setdefault((tariff_category, simulation_type), []).append(
+                            (index, float(data['monthly_bill_ars']), float(data[input_field]))
+                        )
+            if error is not None:
+                outputs[index] = {
+                    'line': line_number,
+                    'ref': ref,
+                    'error' if isinstance(error, str) else 'errors': error,
+                    'success': False,
+                }
+
+        for (tariff_category, simulation_type), items in groups.items():
+            indexes, bills, parameters = zip(*items)
+            columns = self._calculator(tariff_category).simulate_batch(simulation_type, bills, parameters)
+            for index, record in zip(indexes, quantize_batch_results(columns)):
+                line_number, row, _ = rows[index]
+                result = SimulationResult(
+                    project=self.project,
+                    tariff_category=tariff_category,
+                    simulation_type=simulation_type,
+                    **record
+                )
+                outputs[index] = {
+                    'line': line_number,
+                    'ref': row.get('ref'),
+                    'simulation': SimulationResultSerializer.to_representation(result),
+                    'success': True,
+                }
+
+        return outputs
+
+
+def bulk_simulate(
+    simulator: BulkSimulator,
+    rows: Iterable[ParsedRow],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Results of rows, in order, computed chunk_size rows at a time"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from simulator.simulate_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from simulator.simulate_chunk(chunk)
+
+
+def ndjson_chunks(results: Iterable[Dict[str, Any]], chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[str]:
+    """Results encoded as NDJSON, chunk_size lines per yielded string"""
+    lines = []
+    for result in results:
+        lines.append(json.dumps(result, cls=JSONEncoder, ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
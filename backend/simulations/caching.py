@@ -0,0 +1,107 @@
+"""
+Per-process caches kept coherent across workers
+
+A ProcessCache holds a value built by a loader function in process memory.
+Invalidating it stores a new generation token in the PRICING_CACHE_ALIAS
+cache; every worker compares its token against the shared one at most every
+PRICING_CACHE_CHECK_SECONDS and rebuilds its value when it changed.
+
+A value may also carry an expires_at attribute (epoch seconds, or None): it
+is rebuilt as soon as that moment passes, in every worker independently,
+without waiting for an invalidation.
+
+The generation only reaches other processes through a shared backend.
+With a per-process one (locmem, dummy) values are also rebuilt once they are
+PRICING_CACHE_MAX_AGE_SECONDS old, so an invalidation from another worker or
+a management command is seen within that delay.
+"""
+
+import threading
+import time
+import uuid
+from typing import Callable, Generic, Optional, TypeVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+T = TypeVar('T')
+
+
+def generation_cache():
+    """Cache backend holding the generation tokens"""
+    return caches[getattr(settings, 'PRICING_CACHE_ALIAS', 'default')]
+
+
+def cache_is_shared() -> bool:
+    """Whether the generation cache backend is seen by every process"""
+    return not isinstance(generation_cache(), (LocMemCache, DummyCache))
+
+
+class ProcessCache(Generic[T]):
+    """Value loaded once per process and reloaded when the generation changes"""
+
+    def __init__(self, generation_cache_key: str, loader: Callable[[], T]):
+        self.generation_cache_key = generation_cache_key
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._generation: Optional[str] = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+
+    def _shared_generation(self) -> str:
+        cache = generation_cache()
+        generation = cache.get(self.generation_cache_key)
+        if generation is None:
+            cache.add(self.generation_cache_key, uuid.uuid4().hex, timeout=None)
+            generation = cache.get(self.generation_cache_key)
+        return generation
+
+    @staticmethod
+    def _expired(value) -> bool:
+        expires_at = getattr(value, 'expires_at', None)
+        return expires_at is not None and time.time() >= expires_at
+
+    def _outlived(self) -> bool:
+        # Nothing tells this process about invalidations made by the others
+        max_age = getattr(settings, 'PRICING_CACHE_MAX_AGE_SECONDS', 300)
+        return not cache_is_shared() and time.monotonic() - self._loaded_at >= max_age
+
+    def get(self) -> T:
+        check_interval = getattr(settings, 'PRICING_CACHE_CHECK_SECONDS', 5)
+        value = self._value
+        if (
+            value is not None
+            and time.monotonic() - self._checked_at < check_interval
+            and not self._expired(value)
+        ):
+            return value
+
+        with self._lock:
+            generation = self._shared_generation()
+            if (
+                self._value is None
+                or generation != self._generation
+                or self._expired(self._value)
+                or self._outlived()
+            ):
+                self._value = self._loader()
+                self._generation = generation
+                self._loaded_at = time.monotonic()
+            self._checked_at = time.monotonic()
+            return self._value
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._generation = None
+            self._checked_at = 0.0
+            self._loaded_at = 0.0
+
+    def invalidate(self):
+        """Drop the local value and tell every other worker to reload theirs"""
+        generation_cache().set(self.generation_cache_key, uuid.uuid4().hex, timeout=None)
+        self.clear()
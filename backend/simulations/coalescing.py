@@ -0,0 +1,87 @@
+"""
+Single-flight coalescing of identical concurrent computations
+
+SingleFlight.do(key, compute) runs compute once per key at a time: callers
+arriving while it is in flight wait for it and share its result (or its
+exception) instead of running it again. Nothing is kept once the flight
+lands; see result_cache.py for memoization.
+
+do() blocks on a threading.Event and serves WSGI worker threads as well as
+sync views under ASGI. Each waiter raises its own copy of a failed flight's
+exception, chained to the original, so concurrent raises never share one
+traceback. Flights are per process.
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from django.conf import settings
+
+
+def _copy_error(error: Exception) -> Exception:
+    try:
+        return copy.copy(error)
+    except Exception:
+        # Exceptions whose constructor does not take their args cannot be copied
+        return RuntimeError(f'{type(error).__name__}: {error}')
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """In-flight computations by key, shared by every concurrent caller"""
+
+    def __init__(self, wait_timeout: float):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._counters = {'executed': 0, 'coalesced': 0, 'timeouts': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._counters['executed'] += 1
+            else:
+                self._counters['coalesced'] += 1
+
+        if not leader:
+            if flight.done.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise _copy_error(flight.error) from flight.error
+                return flight.result
+            # The leader is stuck: compute independently rather than wait forever
+            self._count('timeouts')
+            return compute()
+
+        try:
+            flight.result = compute()
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._counters, in_flight=len(self._flights))
+
+
+simulation_flights = SingleFlight(wait_timeout=getattr(settings, 'SIMULATION_COALESCING_TIMEOUT', 30))
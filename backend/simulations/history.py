@@ -0,0 +1,103 @@
+"""
+As-of history of exchange rates and energy prices
+
+PriceHistory keeps both tables as date-sorted series in process memory, so
+the value in force on any date is a bisect (or, for many dates at once, a
+single np.searchsorted) instead of a query. It is loaded with two queries
+and reloaded when an ExchangeRate or EnergyPrice is saved or deleted.
+
+The value on a date is the one of the latest record dated on or before it;
+dates before the first record take the default, as EnergyPrice.get_current_price()
+and ExchangeRate.get_latest_rate() do. Withdrawn (inactive) energy prices are
+left out, so the history and the current pricing agree on every date.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from .caching import ProcessCache
+from .models import ENERGY_PRICE_ARS_PER_KWH, EnergyPrice, ExchangeRate
+
+
+PRICE_HISTORY_GENERATION_CACHE_KEY = 'simulations:price_history:generation'
+
+# Same fallback as ExchangeRate.get_latest_rate() on an empty table
+DEFAULT_EXCHANGE_RATE = Decimal('1000')
+
+
+class AsOfSeries:
+    """Values indexed by date, answering "value in force on date" by bisection"""
+
+    __slots__ = ('dates', 'values', 'ordinals', 'value_array', 'default')
+
+    def __init__(self, points: Iterable[Tuple[date, Decimal]], default: Decimal):
+        # On repeated dates the last point wins
+        compiled = dict(sorted(points, key=lambda point: point[0]))
+        self.dates = tuple(compiled)
+        self.values = tuple(Decimal(value) for value in compiled.values())
+        self.ordinals = np.array([day.toordinal() for day in self.dates], dtype=np.int64)
+        self.value_array = np.array([float(value) for value in self.values])
+        self.default = Decimal(default)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def value_at(self, as_of: date) -> Decimal:
+        index = bisect_right(self.dates, as_of) - 1
+        return self.values[index] if index >= 0 else self.default
+
+    def until(self, as_of: date) -> Tuple[Tuple[date, ...], Tuple[Decimal, ...]]:
+        """Dates and values of the points dated on or before as_of"""
+        end = bisect_right(self.dates, as_of)
+        return self.dates[:end], self.values[:end]
+
+    def values_at(self, as_of_dates: Iterable[date]) -> np.ndarray:
+        """value_at for many dates in one vectorized lookup (float64)"""
+        ordinals = np.fromiter((day.toordinal() for day in as_of_dates), dtype=np.int64)
+        # Index 0 of the padded array is the default, for dates before the first point
+        values = np.concatenate(([float(self.default)], self.value_array))
+        return values[np.searchsorted(self.ordinals, ordinals, side='right')]
+
+
+@dataclass(frozen=True)
+class PriceHistory:
+    """Exchange rate and energy price series"""
+
+    exchange_rates: AsOfSeries
+    energy_prices: AsOfSeries
+
+    @classmethod
+    def load(cls) -> 'PriceHistory':
+        """Read both tables (two queries)"""
+        rates = ExchangeRate.objects.order_by('date', 'created_at', 'id').values_list('date', 'rate')
+        prices = EnergyPrice.objects.filter(is_active=True).order_by('effective_date', 'created_at', 'id').values_list(
+            'effective_date', 'price_ars_per_kwh'
+        )
+        return cls(
+            exchange_rates=AsOfSeries(rates, DEFAULT_EXCHANGE_RATE),
+            energy_prices=AsOfSeries(prices, Decimal(str(ENERGY_PRICE_ARS_PER_KWH))),
+        )
+
+    def exchange_rate_at(self, as_of: date) -> Decimal:
+        return self.exchange_rates.value_at(as_of)
+
+    def energy_price_at(self, as_of: date) -> Decimal:
+        return self.energy_prices.value_at(as_of)
+
+
+_history_cache = ProcessCache(PRICE_HISTORY_GENERATION_CACHE_KEY, PriceHistory.load)
+
+
+def get_price_history() -> PriceHistory:
+    """Return the cached PriceHistory, hitting the database only on change"""
+    return _history_cache.get()
+
+
+def invalidate_price_history():
+    """Drop the local history and tell every other worker to reload theirs"""
+    _history_cache.invalidate()
@@ -0,0 +1,188 @@
+"""
+Hourly (8760 h) generation and self-consumption simulation
+
+Combines a year-long generation profile per project with a load profile per
+TariffCategory and computes, hour by hour, the self-consumed energy, the
+energy injected into the grid and the energy imported from it. Injection is
+netted against imports month by month; any monthly surplus is paid at
+injection_price_percentage of the energy price.
+
+Profiles are normalized shapes (each sums to 1 over the year) stored as
+float32 .npy files under HOURLY_PROFILES_DIR:
+
+    generation/<project id>.npy   (fallback: generation/default.npy)
+    load/<tariff code>.npy        (fallback: load/default.npy)
+
+They are memory-mapped the first time they are used and kept for the life of
+the process. See the build_hourly_profiles command to import or rebuild them.
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .tariffs import TariffSchedule
+
+
+HOURS_PER_YEAR = 8760
+
+# Hour at which every month of a non-leap year starts
+DAYS_PER_MONTH_OF_YEAR = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+MONTH_START_HOURS = np.concatenate([[0], np.cumsum(DAYS_PER_MONTH_OF_YEAR)[:-1]]) * 24
+
+DEFAULT_PROFILE_NAME = 'default'
+PROFILE_KINDS = ('generation', 'load')
+
+
+def profiles_directory() -> Path:
+    return Path(getattr(
+        settings, 'HOURLY_PROFILES_DIR', Path(__file__).resolve().parent / 'hourly_profiles'
+    ))
+
+
+def profile_path(kind: str, name) -> Path:
+    return profiles_directory() / kind / f'{name}.npy'
+
+
+def normalize_profile(values) -> np.ndarray:
+    """Validate an 8760-value profile and scale it to sum 1 (float32)"""
+    profile = np.asarray(values, dtype=np.float64).ravel()
+    if profile.shape != (HOURS_PER_YEAR,):
+        raise ValueError(f'El perfil horario debe tener {HOURS_PER_YEAR} valores (tiene {profile.size})')
+    if not np.isfinite(profile).all() or (profile < 0).any() or profile.sum() <= 0:
+        raise ValueError('El perfil horario debe tener valores finitos, no negativos y no todos nulos')
+    return (profile / profile.sum()).astype(np.float32)
+
+
+class HourlyProfileStore:
+    """Per-process cache of memory-mapped hourly profiles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles: Dict[Path, Optional[np.ndarray]] = {}
+
+    def _load(self, path: Path) -> Optional[np.ndarray]:
+        if path in self._profiles:
+            return self._profiles[path]
+
+        with self._lock:
+            if path not in self._profiles:
+                profile = None
+                if path.exists():
+                    profile = np.load(path, mmap_mode='r')
+                    if profile.shape != (HOURS_PER_YEAR,):
+                        raise ValueError(f'Perfil horario inválido: {path}')
+                    # Files written by hand may not be normalized
+                    if abs(float(profile.sum(dtype=np.float64)) - 1) > 1e-3:
+                        profile = normalize_profile(profile)
+                self._profiles[path] = profile
+            return self._profiles[path]
+
+    def get(self, kind: str, name) -> np.ndarray:
+        """Profile of kind for name, or the default profile of that kind"""
+        profile = self._load(profile_path(kind, name))
+        if profile is None:
+            profile = self._load(profile_path(kind, DEFAULT_PROFILE_NAME))
+        if profile is None:
+            raise ValueError(f'No hay perfil horario de {kind} disponible')
+        return profile
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = HourlyProfileStore()
+
+
+def simulate_hourly(
+    generation_profile: np.ndarray,
+    load_profile: np.ndarray,
+    annual_generation_kwh,
+    annual_consumption_kwh: float,
+    energy_price_ars_per_kwh: float,
+    injection_price_percentage: float = 0.0,
+    tariff_schedule: Optional[TariffSchedule] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Hourly energy balance for one or many system sizes.
+
+    annual_generation_kwh may be an array of sizes (shape (n,)); every hourly
+    and monthly output then has a leading axis of length n. With a
+    tariff_schedule the avoided kWh of each month are valued at its marginal
+    block rates instead of the flat energy price.
+    """
+    annual_generation_kwh = np.asarray(annual_generation_kwh, dtype=np.float64)
+    generation = annual_generation_kwh[..., None] * generation_profile
+    load = annual_consumption_kwh * np.asarray(load_profile, dtype=np.float64)
+
+    self_consumption = np.minimum(generation, load)
+    injection = generation - self_consumption
+    grid_import = load - self_consumption
+
+    def monthly(hourly):
+        return np.add.reduceat(hourly, MONTH_START_HOURS, axis=-1)
+
+    monthly_generation = monthly(generation)
+    monthly_self_consumption = monthly(self_consumption)
+    monthly_injection = monthly(injection)
+    monthly_import = monthly(grid_import)
+
+    # Monthly netting: injected energy offsets imports of the same month
+    monthly_netted = np.minimum(monthly_injection, monthly_import)
+    monthly_surplus = monthly_injection - monthly_netted
+    monthly_surplus_ars = monthly_surplus * energy_price_ars_per_kwh * injection_price_percentage / 100
+    if tariff_schedule is None:
+        monthly_savings_ars = (monthly_self_consumption + monthly_netted) * energy_price_ars_per_kwh
+    else:
+        monthly_savings_ars = tariff_schedule.avoided_cost(
+            monthly(load), monthly_self_consumption + monthly_netted
+        )
+    monthly_savings_ars = monthly_savings_ars + monthly_surplus_ars
+
+    return {
+        'monthly_consumption_kwh': np.broadcast_to(monthly(load), monthly_generation.shape),
+        'monthly_generation_kwh': monthly_generation,
+        'monthly_self_consumption_kwh': monthly_self_consumption,
+        'monthly_grid_injection_kwh': monthly_injection,
+        'monthly_grid_import_kwh': monthly_import,
+        'monthly_netted_kwh': monthly_netted,
+        'monthly_surplus_kwh': monthly_surplus,
+        'monthly_savings_ars': monthly_savings_ars,
+    }
+
+
+def hourly_summary(balance: Dict[str, np.ndarray], index: int = 0) -> Dict[str, Any]:
+    """JSON-ready totals and monthly breakdown of one size of a balance"""
+    def row(name):
+        values = balance[name]
+        return values[index] if values.ndim > 1 else values
+
+    generation = float(row('monthly_generation_kwh').sum())
+    consumption = float(row('monthly_consumption_kwh').sum())
+    self_consumption = float(row('monthly_self_consumption_kwh').sum())
+
+    monthly_columns = [
+        'monthly_consumption_kwh', 'monthly_generation_kwh', 'monthly_self_consumption_kwh',
+        'monthly_grid_injection_kwh', 'monthly_grid_import_kwh', 'monthly_netted_kwh',
+        'monthly_surplus_kwh', 'monthly_savings_ars',
+    ]
+    return {
+        'annual_consumption_kwh': round(consumption, 2),
+        'annual_generation_kwh': round(generation, 2),
+        'annual_self_consumption_kwh': round(self_consumption, 2),
+        'annual_grid_injection_kwh': round(float(row('monthly_grid_injection_kwh').sum()), 2),
+        'annual_grid_import_kwh': round(float(row('monthly_grid_import_kwh').sum()), 2),
+        'self_consumption_percentage': round(self_consumption / generation * 100, 2) if generation else 0.0,
+        'self_sufficiency_percentage': round(self_consumption / consumption * 100, 2) if consumption else 0.0,
+        'monthly': [
+            dict(
+                {'month': month + 1},
+                **{name[len('monthly_'):]: round(float(row(name)[month]), 2) for name in monthly_columns}
+            )
+            for month in range(12)
+        ],
+    }
@@ -0,0 +1,235 @@
+"""
+Database-backed job queue for large comparisons, sweeps and risk simulations
+
+Views route requests over SIMULATION_JOB_SYNC_MAX_SCENARIOS scenarios,
+SIMULATION_JOB_SYNC_MAX_CELLS sweep cells or SIMULATION_RISK_SYNC_MAX_PATHS
+Monte Carlo paths to enqueue_job() instead of computing them in the web worker. The run_simulation_jobs management command
+claims pending jobs and runs them block by block (see scenarios.py): each
+block is stored as SimulationJobResult rows and the job's processed count and
+heartbeat are updated, so clients can poll the progress and page through the
+results already stored. A block may be empty: long risk simulations yield one
+after each chunk of Monte Carlo paths only to renew the heartbeat.
+
+Jobs are claimed with a conditional UPDATE, so several workers can share the
+queue. A running job whose heartbeat is older than SIMULATION_JOB_STALE_SECONDS
+(its worker died) goes back to pending and starts over. Each claim gets a new
+claim_token and every write of a run is conditional on it, so a worker that
+was only slow stops at its next block instead of mixing its results with
+those of the run that replaced it.
+"""
+
+import json
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from projects.models import SolarProject
+
+from .models import SimulationJob, SimulationJobResult, TariffCategory
+from .reservations import reservable_power
+from .scenarios import (
+    comparison_size, iter_comparison_blocks, iter_risk_analysis, iter_sweep_blocks, sweep_axes, sweep_column_names
+)
+from .serializers import (
+    RiskSimulationSerializer, SensitivitySweepSerializer, SimulationComparisonSerializer, SimulationResultSerializer
+)
+from .simulation_engine import SIMULATION_INPUT_FIELDS, SolarInvestmentCalculator
+
+
+logger = logging.getLogger(__name__)
+
+# (summary, total results, blocks of results)
+JobPlan = Tuple[Dict[str, Any], int, Iterator[List[Dict[str, Any]]]]
+
+
+def sync_max_scenarios() -> int:
+    return getattr(settings, 'SIMULATION_JOB_SYNC_MAX_SCENARIOS', 500)
+
+
+def sync_max_cells() -> int:
+    return getattr(settings, 'SIMULATION_JOB_SYNC_MAX_CELLS', 250000)
+
+
+def sync_max_paths() -> int:
+    return getattr(settings, 'SIMULATION_RISK_SYNC_MAX_PATHS', 50000)
+
+
+def enqueue_job(kind: str, data: Dict[str, Any], user=None, total: int = 0) -> SimulationJob:
+    """Queue validated request data for the worker"""
+    return SimulationJob.objects.create(
+        kind=kind,
+        # The worker validates it again with the view's serializer
+        params=json.loads(json.dumps(data, cls=DjangoJSONEncoder)),
+        user=user if user is not None and user.is_authenticated else None,
+        total=total
+    )
+
+
+def _plan_compare(params: Dict[str, Any]) -> JobPlan:
+    serializer = SimulationComparisonSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    project = SolarProject.objects.get(id=data['project_id'])
+    tariff_category = TariffCategory.objects.get(id=data['tariff_category_id'])
+    calculator = SolarInvestmentCalculator(project, tariff_category)
+    summary = {
+        'project_info': {
+            'id': project.id,
+            'name': project.name,
+            'available_power_kw': float(reservable_power(project))
+        },
+        'pricing_version': calculator.pricing.version,
+    }
+    return summary, comparison_size(data), iter_comparison_blocks(calculator, data)
+
+
+def _plan_sweep(params: Dict[str, Any]) -> JobPlan:
+    serializer = SensitivitySweepSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    project = SolarProject.objects.get(id=data['project_id'])
+    calculator = SolarInvestmentCalculator(project, None)
+    energy_prices, exchange_rates, panel_counts = sweep_axes(calculator, data)
+    summary = {
+        'pricing_version': calculator.pricing.version,
+        'axes': {
+            'energy_price_ars_per_kwh': energy_prices.round(2).tolist(),
+            'exchange_rate': exchange_rates.round(2).tolist(),
+            'number_of_panels': panel_counts.astype(int).tolist(),
+        },
+        'shape': [len(energy_prices), len(exchange_rates), len(panel_counts)],
+        'columns': sweep_column_names(data),
+    }
+    blocks = iter_sweep_blocks(calculator, data, energy_prices, exchange_rates, panel_counts)
+    return summary, len(energy_prices) * len(exchange_rates), blocks
+
+
+def _plan_risk(params: Dict[str, Any]) -> JobPlan:
+    serializer = RiskSimulationSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    project = SolarProject.objects.get(id=data['project_id'])
+    tariff_category = TariffCategory.objects.get(id=data['tariff_category_id'])
+    calculator = SolarInvestmentCalculator(project, tariff_category)
+    simulation_type, input_field = next(
+        (simulation_type, input_field)
+        for simulation_type, input_field in SIMULATION_INPUT_FIELDS.items()
+        if data.get(input_field) is not None
+    )
+    simulation = calculator.simulate(simulation_type, data['monthly_bill_ars'], data[input_field])
+    summary = {
+        'simulation': SimulationResultSerializer(simulation).data,
+        'pricing_version': calculator.pricing.version,
+    }
+
+    def blocks():
+        analysis = iter_risk_analysis(calculator, simulation, data)
+        while True:
+            try:
+                next(analysis)
+            except StopIteration as finished:
+                yield [finished.value]
+                return
+            # An empty block between chunks renews the heartbeat and checks the claim
+            yield []
+
+    return summary, 1, blocks()
+
+
+JOB_PLANNERS: Dict[str, Callable[[Dict[str, Any]], JobPlan]] = {
+    'compare': _plan_compare,
+    'sweep': _plan_sweep,
+    'risk': _plan_risk,
+}
+
+
+class ClaimLost(Exception):
+    """The job was requeued, and maybe claimed again, while this worker ran it"""
+
+
+def claim_next_job() -> Optional[SimulationJob]:
+    """Oldest pending job, marked as running by this worker; None when the queue is empty"""
+    pending = SimulationJob.objects.filter(status=SimulationJob.STATUS_PENDING)
+    for job_id in pending.order_by('created_at').values_list('id', flat=True)[:20]:
+        now = timezone.now()
+        # Only one worker can move a given job out of pending
+        claimed = pending.filter(pk=job_id).update(
+            status=SimulationJob.STATUS_RUNNING, started_at=now, heartbeat_at=now, processed=0, error='',
+            claim_token=uuid.uuid4()
+        )
+        if claimed:
+            return SimulationJob.objects.get(pk=job_id)
+    return None
+
+
+def _update_claimed(claimed, **fields):
+    if not claimed.update(**fields):
+        raise ClaimLost
+
+
+def run_job(job: SimulationJob) -> SimulationJob:
+    """Compute a claimed job, storing its results block by block while the claim holds"""
+    claimed = SimulationJob.objects.filter(
+        pk=job.pk, status=SimulationJob.STATUS_RUNNING, claim_token=job.claim_token
+    )
+    try:
+        with transaction.atomic():
+            _update_claimed(claimed, heartbeat_at=timezone.now())
+            # Results of an earlier, interrupted run
+            job.results.all().delete()
+        summary, total, blocks = JOB_PLANNERS[job.kind](job.params)
+        _update_claimed(claimed, summary=json.loads(json.dumps(summary, cls=JSONEncoder)), total=total)
+
+        processed = 0
+        for block in blocks:
+            # Encoded as the synchronous API renders it (Decimals included)
+            block = json.loads(json.dumps(block, cls=JSONEncoder))
+            # The claim is checked (and the job row locked) before writing the block
+            with transaction.atomic():
+                _update_claimed(claimed, processed=processed + len(block), heartbeat_at=timezone.now())
+                SimulationJobResult.objects.bulk_create([
+                    SimulationJobResult(job_id=job.pk, index=processed + offset, data=data)
+                    for offset, data in enumerate(block)
+                ])
+            processed += len(block)
+
+        _update_claimed(claimed, status=SimulationJob.STATUS_DONE, processed=processed, finished_at=timezone.now())
+    except ClaimLost:
+        logger.warning('Simulation job %s was requeued while running, this run stops', job.pk)
+    except Exception as e:
+        logger.exception('Simulation job %s failed', job.pk)
+        claimed.update(
+            status=SimulationJob.STATUS_FAILED,
+            error=f'Error al ejecutar el trabajo: {str(e)}',
+            finished_at=timezone.now()
+        )
+    job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs() -> int:
+    """Put back in the queue the running jobs whose worker stopped reporting, revoking its claim"""
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'SIMULATION_JOB_STALE_SECONDS', 300))
+    return SimulationJob.objects.filter(
+        status=SimulationJob.STATUS_RUNNING, heartbeat_at__lt=stale_before
+    ).update(status=SimulationJob.STATUS_PENDING, processed=0, claim_token=None)
+
+
+def purge_finished_jobs() -> int:
+    """Delete finished jobs (and their results) older than SIMULATION_JOB_RETENTION_DAYS"""
+    finished_before = timezone.now() - timedelta(days=getattr(settings, 'SIMULATION_JOB_RETENTION_DAYS', 7))
+    _, deleted = SimulationJob.objects.filter(
+        status__in=[SimulationJob.STATUS_DONE, SimulationJob.STATUS_FAILED],
+        finished_at__lt=finished_before
+    ).delete()
+    return deleted.get(SimulationJob._meta.label, 0)
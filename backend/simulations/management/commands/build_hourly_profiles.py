@@ -0,0 +1,138 @@
+"""
+Django management command to build or import the hourly (8760 h) profiles
+used by the hourly simulation mode
+"""
+
+import csv
+import math
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from simulations.hourly import (
+    DEFAULT_PROFILE_NAME, HOURS_PER_YEAR, PROFILE_KINDS, normalize_profile, profile_path
+)
+
+
+# Reference site for the built-in generation profile (Buenos Aires)
+DEFAULT_LATITUDE = -34.6
+
+# Relative hourly demand (hours 0-23) of the built-in load profiles
+LOAD_SHAPES = {
+    # Residential: morning and evening peaks
+    'RES': [0.45, 0.38, 0.34, 0.32, 0.32, 0.36, 0.55, 0.80, 0.85, 0.70, 0.62, 0.60,
+            0.65, 0.62, 0.58, 0.58, 0.65, 0.80, 1.00, 1.15, 1.20, 1.10, 0.90, 0.65],
+    # Commercial: business hours
+    'COM': [0.25, 0.22, 0.22, 0.22, 0.22, 0.25, 0.35, 0.60, 0.90, 1.00, 1.05, 1.10,
+            1.10, 1.10, 1.10, 1.05, 1.00, 0.95, 0.85, 0.65, 0.45, 0.35, 0.30, 0.27],
+    # Industrial: two shifts
+    'IND': [0.40, 0.38, 0.38, 0.38, 0.40, 0.55, 0.85, 1.00, 1.05, 1.05, 1.05, 1.00,
+            0.95, 1.00, 1.05, 1.05, 1.00, 0.95, 0.85, 0.75, 0.65, 0.55, 0.48, 0.42],
+    # Large consumers: flat with a daytime bump
+    'GC': [0.75, 0.72, 0.70, 0.70, 0.72, 0.78, 0.88, 0.95, 1.00, 1.02, 1.03, 1.03,
+           1.02, 1.02, 1.03, 1.02, 1.00, 0.98, 0.95, 0.92, 0.88, 0.84, 0.80, 0.77],
+}
+# Weekend demand relative to weekdays
+WEEKEND_FACTORS = {'RES': 1.10, 'COM': 0.45, 'IND': 0.35, 'GC': 0.85}
+# Extra demand in the peak of summer (January) and winter (July)
+SEASONAL_AMPLITUDE = {'RES': 0.25, 'COM': 0.15, 'IND': 0.05, 'GC': 0.10}
+
+
+def solar_generation_profile(latitude: float = DEFAULT_LATITUDE) -> np.ndarray:
+    """Clear-sky output of a horizontal array, hour by hour over a year"""
+    hours = np.arange(HOURS_PER_YEAR)
+    day_of_year = hours // 24 + 1
+    solar_time = hours % 24 + 0.5
+
+    declination = np.radians(23.45) * np.sin(2 * math.pi * (284 + day_of_year) / 365)
+    hour_angle = np.radians(15 * (solar_time - 12))
+    latitude = math.radians(latitude)
+    cos_zenith = (
+        math.sin(latitude) * np.sin(declination)
+        + math.cos(latitude) * np.cos(declination) * np.cos(hour_angle)
+    )
+
+    # Meinel clear-sky model: beam transmittance as a function of air mass
+    with np.errstate(divide='ignore', over='ignore'):
+        air_mass = np.where(cos_zenith > 0.01, 1 / np.maximum(cos_zenith, 0.01), np.inf)
+        irradiance = np.where(cos_zenith > 0.01, 1.353 * 0.7 ** (air_mass ** 0.678) * cos_zenith, 0.0)
+    return irradiance
+
+
+def load_profile(code: str) -> np.ndarray:
+    """Typical demand of a tariff category, hour by hour over a year"""
+    hours = np.arange(HOURS_PER_YEAR)
+    day = hours // 24
+    daily = np.asarray(LOAD_SHAPES[code])[hours % 24]
+
+    # 2023 starts on a Sunday: days 0, 6, 7, 13, ... are weekend days
+    weekend = np.isin(day % 7, (0, 6))
+    weekly = np.where(weekend, WEEKEND_FACTORS[code], 1.0)
+
+    # Peaks in mid-January and mid-July, lows at the equinoxes
+    seasonal = 1 + SEASONAL_AMPLITUDE[code] * np.cos(4 * math.pi * (day - 15) / 365) ** 2
+    return daily * weekly * seasonal
+
+
+class Command(BaseCommand):
+    help = 'Build the default hourly profiles or import one from a CSV with 8760 values'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=PROFILE_KINDS,
+            help='Profile to import: generation (per project id) or load (per tariff code)'
+        )
+        parser.add_argument(
+            '--name',
+            help='Project id or tariff category code of the imported profile'
+        )
+        parser.add_argument(
+            '--csv',
+            help='CSV file whose last column holds the 8760 hourly values'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Overwrite default profiles that already exist'
+        )
+
+    def handle(self, *args, **options):
+        if options['csv']:
+            if not options['kind'] or not options['name']:
+                raise CommandError('--csv requiere --kind y --name')
+            self._import_csv(options['csv'], options['kind'], options['name'])
+            return
+
+        profiles = {('generation', DEFAULT_PROFILE_NAME): solar_generation_profile()}
+        profiles[('load', DEFAULT_PROFILE_NAME)] = load_profile('RES')
+        for code in LOAD_SHAPES:
+            profiles[('load', code)] = load_profile(code)
+
+        for (kind, name), values in profiles.items():
+            path = profile_path(kind, name)
+            if path.exists() and not options['force']:
+                self.stdout.write(f"   Existe: {path}")
+                continue
+            self._save(path, values)
+
+    def _import_csv(self, filename, kind, name):
+        values = []
+        with open(filename, newline='') as handle:
+            for row in csv.reader(handle):
+                try:
+                    values.append(float(row[-1]))
+                except (ValueError, IndexError):
+                    # Header or blank line
+                    continue
+
+        try:
+            self._save(profile_path(kind, name), values)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+    def _save(self, path, values):
+        profile = normalize_profile(values)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, profile)
+        self.stdout.write(f"✅ Perfil guardado: {path}")
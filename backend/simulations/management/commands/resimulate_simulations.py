@@ -0,0 +1,80 @@
+"""
+Django management command to recalculate stored simulations with the current
+prices, keeping their previous results in the simulation history
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from simulations.models import InvestmentSimulation
+from simulations.pricing import get_current_pricing
+from simulations.resimulation import RESIMULATION_CHUNK_SIZE, resimulate_simulations
+
+
+class Command(BaseCommand):
+    help = 'Recalculate stored simulations with the current energy price, exchange rate and tariffs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='Only simulations of this project id (repeatable)')
+        parser.add_argument('--tariff-category', action='append', help='Only simulations of this tariff code (repeatable)')
+        parser.add_argument(
+            '--type', choices=[choice for choice, _ in InvestmentSimulation.SIMULATION_TYPE_CHOICES],
+            help='Only simulations of this type'
+        )
+        parser.add_argument('--since', help='Only simulations created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only simulations created on or before this date (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=RESIMULATION_CHUNK_SIZE, help='Rows read per query')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes computing the chunks (1 computes in this process)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Count the changes without writing them')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size y --workers deben ser mayores a 0')
+
+        queryset = InvestmentSimulation.objects.all()
+        if options['project']:
+            queryset = queryset.filter(project_id__in=options['project'])
+        if options['tariff_category']:
+            queryset = queryset.filter(tariff_category__code__in=options['tariff_category'])
+        if options['type']:
+            queryset = queryset.filter(simulation_type=options['type'])
+        for option, lookup in (('since', 'created_at__date__gte'), ('until', 'created_at__date__lte')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f'Fecha inválida para --{option}: {options[option]}')
+                queryset = queryset.filter(**{lookup: day})
+
+        pricing = get_current_pricing()
+        self.stdout.write("=== RECALCULANDO SIMULACIONES ===\n")
+        self.stdout.write(f"💡 Precio de energía: ${pricing.energy_price_ars_per_kwh} ARS/kWh")
+        self.stdout.write(f"🔄 Tipo de cambio: ${pricing.exchange_rate} ARS/USD")
+        self.stdout.write(f"   Versión de precios: {pricing.version}\n")
+
+        def progress(totals):
+            self.stdout.write(f"   {totals['processed']:,} procesadas, {totals['updated']:,} con cambios")
+
+        totals = resimulate_simulations(
+            queryset,
+            pricing=pricing,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            dry_run=options['dry_run'],
+            progress=progress
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"\n⚠️  Simulación en seco: {totals['updated']:,} de {totals['processed']:,} simulaciones cambiarían"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"\n✅ {totals['updated']:,} de {totals['processed']:,} simulaciones recalculadas"
+            ))
+        if totals['stale']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  {totals['stale']:,} simulaciones compactas de otra versión del motor quedaron sin recalcular"
+            ))
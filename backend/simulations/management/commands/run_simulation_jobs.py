@@ -0,0 +1,68 @@
+"""
+Django management command that runs the queued comparison and sweep jobs
+(see simulations/jobs.py)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulations.jobs import claim_next_job, purge_finished_jobs, requeue_stale_jobs, run_job
+from simulations.models import SimulationJob
+
+
+# Seconds between purges of old finished jobs
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Run queued simulation jobs (large comparisons, sweeps and risk simulations)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Seconds between polls of an empty queue')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs')
+
+    def handle(self, *args, **options):
+        if options['poll_interval'] <= 0:
+            raise CommandError('--poll-interval debe ser mayor a 0')
+
+        self.stdout.write("=== WORKER DE SIMULACIONES ===\n")
+        jobs_run = 0
+        last_purge = 0
+
+        try:
+            while options['max_jobs'] is None or jobs_run < options['max_jobs']:
+                if time.monotonic() - last_purge > PURGE_INTERVAL:
+                    purged = purge_finished_jobs()
+                    if purged:
+                        self.stdout.write(f"🧹 {purged} trabajos antiguos eliminados")
+                    last_purge = time.monotonic()
+
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"⚠️  {requeued} trabajos sin actividad vueltos a la cola"))
+
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f"🔄 {job.get_kind_display()} {job.id}")
+                started = time.monotonic()
+                job = run_job(job)
+                jobs_run += 1
+                if job.status == SimulationJob.STATUS_DONE:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"✅ {job.processed:,} resultados en {time.monotonic() - started:.1f}s"
+                    ))
+                elif job.status == SimulationJob.STATUS_FAILED:
+                    self.stdout.write(self.style.ERROR(f"❌ {job.error}"))
+                else:
+                    self.stdout.write(self.style.WARNING("⚠️  El trabajo volvió a la cola mientras corría; ejecución descartada"))
+        except KeyboardInterrupt:
+            self.stdout.write("\nWorker detenido")
+
+        self.stdout.write(f"\n{jobs_run} trabajos ejecutados")
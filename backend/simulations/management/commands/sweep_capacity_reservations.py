@@ -0,0 +1,41 @@
+"""
+Django management command that expires capacity holds past their deadline and
+returns the power of idle shards to their projects (see simulations/reservations.py)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from simulations.reservations import expire_reservations, return_idle_shards
+
+
+class Command(BaseCommand):
+    help = 'Expire capacity reservations and return idle shard power to the projects'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single sweep and exit')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between sweeps')
+
+    def handle(self, *args, **options):
+        if options['interval'] <= 0:
+            raise CommandError('--interval debe ser mayor a 0')
+
+        self.stdout.write("=== BARRIDO DE RESERVAS DE CAPACIDAD ===\n")
+
+        try:
+            while True:
+                expired = expire_reservations()
+                if expired:
+                    self.stdout.write(self.style.WARNING(f"⏰ {expired} reservas vencidas liberadas"))
+                returned = return_idle_shards()
+                if returned:
+                    self.stdout.write(f"🔄 {returned} kWp devueltos a los proyectos")
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("\nBarrido detenido")
+
+        self.stdout.write(self.style.SUCCESS("✅ Barrido completado"))
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:34
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def create_default_tiers(apps, schema_editor):
+    """Seed the global tiers that used to be hardcoded in the engine"""
+    PricingTier = apps.get_model('simulations', 'PricingTier')
+    
+    for min_panels, price in [(1, '700'), (10, '500'), (100, '400')]:
+        PricingTier.objects.get_or_create(
+            project=None,
+            min_panels=min_panels,
+            defaults={'price_per_panel_usd': Decimal(price)}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_auto_20250814_1610'),
+        ('simulations', '0005_merge_20250826_1453'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingTier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_panels', models.PositiveIntegerField(help_text='Cantidad mínima de paneles a partir de la cual aplica este precio', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Desde (paneles)')),
+                ('price_per_panel_usd', models.DecimalField(decimal_places=2, max_digits=8, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Precio por Panel (USD)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('project', models.ForeignKey(blank=True, help_text='Dejar vacío para definir el precio por defecto de todos los proyectos', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_tiers', to='projects.solarproject')),
+            ],
+            options={
+                'verbose_name': 'Tramo de Precio por Panel',
+                'verbose_name_plural': 'Tramos de Precio por Panel',
+                'ordering': ['project', 'min_panels'],
+                'unique_together': {('project', 'min_panels')},
+            },
+        ),
+        migrations.RunPython(create_default_tiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:44
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0006_pricing_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tariffcategory',
+            name='fixed_charge_ars',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Cargo Fijo Mensual (ARS)'),
+        ),
+        migrations.AddField(
+            model_name='tariffcategory',
+            name='tax_percentage',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='IVA y demás impuestos aplicados sobre cargo fijo y energía', max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)], verbose_name='Impuestos (%)'),
+        ),
+        migrations.CreateModel(
+            name='TariffBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_kwh', models.PositiveIntegerField(help_text='Consumo mensual a partir del cual aplica este precio (el primer bloque desde 0)', verbose_name='Desde (kWh/mes)')),
+                ('price_ars_per_kwh', models.DecimalField(decimal_places=2, max_digits=8, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Precio (ARS por kWh)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('tariff_category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='simulations.tariffcategory')),
+            ],
+            options={
+                'verbose_name': 'Bloque de Consumo',
+                'verbose_name_plural': 'Bloques de Consumo',
+                'ordering': ['tariff_category', 'from_kwh'],
+                'unique_together': {('tariff_category', 'from_kwh')},
+            },
+        ),
+    ]
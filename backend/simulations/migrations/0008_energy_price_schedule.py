@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0007_tariff_blocks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='energyprice',
+            name='is_active',
+            field=models.BooleanField(default=True, help_text='Desmarcar para retirar este precio. Rige el precio activo con la fecha de vigencia más reciente que no sea futura', verbose_name='Activo'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-16 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0008_energy_price_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvestmentSimulationHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('values', models.JSONField(verbose_name='Resultados Anteriores')),
+                ('pricing_version', models.CharField(blank=True, help_text='Versión de precios con la que se recalcularon los resultados', max_length=20, verbose_name='Versión de Precios Aplicada')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Recálculo')),
+                ('simulation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='simulations.investmentsimulation')),
+            ],
+            options={
+                'verbose_name': 'Historial de Simulación',
+                'verbose_name_plural': 'Historial de Simulaciones',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
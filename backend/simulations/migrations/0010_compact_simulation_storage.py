@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-16 16:05
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0009_simulation_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationSnapshot',
+            fields=[
+                ('version', models.CharField(max_length=12, primary_key=True, serialize=False, verbose_name='Versión')),
+                ('data', models.JSONField(verbose_name='Precios y Parámetros')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Simulación',
+                'verbose_name_plural': 'Snapshots de Simulación',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='investmentsimulation',
+            name='engine_version',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Versión del Motor'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='annual_generation_kwh',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Generación Anual (kWh)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='annual_savings_ars',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Ahorro Anual (ARS)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='bill_coverage_achieved',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Cobertura de Factura Lograda (%)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='exchange_rate_used',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Tipo de Cambio Utilizado'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='installed_power_kw',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Potencia Instalada (kW)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='monthly_generation_kwh',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Generación Mensual (kWh)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='monthly_savings_ars',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Ahorro Mensual (ARS)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='payback_period_years',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Período de Retorno (años)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='roi_annual',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='ROI Anual (%)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='total_investment_ars',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Inversión Total (ARS)'),
+        ),
+        migrations.AlterField(
+            model_name='investmentsimulation',
+            name='total_investment_usd',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Inversión Total (USD)'),
+        ),
+        migrations.AddField(
+            model_name='investmentsimulation',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='simulations', to='simulations.simulationsnapshot', verbose_name='Snapshot de Precios'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0010_compact_simulation_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimulationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('compare', 'Comparación de Escenarios'), ('sweep', 'Barrido de Sensibilidad')], max_length=20, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En Ejecución'), ('done', 'Finalizado'), ('failed', 'Fallido')], db_index=True, default='pending', max_length=20, verbose_name='Estado')),
+                ('params', models.JSONField(verbose_name='Parámetros')),
+                ('summary', models.JSONField(blank=True, default=dict, help_text='Datos comunes a todos los resultados (proyecto, ejes, versión de precios)', verbose_name='Resumen')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de Pasos')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Pasos Procesados')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Actualizada por el worker en cada bloque procesado', null=True, verbose_name='Última Actividad')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='simulation_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Simulación',
+                'verbose_name_plural': 'Trabajos de Simulación',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SimulationJobResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(verbose_name='Posición')),
+                ('data', models.JSONField(verbose_name='Resultado')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='simulations.simulationjob')),
+            ],
+            options={
+                'verbose_name': 'Resultado de Trabajo',
+                'verbose_name_plural': 'Resultados de Trabajos',
+                'ordering': ['job', 'index'],
+                'unique_together': {('job', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:40
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_auto_20250814_1610'),
+        ('simulations', '0011_simulation_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacityReservation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('power_kw', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Potencia Reservada (kWp)')),
+                ('shard_index', models.PositiveSmallIntegerField(help_text='Fragmento de capacidad al que vuelve la potencia si la reserva se libera o vence', verbose_name='Fragmento')),
+                ('status', models.CharField(choices=[('held', 'Retenida'), ('confirmed', 'Confirmada'), ('released', 'Liberada'), ('expired', 'Vencida')], db_index=True, default='held', max_length=20, verbose_name='Estado')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Vence')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Cierre')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_reservations', to='projects.solarproject')),
+                ('simulation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='capacity_reservations', to='simulations.investmentsimulation')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='capacity_reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reserva de Capacidad',
+                'verbose_name_plural': 'Reservas de Capacidad',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CapacityShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Índice')),
+                ('available_kw', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Potencia Disponible (kWp)')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última Actualización')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capacity_shards', to='projects.solarproject')),
+            ],
+            options={
+                'verbose_name': 'Fragmento de Capacidad',
+                'verbose_name_plural': 'Fragmentos de Capacidad',
+                'ordering': ['project', 'index'],
+                'unique_together': {('project', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,15 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The generations cache table is created by `manage.py createcachetable`
+    # on each deploy (see CACHES in settings); this migration only keeps the
+    # dependency chain of the databases that already applied it.
+
+    dependencies = [
+        ('simulations', '0012_capacity_reservations'),
+    ]
+
+    operations = []
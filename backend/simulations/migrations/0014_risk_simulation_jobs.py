@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0013_shared_cache_table'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='simulationjob',
+            name='kind',
+            field=models.CharField(choices=[('compare', 'Comparación de Escenarios'), ('sweep', 'Barrido de Sensibilidad'), ('risk', 'Simulación de Riesgo')], max_length=20, verbose_name='Tipo'),
+        ),
+    ]
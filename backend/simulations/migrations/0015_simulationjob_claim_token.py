@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('simulations', '0014_risk_simulation_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationjob',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, help_text='Renovado cada vez que un worker toma el trabajo; solo esa ejecución puede escribir sus resultados', null=True, verbose_name='Token de Ejecución'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
+from django.utils import timezone
 from projects.models import SolarProject
+from decimal import Decimal
 import uuid
 
 # Fixed energy price for savings calculation (legacy - use EnergyPrice model instead)
@@ -33,7 +35,7 @@ class EnergyPrice(models.Model):
     is_active = models.BooleanField(
         'Activo',
         default=True,
-        help_text='Solo debe haber un precio activo a la vez'
+        help_text='Desmarcar para retirar este precio. Rige el precio activo con la fecha de vigencia más reciente que no sea futura'
     )
     created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
     updated_at = models.DateTimeField('Última Actualización', auto_now=True)
@@ -48,18 +50,66 @@ class EnergyPrice(models.Model):
     
     @classmethod
     def get_current_price(cls):
-        """Get the current active energy price"""
+        """
+        Get the energy price in force today: the active price with the most
+        recent effective date that is not in the future
+        """
         try:
-            active_price = cls.objects.filter(is_active=True).first()
+            active_price = cls.objects.filter(
+                is_active=True,
+                effective_date__lte=timezone.localdate()
+            ).order_by('-effective_date', '-created_at').first()
             return active_price.price_ars_per_kwh if active_price else ENERGY_PRICE_ARS_PER_KWH
         except:
             return ENERGY_PRICE_ARS_PER_KWH
     
-    def save(self, *args, **kwargs):
-        if self.is_active:
-            # Deactivate all other prices when this one is set as active
-            EnergyPrice.objects.filter(is_active=True).update(is_active=False)
-        super().save(*args, **kwargs)
+    @classmethod
+    def get_next_effective_date(cls):
+        """Effective date of the next scheduled (future) active price, or None"""
+        return cls.objects.filter(
+            is_active=True,
+            effective_date__gt=timezone.localdate()
+        ).aggregate(next_date=models.Min('effective_date'))['next_date']
+
+
+class PricingTier(models.Model):
+    """
+    Panel price tier. Rows without project are the global default; a project
+    with its own rows uses only those. The tier reached by the total number
+    of panels sets the price of ALL panels.
+    """
+    
+    project = models.ForeignKey(
+        SolarProject,
+        on_delete=models.CASCADE,
+        related_name='pricing_tiers',
+        null=True,
+        blank=True,
+        help_text='Dejar vacío para definir el precio por defecto de todos los proyectos'
+    )
+    min_panels = models.PositiveIntegerField(
+        'Desde (paneles)',
+        validators=[MinValueValidator(1)],
+        help_text='Cantidad mínima de paneles a partir de la cual aplica este precio'
+    )
+    price_per_panel_usd = models.DecimalField(
+        'Precio por Panel (USD)',
+        max_digits=8,
+        decimal_places=2,
+        validators=[MinValueValidator(0)]
+    )
+    created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
+    updated_at = models.DateTimeField('Última Actualización', auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Tramo de Precio por Panel'
+        verbose_name_plural = 'Tramos de Precio por Panel'
+        ordering = ['project', 'min_panels']
+        unique_together = ['project', 'min_panels']
+    
+    def __str__(self):
+        scope = self.project.name if self.project else 'Por defecto'
+        return f"{scope}: desde {self.min_panels} paneles - ${self.price_per_panel_usd} USD"
 
 
 class TariffCategory(models.Model):
@@ -69,6 +119,23 @@ class TariffCategory(models.Model):
     code = models.CharField('Código', max_length=20, unique=True)
     description = models.TextField('Descripción', blank=True)
     
+    # Bill structure; without TariffBlock rows the flat EnergyPrice applies
+    fixed_charge_ars = models.DecimalField(
+        'Cargo Fijo Mensual (ARS)',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)]
+    )
+    tax_percentage = models.DecimalField(
+        'Impuestos (%)',
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text='IVA y demás impuestos aplicados sobre cargo fijo y energía'
+    )
+    
     created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
     updated_at = models.DateTimeField('Última Actualización', auto_now=True)
     
@@ -81,6 +148,40 @@ class TariffCategory(models.Model):
         return f"{self.name} ({self.code})"
 
 
+class TariffBlock(models.Model):
+    """
+    Consumption block of a tariff category. Each kWh of monthly consumption
+    above from_kwh (and below the next block) is billed at this block's price.
+    """
+    
+    tariff_category = models.ForeignKey(
+        TariffCategory,
+        on_delete=models.CASCADE,
+        related_name='blocks'
+    )
+    from_kwh = models.PositiveIntegerField(
+        'Desde (kWh/mes)',
+        help_text='Consumo mensual a partir del cual aplica este precio (el primer bloque desde 0)'
+    )
+    price_ars_per_kwh = models.DecimalField(
+        'Precio (ARS por kWh)',
+        max_digits=8,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
+    updated_at = models.DateTimeField('Última Actualización', auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Bloque de Consumo'
+        verbose_name_plural = 'Bloques de Consumo'
+        ordering = ['tariff_category', 'from_kwh']
+        unique_together = ['tariff_category', 'from_kwh']
+    
+    def __str__(self):
+        return f"{self.tariff_category.code}: desde {self.from_kwh} kWh - ${self.price_ars_per_kwh}/kWh"
+
+
 class ExchangeRate(models.Model):
     """Model to store USD/ARS exchange rates"""
     
@@ -105,13 +206,44 @@ class ExchangeRate(models.Model):
     
     @classmethod
     def get_latest_rate(cls):
-        """Get the most recent exchange rate"""
-        latest = cls.objects.first()
+        """Get the most recent exchange rate (rates dated in the future are scheduled, not current)"""
+        latest = cls.objects.filter(date__lte=timezone.localdate()).order_by('-date', '-created_at').first()
         return latest.rate if latest else 1000  # Default fallback rate
+    
+    @classmethod
+    def get_next_rate_date(cls):
+        """Date of the next scheduled (future) exchange rate, or None"""
+        return cls.objects.filter(
+            date__gt=timezone.localdate()
+        ).aggregate(next_date=models.Min('date'))['next_date']
+
+
+class SimulationSnapshot(models.Model):
+    """
+    Prices and engine parameters a compact simulation was computed with.
+    Content-addressed: the version is a hash of data, so equal states share a row.
+    """
+    
+    version = models.CharField('Versión', max_length=12, primary_key=True)
+    data = models.JSONField('Precios y Parámetros')
+    created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Snapshot de Simulación'
+        verbose_name_plural = 'Snapshots de Simulación'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Snapshot {self.version}"
 
 
 class InvestmentSimulation(models.Model):
-    """Model to store investment simulations"""
+    """
+    Model to store investment simulations.
+    
+    Compact simulations (snapshot set) store only their inputs: result columns
+    left NULL are derived from the snapshot on first access (see storage.py).
+    """
     
     SIMULATION_TYPE_CHOICES = [
         ('bill_coverage', 'Cobertura de Factura'),
@@ -119,6 +251,14 @@ class InvestmentSimulation(models.Model):
         ('investment', 'Monto de Inversión'),
     ]
     
+    # Columns computed by the engine (number_of_panels is an input of 'panels' simulations)
+    RESULT_FIELDS = [
+        'number_of_panels', 'total_investment_usd', 'total_investment_ars',
+        'installed_power_kw', 'annual_generation_kwh', 'monthly_generation_kwh',
+        'monthly_savings_ars', 'annual_savings_ars', 'payback_period_years',
+        'bill_coverage_achieved', 'roi_annual', 'exchange_rate_used',
+    ]
+    
     # Unique identifier for the simulation
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
@@ -170,42 +310,56 @@ class InvestmentSimulation(models.Model):
         'Inversión Total (USD)', 
         max_digits=10, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     total_investment_ars = models.DecimalField(
         'Inversión Total (ARS)', 
         max_digits=15, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     installed_power_kw = models.DecimalField(
         'Potencia Instalada (kW)', 
         max_digits=8, 
         decimal_places=3,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     annual_generation_kwh = models.DecimalField(
         'Generación Anual (kWh)', 
         max_digits=10, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     monthly_generation_kwh = models.DecimalField(
         'Generación Mensual (kWh)', 
         max_digits=8, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     monthly_savings_ars = models.DecimalField(
         'Ahorro Mensual (ARS)', 
         max_digits=10, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     annual_savings_ars = models.DecimalField(
         'Ahorro Anual (ARS)', 
         max_digits=12, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
 
@@ -213,6 +367,8 @@ class InvestmentSimulation(models.Model):
         'Período de Retorno (años)', 
         max_digits=5, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     
@@ -221,21 +377,38 @@ class InvestmentSimulation(models.Model):
         'Cobertura de Factura Lograda (%)', 
         max_digits=5, 
         decimal_places=2,
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)]
     )
     roi_annual = models.DecimalField(
         'ROI Anual (%)', 
         max_digits=6, 
-        decimal_places=2
+        decimal_places=2,
+        null=True,
+        blank=True
     )
     
     # Exchange rate used for calculation
     exchange_rate_used = models.DecimalField(
         'Tipo de Cambio Utilizado', 
         max_digits=8, 
-        decimal_places=2
+        decimal_places=2,
+        null=True,
+        blank=True
     )
     
+    # Compact storage: snapshot and engine version the results derive from
+    snapshot = models.ForeignKey(
+        SimulationSnapshot,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='simulations',
+        verbose_name='Snapshot de Precios'
+    )
+    engine_version = models.CharField('Versión del Motor', max_length=10, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
     
@@ -247,6 +420,31 @@ class InvestmentSimulation(models.Model):
     def __str__(self):
         return f"Simulación {self.id} - {self.project.name} ({self.simulation_type})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Unset (NULL) results of a compact row become deferred and are
+        # derived by refresh_from_db() the first time one is read
+        instance._derived_fields = frozenset()
+        if instance.__dict__.get('snapshot_id') is not None:
+            instance._derived_fields = frozenset(
+                name for name in cls.RESULT_FIELDS
+                if name in instance.__dict__ and instance.__dict__[name] is None
+            )
+            for name in instance._derived_fields:
+                del instance.__dict__[name]
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        derived_fields = getattr(self, '_derived_fields', frozenset())
+        if fields and derived_fields.issuperset(fields):
+            from .storage import derive_results
+            for name, value in derive_results(self).items():
+                if name in derived_fields:
+                    self.__dict__.setdefault(name, value)
+            return
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+    
     @property
     def monthly_savings_usd(self):
         """Calculate monthly savings in USD"""
@@ -260,4 +458,200 @@ class InvestmentSimulation(models.Model):
     @property
     def annual_savings_usd_legacy(self):
         """Calculate annual savings in USD using official exchange rate (legacy method)"""
-        return self.annual_savings_ars / self.exchange_rate_used
\ No newline at end of file
+        return self.annual_savings_ars / self.exchange_rate_used
+
+
+class InvestmentSimulationHistory(models.Model):
+    """Results a simulation showed before being recalculated with new prices"""
+    
+    simulation = models.ForeignKey(
+        InvestmentSimulation,
+        on_delete=models.CASCADE,
+        related_name='history'
+    )
+    values = models.JSONField('Resultados Anteriores')
+    pricing_version = models.CharField(
+        'Versión de Precios Aplicada',
+        max_length=20,
+        blank=True,
+        help_text='Versión de precios con la que se recalcularon los resultados'
+    )
+    created_at = models.DateTimeField('Fecha de Recálculo', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Historial de Simulación'
+        verbose_name_plural = 'Historial de Simulaciones'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Simulación {self.simulation_id} - recalculada el {self.created_at:%Y-%m-%d}"
+
+
+class SimulationJob(models.Model):
+    """Large comparison, sweep or risk simulation queued for the job worker (see jobs.py)"""
+    
+    KIND_CHOICES = [
+        ('compare', 'Comparación de Escenarios'),
+        ('sweep', 'Barrido de Sensibilidad'),
+        ('risk', 'Simulación de Riesgo'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pendiente'),
+        (STATUS_RUNNING, 'En Ejecución'),
+        (STATUS_DONE, 'Finalizado'),
+        (STATUS_FAILED, 'Fallido'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField('Tipo', max_length=20, choices=KIND_CHOICES)
+    status = models.CharField('Estado', max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='simulation_jobs',
+        null=True,
+        blank=True
+    )
+    params = models.JSONField('Parámetros')
+    summary = models.JSONField(
+        'Resumen',
+        default=dict,
+        blank=True,
+        help_text='Datos comunes a todos los resultados (proyecto, ejes, versión de precios)'
+    )
+    total = models.PositiveIntegerField('Total de Pasos', default=0)
+    processed = models.PositiveIntegerField('Pasos Procesados', default=0)
+    error = models.TextField('Error', blank=True)
+    created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
+    started_at = models.DateTimeField('Inicio', null=True, blank=True)
+    finished_at = models.DateTimeField('Fin', null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        'Última Actividad',
+        null=True,
+        blank=True,
+        help_text='Actualizada por el worker en cada bloque procesado'
+    )
+    claim_token = models.UUIDField(
+        'Token de Ejecución',
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Renovado cada vez que un worker toma el trabajo; solo esa ejecución puede escribir sus resultados'
+    )
+    
+    class Meta:
+        verbose_name = 'Trabajo de Simulación'
+        verbose_name_plural = 'Trabajos de Simulación'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.id} - {self.get_status_display()}"
+    
+    @property
+    def progress(self):
+        """Fraction of the job already processed, between 0 and 1"""
+        if self.status == self.STATUS_DONE:
+            return 1.0
+        return round(self.processed / self.total, 4) if self.total else 0.0
+
+
+class SimulationJobResult(models.Model):
+    """One page-able block of the results of a SimulationJob"""
+    
+    job = models.ForeignKey(SimulationJob, on_delete=models.CASCADE, related_name='results')
+    index = models.PositiveIntegerField('Posición')
+    data = models.JSONField('Resultado')
+    
+    class Meta:
+        verbose_name = 'Resultado de Trabajo'
+        verbose_name_plural = 'Resultados de Trabajos'
+        ordering = ['job', 'index']
+        unique_together = ['job', 'index']
+    
+    def __str__(self):
+        return f"Trabajo {self.job_id} - resultado {self.index}"
+
+
+class CapacityShard(models.Model):
+    """
+    Slice of a project's available power lent to the reservation system
+    (see reservations.py), so concurrent holds update different rows
+    """
+    
+    project = models.ForeignKey(SolarProject, on_delete=models.CASCADE, related_name='capacity_shards')
+    index = models.PositiveSmallIntegerField('Índice')
+    available_kw = models.DecimalField(
+        'Potencia Disponible (kWp)',
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0'),
+        validators=[MinValueValidator(0)]
+    )
+    updated_at = models.DateTimeField('Última Actualización', default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Fragmento de Capacidad'
+        verbose_name_plural = 'Fragmentos de Capacidad'
+        ordering = ['project', 'index']
+        unique_together = ['project', 'index']
+    
+    def __str__(self):
+        return f"{self.project.name} #{self.index} - {self.available_kw} kWp"
+
+
+class CapacityReservation(models.Model):
+    """Ledger entry of power held or taken from a project by an investor"""
+    
+    STATUS_HELD = 'held'
+    STATUS_CONFIRMED = 'confirmed'
+    STATUS_RELEASED = 'released'
+    STATUS_EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (STATUS_HELD, 'Retenida'),
+        (STATUS_CONFIRMED, 'Confirmada'),
+        (STATUS_RELEASED, 'Liberada'),
+        (STATUS_EXPIRED, 'Vencida'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(SolarProject, on_delete=models.CASCADE, related_name='capacity_reservations')
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='capacity_reservations',
+        null=True,
+        blank=True
+    )
+    simulation = models.ForeignKey(
+        InvestmentSimulation,
+        on_delete=models.SET_NULL,
+        related_name='capacity_reservations',
+        null=True,
+        blank=True
+    )
+    power_kw = models.DecimalField(
+        'Potencia Reservada (kWp)',
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))]
+    )
+    shard_index = models.PositiveSmallIntegerField(
+        'Fragmento',
+        help_text='Fragmento de capacidad al que vuelve la potencia si la reserva se libera o vence'
+    )
+    status = models.CharField('Estado', max_length=20, choices=STATUS_CHOICES, default=STATUS_HELD, db_index=True)
+    expires_at = models.DateTimeField('Vence', db_index=True)
+    created_at = models.DateTimeField('Fecha de Creación', auto_now_add=True)
+    closed_at = models.DateTimeField('Fecha de Cierre', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Reserva de Capacidad'
+        verbose_name_plural = 'Reservas de Capacidad'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.project.name} - {self.power_kw} kWp ({self.get_status_display()})"
@@ -0,0 +1,230 @@
+"""
+Allocation of an investment budget across projects
+
+allocate_budget() picks a panel count per project that maximizes the total
+annual savings bought with a USD budget, without exceeding any project's
+available power. Savings are linear in the panel count (an investor has no
+bill to cap them), but the cost is not: the tier price applies to every panel
+of a purchase, so 99 panels can cost more than 100. Each project's options are
+therefore split into tier segments [tier_min, next_tier_min - 1], within which
+cost and savings are both linear.
+
+The exact solver is a dynamic program over the budget in units of the gcd of
+the tier prices: per project, one bounded knapsack per segment (panels added
+in binary-split groups) and the best segment (or none) per budget. Budgets too
+fine-grained for it (see DP_MAX_CELLS) use a greedy allocation instead, which
+gives the budget to the project with the best savings per dollar at its
+largest affordable purchase, then repeats with what is left.
+"""
+
+import math
+from decimal import ROUND_FLOOR, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from projects.models import SolarProject
+
+from .pricing import PricingSnapshot, get_current_pricing
+from .reservations import reservable_power
+from .simulation_engine import SolarInvestmentCalculator, quantize_batch_results
+
+
+# Choice flags the dynamic program may keep (one byte per budget unit per
+# binary-split group); larger problems use the greedy allocation
+DP_MAX_CELLS = 25000000
+
+
+class ProjectOption:
+    """What a project can sell: its tier segments, capped by its capacity"""
+
+    def __init__(self, calculator: SolarInvestmentCalculator):
+        self.calculator = calculator
+        self.project = calculator.project
+        self.max_panels = calculator.max_panels_for_capacity()
+        # Annual ARS savings of one panel, without bill restrictions
+        self.savings_per_panel = float(calculator.simulate_batch(
+            'panels', 0, [1], apply_bill_restrictions=False
+        )['annual_savings_ars'][0])
+
+        # (first panel, last panel, USD per panel) of every reachable tier
+        self.segments: List[Tuple[int, int, Decimal]] = []
+        tiers = list(calculator.tiers)
+        for index, (tier_min, price) in enumerate(tiers):
+            first = max(tier_min, 1) if index else 1
+            last = tiers[index + 1][0] - 1 if index + 1 < len(tiers) else self.max_panels
+            last = min(last, self.max_panels)
+            if first <= last:
+                self.segments.append((first, last, price))
+
+    def largest_purchase(self, budget_usd: Decimal) -> Tuple[int, Decimal]:
+        """Most panels (and their cost) that budget_usd buys from this project"""
+        best = (0, Decimal('0'))
+        for first, last, price in self.segments:
+            panels = min(last, int((budget_usd / price).to_integral_value(ROUND_FLOOR)))
+            if panels >= first and panels > best[0]:
+                best = (panels, panels * price)
+        return best
+
+
+def _budget_unit(options: List[ProjectOption]) -> int:
+    """Largest amount, in cents, dividing every tier price"""
+    return math.gcd(*[
+        int(price * 100) for option in options for _, _, price in option.segments
+    ] or [100])
+
+
+def _dp_states(options: List[ProjectOption], budget_usd: Decimal, unit: int) -> int:
+    # Budget beyond the cost of every project's largest purchase cannot be spent
+    spendable = min(budget_usd, sum(
+        (max(last * price for _, last, price in option.segments) for option in options), Decimal('0')
+    ))
+    return int(spendable * 100) // unit + 1
+
+
+def _dp_cells(options: List[ProjectOption], states: int) -> int:
+    groups = sum(
+        (last - first + 1).bit_length() for option in options for first, last, _ in option.segments
+    )
+    return groups * states
+
+
+def _allocate_dp(options: List[ProjectOption], budget_usd: Decimal) -> Dict[int, int]:
+    unit = _budget_unit(options)
+    states = _dp_states(options, budget_usd, unit)
+    best = np.zeros(states)
+    history = []
+
+    for option in options:
+        value = option.savings_per_panel
+        updated = best.copy()
+        choice = np.full(states, -1, dtype=np.int16)
+        segment_takes = []
+        for segment_index, (first, last, price) in enumerate(option.segments):
+            cost = int(price * 100) // unit
+            takes = []
+            segment_takes.append(takes)
+            if first * cost >= states:
+                continue
+            # Buy the first panels of the segment, then binary-split groups of the rest
+            current = np.full(states, -np.inf)
+            current[first * cost:] = best[:states - first * cost] + first * value
+            remaining, size = last - first, 1
+            while remaining > 0:
+                size = min(size, remaining)
+                remaining -= size
+                if size * cost < states:
+                    candidate = np.full(states, -np.inf)
+                    candidate[size * cost:] = current[:states - size * cost] + size * value
+                    take = candidate > current
+                    current = np.where(take, candidate, current)
+                    takes.append((size, take))
+                size *= 2
+            better = current > updated
+            updated = np.where(better, current, updated)
+            choice[better] = segment_index
+        history.append((choice, segment_takes))
+        best = updated
+
+    # best never decreases with the budget: spend the least that reaches the maximum
+    state = int(np.searchsorted(best, best[-1]))
+    allocation = {}
+    for option, (choice, segment_takes) in reversed(list(zip(options, history))):
+        segment_index = int(choice[state])
+        panels = 0
+        if segment_index >= 0:
+            first, _, price = option.segments[segment_index]
+            cost = int(price * 100) // unit
+            for size, take in reversed(segment_takes[segment_index]):
+                if take[state]:
+                    panels += size
+                    state -= size * cost
+            panels += first
+            state -= first * cost
+        allocation[option.project.pk] = panels
+    return allocation
+
+
+def _allocate_greedy(options: List[ProjectOption], budget_usd: Decimal) -> Dict[int, int]:
+    allocation = {option.project.pk: 0 for option in options}
+    remaining = budget_usd
+    candidates = list(options)
+
+    while candidates:
+        chosen = None
+        for option in candidates:
+            panels, cost = option.largest_purchase(remaining)
+            if panels:
+                key = (panels * option.savings_per_panel / float(cost), panels)
+                if chosen is None or key > chosen[0]:
+                    chosen = (key, option, panels, cost)
+        if chosen is None:
+            break
+        _, option, panels, cost = chosen
+        allocation[option.project.pk] = panels
+        remaining -= cost
+        candidates.remove(option)
+
+    return allocation
+
+
+def allocate_budget(
+    projects: Iterable[SolarProject],
+    budget_usd: Decimal,
+    pricing: Optional[PricingSnapshot] = None,
+    method: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Panels per project maximizing the annual savings of budget_usd.
+    method is 'dp' or 'greedy'; by default the dynamic program runs whenever
+    it fits in DP_MAX_CELLS.
+    """
+    pricing = pricing if pricing is not None else get_current_pricing()
+    options = [
+        option for option in (
+            ProjectOption(SolarInvestmentCalculator(project, None, pricing=pricing)) for project in projects
+        )
+        if option.segments
+    ]
+
+    if method is None:
+        states = _dp_states(options, budget_usd, _budget_unit(options))
+        method = 'dp' if _dp_cells(options, states) <= DP_MAX_CELLS else 'greedy'
+    allocation = (_allocate_dp if method == 'dp' else _allocate_greedy)(options, budget_usd)
+
+    allocations = []
+    for option in options:
+        panels = allocation[option.project.pk]
+        if not panels:
+            continue
+        record = quantize_batch_results(option.calculator.simulate_batch(
+            'panels', 0, [panels], apply_bill_restrictions=False
+        ))[0]
+        allocations.append({
+            'project': {
+                'id': option.project.id,
+                'name': option.project.name,
+                'available_power_kw': float(reservable_power(option.project)),
+            },
+            'number_of_panels': panels,
+            'price_per_panel_usd': float(option.calculator.tiers.price_for(panels)),
+            'total_investment_usd': float(record['total_investment_usd']),
+            'installed_power_kw': float(record['installed_power_kw']),
+            'annual_savings_ars': float(record['annual_savings_ars']),
+            'payback_period_years': float(record['payback_period_years']),
+            'roi_annual': float(record['roi_annual']),
+        })
+
+    invested_usd = sum(Decimal(str(item['total_investment_usd'])) for item in allocations)
+    annual_savings_ars = sum(item['annual_savings_ars'] for item in allocations)
+    invested_ars = float(invested_usd * pricing.exchange_rate)
+    return {
+        'method': method,
+        'budget_usd': float(budget_usd),
+        'invested_usd': float(invested_usd),
+        'remaining_usd': float(budget_usd - invested_usd),
+        'number_of_panels': sum(item['number_of_panels'] for item in allocations),
+        'annual_savings_ars': round(annual_savings_ars, 2),
+        'roi_annual': round(annual_savings_ars / invested_ars * 100, 2) if invested_ars else 0.0,
+        'allocations': allocations,
+    }
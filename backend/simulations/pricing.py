@@ -0,0 +1,236 @@
+"""
+Pricing inputs for the simulation engine
+
+A PricingSnapshot freezes every price the engine depends on (energy price,
+exchange rate, the PricingTier tables compiled into TierTable lookups and the
+tariff categories' block schedules compiled into TariffSchedule) so that a whole request is computed against one consistent set of values.
+
+get_current_pricing() keeps the active snapshot in a ProcessCache. Saving or
+deleting an EnergyPrice, ExchangeRate, PricingTier, TariffCategory or
+TariffBlock bumps its generation
+token, and every worker reloads its snapshot on the next check.
+
+Prices and exchange rates can be scheduled with a future effective date. A
+snapshot records when the next one takes effect (expires_at), and the cache
+reloads exactly then, so scheduled prices apply without any activation step.
+"""
+
+import hashlib
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, time
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+from django.utils import timezone
+
+from .caching import ProcessCache
+from .history import get_price_history
+from .models import EnergyPrice, ExchangeRate, PricingTier, TariffBlock, TariffCategory
+from .tariffs import TariffSchedule
+
+
+PRICING_GENERATION_CACHE_KEY = 'simulations:pricing:generation'
+
+
+# Fallback tiered panel pricing when no PricingTier rows exist:
+# (minimum number of panels, USD per panel). The price of the tier reached
+# by the total quantity applies to ALL panels.
+PANEL_PRICE_TIERS: Tuple[Tuple[int, Decimal], ...] = (
+    (1, Decimal('700')),
+    (10, Decimal('500')),
+    (100, Decimal('400')),
+)
+
+
+class TierTable:
+    """
+    Panel price tiers compiled into a sorted breakpoint array.
+    
+    Behaves as a sequence of (min_panels, price) pairs; price lookups bisect
+    the breakpoints, and numpy copies are kept for the batch engine.
+    """
+    
+    __slots__ = ('breakpoints', 'prices', 'breakpoint_array', 'price_array')
+    
+    def __init__(self, tiers: Iterable[Tuple[int, Decimal]]):
+        compiled = dict(sorted((int(tier_min), Decimal(price)) for tier_min, price in tiers))
+        if not compiled:
+            raise ValueError('La tabla de precios debe tener al menos un tramo')
+        self.breakpoints = tuple(compiled)
+        self.prices = tuple(compiled.values())
+        self.breakpoint_array = np.array(self.breakpoints, dtype=np.int64)
+        self.price_array = np.array([float(price) for price in self.prices])
+    
+    def __len__(self):
+        return len(self.breakpoints)
+    
+    def __getitem__(self, index):
+        return self.breakpoints[index], self.prices[index]
+    
+    def __iter__(self):
+        return zip(self.breakpoints, self.prices)
+    
+    def __eq__(self, other):
+        return isinstance(other, TierTable) and self.breakpoints == other.breakpoints and self.prices == other.prices
+    
+    def __hash__(self):
+        return hash((self.breakpoints, self.prices))
+    
+    def __repr__(self):
+        return f"TierTable({list(self)})"
+    
+    def price_for(self, number_of_panels: int) -> Decimal:
+        """USD per panel for a total quantity (below the first tier, its price)"""
+        return self.prices[max(bisect_right(self.breakpoints, number_of_panels) - 1, 0)]
+    
+    def cost_for(self, number_of_panels: int) -> Decimal:
+        """Total USD cost of number_of_panels"""
+        return number_of_panels * self.price_for(number_of_panels)
+    
+    def signature(self) -> str:
+        return ';'.join(f'{tier_min}:{price}' for tier_min, price in self)
+
+
+DEFAULT_TIER_TABLE = TierTable(PANEL_PRICE_TIERS)
+
+
+@dataclass(frozen=True)
+class PricingSnapshot:
+    """Immutable set of prices used by SolarInvestmentCalculator"""
+    
+    energy_price_ars_per_kwh: Decimal
+    exchange_rate: Decimal
+    panel_price_tiers: TierTable = DEFAULT_TIER_TABLE
+    project_price_tiers: Mapping[int, TierTable] = field(default_factory=lambda: MappingProxyType({}))
+    tariff_schedules: Mapping[int, TariffSchedule] = field(default_factory=lambda: MappingProxyType({}))
+    version: str = field(default='', compare=False)
+    # Epoch seconds at which a scheduled price takes effect (None: nothing scheduled)
+    expires_at: Optional[float] = field(default=None, compare=False)
+    
+    def __post_init__(self):
+        if not isinstance(self.panel_price_tiers, TierTable):
+            object.__setattr__(self, 'panel_price_tiers', TierTable(self.panel_price_tiers))
+        if not self.version:
+            object.__setattr__(self, 'version', self._compute_version())
+    
+    def _compute_version(self) -> str:
+        """Stable stamp derived from the values, identical across processes"""
+        payload = '|'.join([
+            str(self.energy_price_ars_per_kwh),
+            str(self.exchange_rate),
+            self.panel_price_tiers.signature(),
+        ] + [
+            f'{project_id}={self.project_price_tiers[project_id].signature()}'
+            for project_id in sorted(self.project_price_tiers)
+        ] + [
+            f'tariff{tariff_category_id}={self.tariff_schedules[tariff_category_id].signature()}'
+            for tariff_category_id in sorted(self.tariff_schedules)
+        ])
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+    
+    def __reduce__(self):
+        # MappingProxyType does not pickle; process pools receive plain dicts
+        return (_unpickle_snapshot, ({
+            'energy_price_ars_per_kwh': self.energy_price_ars_per_kwh,
+            'exchange_rate': self.exchange_rate,
+            'panel_price_tiers': self.panel_price_tiers,
+            'project_price_tiers': dict(self.project_price_tiers),
+            'tariff_schedules': dict(self.tariff_schedules),
+            'version': self.version,
+            'expires_at': self.expires_at,
+        },))
+    
+    def tiers_for(self, project_id: Optional[int]) -> TierTable:
+        """Project-specific tiers when configured, otherwise the global default"""
+        return self.project_price_tiers.get(project_id, self.panel_price_tiers)
+    
+    def schedule_for(self, tariff_category_id: Optional[int]) -> Optional[TariffSchedule]:
+        """Block schedule of a tariff category, None when it bills a flat energy price"""
+        return self.tariff_schedules.get(tariff_category_id)
+    
+    @classmethod
+    def load(cls) -> 'PricingSnapshot':
+        """Read the current prices and compile the tier tables and tariff schedules (seven queries)"""
+        tiers_by_project = {}
+        for project_id, min_panels, price in PricingTier.objects.values_list(
+            'project_id', 'min_panels', 'price_per_panel_usd'
+        ):
+            tiers_by_project.setdefault(project_id, []).append((min_panels, price))
+        
+        default_tiers = tiers_by_project.pop(None, None)
+        
+        blocks_by_category = {}
+        for tariff_category_id, from_kwh, price in TariffBlock.objects.values_list(
+            'tariff_category_id', 'from_kwh', 'price_ars_per_kwh'
+        ):
+            blocks_by_category.setdefault(tariff_category_id, []).append((from_kwh, price))
+        charges_by_category = {
+            tariff_category_id: (fixed_charge, tax)
+            for tariff_category_id, fixed_charge, tax in TariffCategory.objects.filter(
+                id__in=blocks_by_category
+            ).values_list('id', 'fixed_charge_ars', 'tax_percentage')
+        }
+        
+        return cls(
+            energy_price_ars_per_kwh=Decimal(str(EnergyPrice.get_current_price())),
+            exchange_rate=Decimal(str(ExchangeRate.get_latest_rate())),
+            panel_price_tiers=TierTable(default_tiers) if default_tiers else DEFAULT_TIER_TABLE,
+            project_price_tiers=MappingProxyType({
+                project_id: TierTable(tiers) for project_id, tiers in tiers_by_project.items()
+            }),
+            tariff_schedules=MappingProxyType({
+                tariff_category_id: TariffSchedule(blocks, *charges_by_category[tariff_category_id])
+                for tariff_category_id, blocks in blocks_by_category.items()
+            }),
+            expires_at=next_change_at(),
+        )
+
+
+def _unpickle_snapshot(state) -> PricingSnapshot:
+    state['project_price_tiers'] = MappingProxyType(state['project_price_tiers'])
+    state['tariff_schedules'] = MappingProxyType(state['tariff_schedules'])
+    return PricingSnapshot(**state)
+
+
+def next_change_at() -> Optional[float]:
+    """Epoch seconds of the local midnight starting the next scheduled price or exchange rate"""
+    scheduled_dates = [
+        scheduled_date for scheduled_date in (
+            EnergyPrice.get_next_effective_date(),
+            ExchangeRate.get_next_rate_date(),
+        ) if scheduled_date is not None
+    ]
+    if not scheduled_dates:
+        return None
+    return timezone.make_aware(datetime.combine(min(scheduled_dates), time.min)).timestamp()
+
+
+_pricing_cache = ProcessCache(PRICING_GENERATION_CACHE_KEY, PricingSnapshot.load)
+
+
+def get_current_pricing() -> PricingSnapshot:
+    """Return the active PricingSnapshot, hitting the database only on change"""
+    return _pricing_cache.get()
+
+
+def invalidate_pricing_cache():
+    """Drop the local snapshot and tell every other worker to reload theirs"""
+    _pricing_cache.invalidate()
+
+
+def get_pricing_as_of(as_of: date) -> PricingSnapshot:
+    """
+    The current snapshot with the energy price and exchange rate that were
+    in force on as_of (see history.py). Panel tiers and tariff schedules are
+    not historized and keep their current values.
+    """
+    history = get_price_history()
+    return replace(
+        get_current_pricing(),
+        energy_price_ars_per_kwh=history.energy_price_at(as_of),
+        exchange_rate=history.exchange_rate_at(as_of),
+        version=''
+    )
@@ -0,0 +1,129 @@
+"""
+Physical parameters of the simulation engine
+
+An EngineProfile gathers every physical input of the formulas for one project:
+the panel power (SolarProject.panel_power_wp), the generation factor and
+performance ratio (SiteSettings) and the constants of the savings formula
+documented in NUEVA_FORMULA_AHORROS.md, and precomputes the per-panel
+coefficients the calculator multiplies by.
+
+Profiles are cached per process and dropped when SiteSettings or a
+SolarProject is saved (see signals.py).
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Tuple
+
+from core.models import SiteSettings
+from projects.models import SolarProject
+
+from .caching import ProcessCache
+
+
+ENGINE_PROFILE_GENERATION_CACHE_KEY = 'simulations:engine_profile:generation'
+
+# Savings formula: panels × 0.66 × energy price × 24 × 30 × 0.19
+PANEL_EFFICIENCY_FACTOR = Decimal('0.66')
+SYSTEM_PERFORMANCE_FACTOR = Decimal('0.19')
+HOURS_PER_DAY = Decimal('24')
+DAYS_PER_MONTH = Decimal('30')
+
+# Used when SiteSettings leaves a value empty
+DEFAULT_ANNUAL_GENERATION_FACTOR = Decimal('1500')
+DEFAULT_PERFORMANCE_RATIO = Decimal('0.85')
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Physical parameters of one project and their precomputed coefficients"""
+
+    panel_power_kw: Decimal
+    annual_generation_factor: Decimal = DEFAULT_ANNUAL_GENERATION_FACTOR
+    performance_ratio: Decimal = DEFAULT_PERFORMANCE_RATIO
+    panel_efficiency_factor: Decimal = PANEL_EFFICIENCY_FACTOR
+    system_performance_factor: Decimal = SYSTEM_PERFORMANCE_FACTOR
+
+    # Annual kWh produced per panel (panels and investment modes)
+    annual_generation_kwh_per_panel: Decimal = field(init=False)
+    # Monthly kWh counted per kW in the savings formula (24 × 30 × 0.19)
+    monthly_kwh_per_kw: Decimal = field(init=False)
+    # Monthly kWh saved per panel; times the energy price it is the ARS saving
+    monthly_savings_kwh_per_panel: Decimal = field(init=False)
+    # Stable stamp of the parameters, identical across processes
+    version: str = field(init=False, compare=False)
+
+    def __post_init__(self):
+        monthly_kwh_per_kw = HOURS_PER_DAY * DAYS_PER_MONTH * self.system_performance_factor
+        object.__setattr__(
+            self, 'annual_generation_kwh_per_panel',
+            self.panel_power_kw * self.annual_generation_factor * self.performance_ratio
+        )
+        object.__setattr__(self, 'monthly_kwh_per_kw', monthly_kwh_per_kw)
+        object.__setattr__(
+            self, 'monthly_savings_kwh_per_panel', self.panel_efficiency_factor * monthly_kwh_per_kw
+        )
+        # Normalized so 0.55 and 0.550 (a saved DecimalField) share a version
+        payload = '|'.join(format(Decimal(value).normalize(), 'f') for value in (
+            self.panel_power_kw, self.annual_generation_factor, self.performance_ratio,
+            self.panel_efficiency_factor, self.system_performance_factor,
+        ))
+        object.__setattr__(self, 'version', hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12])
+
+    def savings_per_panel_ars(self, energy_price_ars_per_kwh: Decimal) -> Decimal:
+        """Monthly ARS saving of one panel at the given energy price"""
+        return self.monthly_savings_kwh_per_panel * energy_price_ars_per_kwh
+
+
+class _ProfileRegistry:
+    """SiteSettings values plus the profiles compiled from them"""
+
+    def __init__(self, annual_generation_factor: Decimal, performance_ratio: Decimal):
+        self.annual_generation_factor = annual_generation_factor
+        self.performance_ratio = performance_ratio
+        self._lock = threading.Lock()
+        self._profiles: Dict[Tuple[int, Decimal], EngineProfile] = {}
+
+    @classmethod
+    def load(cls) -> '_ProfileRegistry':
+        # Read-only on purpose: SiteSettings.get_settings() may save, and the
+        # resulting post_save would invalidate this cache while it loads
+        site_settings = SiteSettings.objects.filter(pk=1).first()
+        return cls(
+            annual_generation_factor=(
+                site_settings and site_settings.default_annual_generation_factor
+            ) or DEFAULT_ANNUAL_GENERATION_FACTOR,
+            performance_ratio=(
+                site_settings and site_settings.default_performance_ratio
+            ) or DEFAULT_PERFORMANCE_RATIO,
+        )
+
+    def profile_for(self, project: SolarProject) -> EngineProfile:
+        # The panel power is part of the key so an edited, unsaved instance
+        # never reads a profile compiled for its previous value
+        key = (project.pk, project.panel_power_wp)
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = EngineProfile(
+                panel_power_kw=Decimal(project.panel_power_wp) / 1000,
+                annual_generation_factor=Decimal(self.annual_generation_factor),
+                performance_ratio=Decimal(self.performance_ratio),
+            )
+            with self._lock:
+                self._profiles[key] = profile
+        return profile
+
+
+_profile_cache = ProcessCache(ENGINE_PROFILE_GENERATION_CACHE_KEY, _ProfileRegistry.load)
+
+
+def get_engine_profile(project: SolarProject) -> EngineProfile:
+    """Return the cached EngineProfile of a project"""
+    return _profile_cache.get().profile_for(project)
+
+
+def invalidate_engine_profiles():
+    """Drop every compiled profile, in this and every other worker"""
+    _profile_cache.invalidate()
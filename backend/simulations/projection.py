@@ -0,0 +1,149 @@
+"""
+Multi-year cash-flow projection for solar investments
+
+Projects yearly USD cash flows over the life of the system, applying panel
+degradation, energy tariff escalation and exchange rate drift, and derives
+cumulative cash flow, simple and discounted payback, NPV and IRR.
+
+Every function works on arrays of scenarios at once: inputs have shape (n,)
+and yearly outputs have shape (n, years + 1), year 0 being the investment.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+DEFAULT_PROJECTION_YEARS = 25
+DEFAULT_DISCOUNT_RATE_PERCENTAGE = 8
+
+# IRR search bracket (annual rate as a fraction) and bisection steps
+IRR_LOWER_BOUND = -0.99
+IRR_UPPER_BOUND = 10.0
+IRR_ITERATIONS = 80
+
+
+def yearly_cash_flows(
+    total_investment_usd: np.ndarray,
+    annual_savings_ars: np.ndarray,
+    exchange_rate: float,
+    years: int = DEFAULT_PROJECTION_YEARS,
+    degradation: float = 0.005,
+    tariff_escalation: float = 0.0,
+    exchange_rate_drift: float = 0.0
+) -> np.ndarray:
+    """
+    USD cash flow per scenario and year.
+
+    Year t (t >= 1) savings are the first-year ARS savings scaled by
+    (1 - degradation)^(t-1) * (1 + tariff_escalation)^(t-1), converted at
+    exchange_rate * (1 + exchange_rate_drift)^(t-1).
+    """
+    elapsed = np.arange(years, dtype=np.float64)
+    yearly_factor = (
+        (1 - degradation) ** elapsed
+        * (1 + tariff_escalation) ** elapsed
+        / (exchange_rate * (1 + exchange_rate_drift) ** elapsed)
+    )
+
+    flows = np.empty((len(total_investment_usd), years + 1))
+    flows[:, 0] = -np.asarray(total_investment_usd, dtype=np.float64)
+    flows[:, 1:] = np.asarray(annual_savings_ars, dtype=np.float64)[:, None] * yearly_factor
+    return flows
+
+
+def net_present_value(flows: np.ndarray, rate) -> np.ndarray:
+    """NPV of every row of flows at rate (scalar or one rate per row)"""
+    rate = np.asarray(rate, dtype=np.float64)
+    if rate.ndim:
+        rate = rate[:, None]
+    discount = (1 + rate) ** -np.arange(flows.shape[1], dtype=np.float64)
+    return (flows * discount).sum(axis=1)
+
+
+def internal_rate_of_return(flows: np.ndarray) -> np.ndarray:
+    """
+    Vectorized IRR by bisection on every row at once.
+
+    Assumes conventional cash flows (investment first, then savings), for which
+    NPV decreases monotonically with the rate. Rows without a root in
+    [IRR_LOWER_BOUND, IRR_UPPER_BOUND] return NaN.
+    """
+    size = flows.shape[0]
+    low = np.full(size, IRR_LOWER_BOUND)
+    high = np.full(size, IRR_UPPER_BOUND)
+    npv_low = net_present_value(flows, low)
+    npv_high = net_present_value(flows, high)
+    has_root = np.sign(npv_low) != np.sign(npv_high)
+
+    for _ in range(IRR_ITERATIONS):
+        middle = (low + high) / 2
+        npv_middle = net_present_value(flows, middle)
+        same_side = np.sign(npv_middle) == np.sign(npv_low)
+        low = np.where(same_side, middle, low)
+        npv_low = np.where(same_side, npv_middle, npv_low)
+        high = np.where(same_side, high, middle)
+
+    return np.where(has_root, (low + high) / 2, np.nan)
+
+
+def payback_years(flows: np.ndarray) -> np.ndarray:
+    """
+    Years until cumulative cash flow turns non-negative, interpolated within
+    the crossing year. NaN when the investment is not recovered.
+    """
+    cumulative = np.cumsum(flows, axis=1)
+    recovered = cumulative >= 0
+    crossing_year = np.argmax(recovered, axis=1)
+    rows = np.arange(flows.shape[0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        previous = cumulative[rows, np.maximum(crossing_year - 1, 0)]
+        fraction = -previous / flows[rows, crossing_year]
+        years = np.where(crossing_year > 0, crossing_year - 1 + fraction, 0.0)
+
+    return np.where(recovered.any(axis=1), years, np.nan)
+
+
+def project_cash_flows(
+    total_investment_usd: np.ndarray,
+    annual_savings_ars: np.ndarray,
+    exchange_rate: float,
+    years: int = DEFAULT_PROJECTION_YEARS,
+    degradation: float = 0.005,
+    tariff_escalation: float = 0.0,
+    exchange_rate_drift: float = 0.0,
+    discount_rate: float = DEFAULT_DISCOUNT_RATE_PERCENTAGE / 100
+) -> Dict[str, np.ndarray]:
+    """Full projection for many scenarios; rates are annual fractions"""
+    flows = yearly_cash_flows(
+        total_investment_usd, annual_savings_ars, exchange_rate,
+        years, degradation, tariff_escalation, exchange_rate_drift
+    )
+    discounted = flows * (1 + discount_rate) ** -np.arange(years + 1, dtype=np.float64)
+
+    return {
+        'cash_flow_usd': flows,
+        'cumulative_cash_flow_usd': np.cumsum(flows, axis=1),
+        'payback_years': payback_years(flows),
+        'discounted_payback_years': payback_years(discounted),
+        'npv_usd': discounted.sum(axis=1),
+        'irr': internal_rate_of_return(flows),
+    }
+
+
+def projection_records(projection: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Split a projection into one JSON-ready dict per scenario"""
+    def rounded(value):
+        return None if np.isnan(value) else round(float(value), 2)
+
+    records = []
+    for index in range(len(projection['npv_usd'])):
+        records.append({
+            'npv_usd': rounded(projection['npv_usd'][index]),
+            'irr_percentage': rounded(projection['irr'][index] * 100),
+            'payback_years': rounded(projection['payback_years'][index]),
+            'discounted_payback_years': rounded(projection['discounted_payback_years'][index]),
+            'cumulative_cash_flow_usd': np.round(projection['cumulative_cash_flow_usd'][index], 2).tolist(),
+        })
+    return records
@@ -0,0 +1,113 @@
+"""
+Ranking of projects for one bill
+
+ProjectRanker simulates one bill and input against many projects. The inputs
+the formulas read from a project are its tier table and its EngineProfile,
+which most projects share, so projects are grouped by that pair and each group
+is simulated once with the batch engine against a single pricing snapshot:
+the number of engine calls grows with the number of distinct groups, not with
+the number of projects. Each group's result is also serialized once; only
+the capacity check, the id and the project fields are filled in per project.
+"""
+
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from projects.models import SolarProject
+
+from .models import TariffCategory
+from .pricing import PricingSnapshot, get_current_pricing
+from .profiles import get_engine_profile
+from .reservations import reservable_power
+from .results import SimulationResult
+from .serializers import SimulationResultSerializer
+from .simulation_engine import SolarInvestmentCalculator, capacity_check, quantize_batch_results
+
+
+# Ranking criteria: result column and whether higher values rank first
+RANKING_ORDERS = {
+    'payback': ('payback_period_years', False),
+    'roi': ('roi_annual', True),
+    'coverage': ('bill_coverage_achieved', True),
+}
+
+
+class ProjectRanker:
+    """Simulates one bill against a set of projects and ranks them"""
+
+    def __init__(
+        self,
+        projects: Iterable[SolarProject],
+        tariff_category: Optional[TariffCategory],
+        pricing: Optional[PricingSnapshot] = None
+    ):
+        self.tariff_category = tariff_category
+        self.pricing = pricing if pricing is not None else get_current_pricing()
+        # (tier table, profile) -> projects simulated by the same engine inputs
+        self.groups: Dict[Any, List[SolarProject]] = {}
+        for project in projects:
+            key = (self.pricing.tiers_for(project.pk), get_engine_profile(project))
+            self.groups.setdefault(key, []).append(project)
+
+    def rank(
+        self,
+        simulation_type: str,
+        monthly_bill_ars,
+        input_value,
+        order_by: str = 'payback',
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Projects ranked by order_by; those without capacity for the resulting
+        system come after every project that can host it.
+        """
+        column, descending = RANKING_ORDERS[order_by]
+        entries = []
+
+        for (_, profile), projects in self.groups.items():
+            calculator = SolarInvestmentCalculator(
+                projects[0], self.tariff_category, pricing=self.pricing, profile=profile
+            )
+            record = quantize_batch_results(
+                calculator.simulate_batch(simulation_type, monthly_bill_ars, input_value)
+            )[0]
+            # Serialized once per group; only the project fields differ between its projects
+            simulation = SimulationResultSerializer.to_representation(SimulationResult(
+                project=projects[0],
+                tariff_category=self.tariff_category,
+                simulation_type=simulation_type,
+                **record
+            ))
+            for project in projects:
+                check = capacity_check(record['installed_power_kw'], reservable_power(project))
+                entries.append((project, float(record[column]), simulation, check))
+
+        def sort_key(entry):
+            project, value, _, check = entry
+            return (not check['has_capacity'], -value if descending else value, project.pk)
+
+        entries.sort(key=sort_key)
+        if limit is not None:
+            entries = entries[:limit]
+
+        return [
+            {
+                'rank': rank,
+                'project': {
+                    'id': project.id,
+                    'name': project.name,
+                    'location': project.location,
+                    'status': project.status,
+                    'available_power_kw': check['available_power_kw'],
+                },
+                'simulation': dict(
+                    simulation,
+                    id=str(uuid.uuid4()),
+                    project_name=project.name,
+                    project_location=project.location,
+                    project_commercial_whatsapp=project.commercial_whatsapp
+                ),
+                'capacity_check': check,
+            }
+            for rank, (project, _, simulation, check) in enumerate(entries, start=1)
+        ]
@@ -0,0 +1,241 @@
+"""
+Capacity reservations
+
+reserve_capacity() holds power of a project for an investor until the hold is
+confirmed, released or expires. Every change is a conditional F() update
+(filter on the amount still being there, then subtract it), never a
+read-modify-write, so concurrent holds can never oversubscribe a project.
+
+Holds do not all go through the SolarProject row: each project lends its
+available power to CAPACITY_RESERVATION_SHARDS CapacityShard rows in chunks
+of CAPACITY_SHARD_REFILL_KW, and a hold takes power from a random shard. On a
+hot project, concurrent holds therefore lock different rows, and the project
+row is only touched to refill a shard. When a hold cannot be served by a single
+shard, the shards are pooled back into the project row and the hold retried,
+so a project is never reported full while it still has the power.
+
+The ledger (CapacityReservation) records where each hold came from: a released
+or expired hold goes back to its shard. The sweeper (sweep_capacity_reservations)
+expires holds past their deadline and returns the power of idle shards to the
+project, so at rest SolarProject.available_power is exact; under load it
+lags by the power parked in shards, at most shards x refill. Capacity checks
+and limits therefore read reservable_power() (or the reservable_power_kw
+annotation of with_reservable_power() for querysets), never the raw column.
+"""
+
+import random
+from datetime import timedelta
+from decimal import ROUND_CEILING, Decimal
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from projects.models import SolarProject
+
+from .models import CapacityReservation, CapacityShard, InvestmentSimulation
+
+
+class CapacityUnavailable(Exception):
+    """The project does not have the requested power left"""
+
+
+def shard_count() -> int:
+    return getattr(settings, 'CAPACITY_RESERVATION_SHARDS', 8)
+
+
+def refill_kw() -> Decimal:
+    return Decimal(str(getattr(settings, 'CAPACITY_SHARD_REFILL_KW', 10)))
+
+
+def reserved_power_kw(power_kw: Decimal) -> Decimal:
+    """power_kw rounded up to the precision project and shard power are stored with"""
+    return power_kw.quantize(Decimal('0.01'), ROUND_CEILING)
+
+
+def panels_power_kw(project: SolarProject, number_of_panels: int) -> Decimal:
+    """Power of number_of_panels panels, rounded up to the stored precision"""
+    return reserved_power_kw(number_of_panels * project.panel_power_wp / 1000)
+
+
+# Projects whose shard rows are known to exist
+_sharded_projects = set()
+
+
+def ensure_shards(project_id: int):
+    """Create the (empty) shard rows of a project once"""
+    if project_id in _sharded_projects:
+        return
+    CapacityShard.objects.bulk_create(
+        [CapacityShard(project_id=project_id, index=index) for index in range(shard_count())],
+        ignore_conflicts=True
+    )
+    # Remembered once committed: rolled back shards must be created again
+    transaction.on_commit(lambda: _sharded_projects.add(project_id))
+
+
+def _take_from_shard(project_id: int, index: int, power_kw: Decimal) -> bool:
+    return CapacityShard.objects.filter(
+        project_id=project_id, index=index, available_kw__gte=power_kw
+    ).update(available_kw=F('available_kw') - power_kw, updated_at=timezone.now()) == 1
+
+
+def _credit_shard(project_id: int, index: int, power_kw: Decimal):
+    CapacityShard.objects.filter(project_id=project_id, index=index).update(
+        available_kw=F('available_kw') + power_kw, updated_at=timezone.now()
+    )
+
+
+def _take_from_project(project_id: int, power_kw: Decimal) -> bool:
+    return SolarProject.objects.filter(
+        pk=project_id, available_power__gte=power_kw
+    ).update(available_power=F('available_power') - power_kw) == 1
+
+
+def _take_with_refill(project_id: int, index: int, power_kw: Decimal) -> bool:
+    """Take power_kw from the project row, lending a refill chunk to the shard on the way"""
+    chunk = max(power_kw, refill_kw())
+    for amount in (chunk, power_kw) if chunk > power_kw else (power_kw,):
+        with transaction.atomic():
+            if _take_from_project(project_id, amount):
+                if amount > power_kw:
+                    _credit_shard(project_id, index, amount - power_kw)
+                return True
+    return False
+
+
+def _return_shards(shards) -> Decimal:
+    """Move the power of shards back to their projects"""
+    returned = Decimal('0')
+    for shard_id, project_id, amount in shards.filter(available_kw__gt=0).values_list(
+        'id', 'project_id', 'available_kw'
+    ):
+        with transaction.atomic():
+            # Skipped if a hold took from the shard since it was read
+            if CapacityShard.objects.filter(pk=shard_id, available_kw__gte=amount).update(
+                available_kw=F('available_kw') - amount, updated_at=timezone.now()
+            ):
+                SolarProject.objects.filter(pk=project_id).update(available_power=F('available_power') + amount)
+                returned += amount
+    return returned
+
+
+def _acquire(project_id: int, power_kw: Decimal) -> Optional[int]:
+    """Index of the shard power_kw was taken on behalf of, None if the project is full"""
+    shards = shard_count()
+    home = random.randrange(shards)
+    if _take_from_shard(project_id, home, power_kw) or _take_with_refill(project_id, home, power_kw):
+        return home
+    for index in random.sample(range(shards), shards):
+        if index != home and _take_from_shard(project_id, index, power_kw):
+            return index
+    # The power left may be spread over several shards
+    if _return_shards(CapacityShard.objects.filter(project_id=project_id)):
+        if _take_with_refill(project_id, home, power_kw):
+            return home
+    return None
+
+
+def reserve_capacity(
+    project: SolarProject,
+    power_kw: Decimal,
+    user=None,
+    simulation: Optional[InvestmentSimulation] = None,
+    hold_seconds: Optional[int] = None
+) -> CapacityReservation:
+    """Hold power_kw of project; raises CapacityUnavailable when it is not there"""
+    if hold_seconds is None:
+        hold_seconds = getattr(settings, 'CAPACITY_RESERVATION_HOLD_SECONDS', 15 * 60)
+    ensure_shards(project.pk)
+    # e.g. the 3-decimal installed power of a simulation: never hold less than it
+    power_kw = reserved_power_kw(power_kw)
+
+    with transaction.atomic():
+        index = _acquire(project.pk, power_kw)
+        if index is None:
+            raise CapacityUnavailable(f'El proyecto no tiene {power_kw} kWp disponibles')
+        return CapacityReservation.objects.create(
+            project=project,
+            user=user,
+            simulation=simulation,
+            power_kw=power_kw,
+            shard_index=index,
+            expires_at=timezone.now() + timedelta(seconds=hold_seconds)
+        )
+
+
+def confirm_reservation(reservation: CapacityReservation) -> bool:
+    """Turn a live hold into a permanent allocation; False if it is no longer held"""
+    now = timezone.now()
+    confirmed = CapacityReservation.objects.filter(
+        pk=reservation.pk, status=CapacityReservation.STATUS_HELD, expires_at__gt=now
+    ).update(status=CapacityReservation.STATUS_CONFIRMED, closed_at=now)
+    if confirmed:
+        reservation.status, reservation.closed_at = CapacityReservation.STATUS_CONFIRMED, now
+    return bool(confirmed)
+
+
+def _close_hold(reservation_id, project_id: int, shard_index: int, power_kw: Decimal, status: str) -> bool:
+    now = timezone.now()
+    with transaction.atomic():
+        # Only the first of release, expiry and confirmation moves a hold out of 'held'
+        closed = CapacityReservation.objects.filter(
+            pk=reservation_id, status=CapacityReservation.STATUS_HELD
+        ).update(status=status, closed_at=now)
+        if closed:
+            _credit_shard(project_id, shard_index, power_kw)
+    return bool(closed)
+
+
+def release_reservation(reservation: CapacityReservation) -> bool:
+    """Give the power of a hold back; False if it is no longer held"""
+    released = _close_hold(
+        reservation.pk, reservation.project_id, reservation.shard_index, reservation.power_kw,
+        CapacityReservation.STATUS_RELEASED
+    )
+    if released:
+        reservation.refresh_from_db()
+    return released
+
+
+def expire_reservations() -> int:
+    """Give back the power of every hold past its deadline"""
+    expired = CapacityReservation.objects.filter(
+        status=CapacityReservation.STATUS_HELD, expires_at__lte=timezone.now()
+    ).values_list('id', 'project_id', 'shard_index', 'power_kw')
+    return sum(
+        _close_hold(*hold, CapacityReservation.STATUS_EXPIRED) for hold in expired.iterator()
+    )
+
+
+def return_idle_shards() -> Decimal:
+    """Return to their projects the power of shards no hold has used for a while"""
+    idle_before = timezone.now() - timedelta(seconds=getattr(settings, 'CAPACITY_SHARD_IDLE_SECONDS', 60))
+    return _return_shards(CapacityShard.objects.filter(updated_at__lt=idle_before))
+
+
+def with_reservable_power(queryset):
+    """Annotate a SolarProject queryset with reservable_power_kw (see reservable_power)"""
+    parked = CapacityShard.objects.filter(project=OuterRef('pk')).order_by().values('project').annotate(
+        total=Sum('available_kw')
+    ).values('total')
+    return queryset.annotate(reservable_power_kw=ExpressionWrapper(
+        F('available_power') + Coalesce(Subquery(parked), Value(Decimal('0'))),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    ))
+
+
+def reservable_power(project: SolarProject) -> Decimal:
+    """
+    Power of a project that can still be held: its own plus what its shards
+    hold. Projects loaded through with_reservable_power() are not queried again.
+    """
+    annotated = getattr(project, 'reservable_power_kw', None)
+    if annotated is not None:
+        return annotated
+    return with_reservable_power(SolarProject.objects.filter(pk=project.pk)).values_list(
+        'reservable_power_kw', flat=True
+    ).get()
@@ -0,0 +1,231 @@
+"""
+Bulk re-simulation of stored simulations
+
+resimulate_simulations() re-evaluates stored InvestmentSimulation rows under
+one PricingSnapshot. Rows are read in primary-key chunks (keyset pagination,
+so memory stays bounded whatever the table size), computed with
+SolarInvestmentCalculator.resimulate_batch, in a process pool when
+workers > 1, and written back with one parameterized UPDATE per chunk. The previous results of every
+row that changes are kept in InvestmentSimulationHistory.
+
+Compact simulations (see storage.py) stay compact: their previous results are
+derived from their own snapshot and they are pointed at the new one. Compact
+rows saved by another ENGINE_VERSION cannot be derived: they are skipped and
+counted as stale, to be materialized or saved again first.
+
+Workers only compute: they receive plain rows plus the pricing snapshots and
+engine profiles, and never touch the database.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import django
+from django.db import connection, transaction
+
+from projects.models import SolarProject
+
+from .models import InvestmentSimulation, InvestmentSimulationHistory, TariffCategory
+from .pricing import PricingSnapshot, get_current_pricing
+from .profiles import EngineProfile, get_engine_profile
+from .simulation_engine import ENGINE_VERSION, SIMULATION_INPUT_FIELDS, SolarInvestmentCalculator
+from .storage import StaleEngineVersion, as_stored, check_engine_version, load_snapshot, register_snapshot
+
+
+RESIMULATION_CHUNK_SIZE = 2000
+RESIMULATION_BULK_BATCH_SIZE = 500
+# Chunks queued per worker, bounding how many rows are held in memory
+RESIMULATION_CHUNKS_PER_WORKER = 2
+
+INPUT_FIELDS = [
+    'id', 'project_id', 'tariff_category_id', 'simulation_type', 'monthly_bill_ars',
+    'bill_coverage_percentage', 'number_of_panels', 'investment_amount_usd', 'snapshot_id', 'engine_version',
+]
+RESULT_FIELDS = InvestmentSimulation.RESULT_FIELDS
+# Columns written back: the results plus what compact rows derive them from
+UPDATE_FIELDS = RESULT_FIELDS + ['snapshot', 'engine_version']
+
+
+def _derived_fields(row: Dict) -> List[str]:
+    """Result columns a compact row leaves NULL (none for full rows)"""
+    if row['snapshot_id'] is None:
+        return []
+    return [field for field in RESULT_FIELDS if row[field] is None]
+
+
+def _is_stale(row: Dict) -> bool:
+    """Compact row saved by another ENGINE_VERSION, whose results this engine cannot derive"""
+    if not _derived_fields(row):
+        return False
+    try:
+        check_engine_version(row['engine_version'])
+    except StaleEngineVersion:
+        return True
+    return False
+
+
+def _iter_chunks(queryset, chunk_size: int):
+    """Input and current result values of queryset, chunk_size rows at a time"""
+    fields = list(dict.fromkeys(INPUT_FIELDS + RESULT_FIELDS))
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page.values(*fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1]['id']
+
+
+def _update_results(changed: List[Tuple[object, Dict]]):
+    """
+    Write new results with a single executemany. bulk_update builds a CASE
+    expression per row and field, which costs milliseconds per row.
+    """
+    meta = InvestmentSimulation._meta
+    quote_name = connection.ops.quote_name
+    fields = [meta.get_field(name) for name in UPDATE_FIELDS]
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote_name(meta.db_table),
+        ', '.join(f'{quote_name(field.column)} = %s' for field in fields),
+        quote_name(meta.pk.column)
+    )
+    params = [
+        [field.get_db_prep_save(values[field.attname], connection) for field in fields]
+        + [meta.pk.get_db_prep_value(simulation_id, connection)]
+        for simulation_id, values in changed
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _compute_chunk(
+    pricing: PricingSnapshot,
+    profiles: Dict[int, EngineProfile],
+    snapshots: Dict[str, Tuple[PricingSnapshot, EngineProfile]],
+    rows: List[Dict]
+) -> List[Tuple[object, Dict, Optional[Dict]]]:
+    """
+    New results of a chunk, one batch call per project, tariff and type, with
+    the previous results of compact rows derived from their own snapshot
+    """
+    def batch(rows_of_group, project_id, tariff_category_id, group_pricing, profile):
+        calculator = SolarInvestmentCalculator(
+            SolarProject(pk=project_id),
+            TariffCategory(pk=tariff_category_id),
+            pricing=group_pricing,
+            profile=profile
+        )
+        return calculator.resimulate_batch([SimpleNamespace(**row) for row in rows_of_group])
+
+    groups = {}
+    compact_groups = {}
+    for row in rows:
+        # Rows without their input value cannot be simulated again
+        if row[SIMULATION_INPUT_FIELDS[row['simulation_type']]] is None or _is_stale(row):
+            continue
+        groups.setdefault((row['project_id'], row['tariff_category_id']), []).append(row)
+        if _derived_fields(row):
+            compact_groups.setdefault(
+                (row['project_id'], row['tariff_category_id'], row['snapshot_id']), []
+            ).append(row)
+
+    previous = {}
+    for (project_id, tariff_category_id, snapshot_id), group in compact_groups.items():
+        records = batch(group, project_id, tariff_category_id, *snapshots[snapshot_id])
+        previous.update((row['id'], record) for row, record in zip(group, records))
+
+    results = []
+    for (project_id, tariff_category_id), group in groups.items():
+        records = batch(group, project_id, tariff_category_id, pricing, profiles[project_id])
+        results.extend((row['id'], record, previous.get(row['id'])) for row, record in zip(group, records))
+    return results
+
+
+def resimulate_simulations(
+    queryset=None,
+    pricing: Optional[PricingSnapshot] = None,
+    chunk_size: int = RESIMULATION_CHUNK_SIZE,
+    workers: int = 1,
+    dry_run: bool = False,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None
+) -> Dict[str, int]:
+    """
+    Recalculate the simulations in queryset (all by default) with pricing
+    (the current prices by default). Returns how many rows were processed,
+    how many changed and how many were skipped as stale compact rows; with
+    dry_run nothing is written.
+    """
+    if queryset is None:
+        queryset = InvestmentSimulation.objects.all()
+    pricing = pricing if pricing is not None else get_current_pricing()
+    profiles = {
+        project.pk: get_engine_profile(project)
+        for project in SolarProject.objects.only('id', 'panel_power_wp')
+    }
+    totals = {'processed': 0, 'updated': 0, 'stale': 0}
+
+    def write(rows, results):
+        rows_by_id = {row['id']: row for row in rows}
+        changed = []
+        history = []
+        for simulation_id, record, derived in results:
+            row = rows_by_id[simulation_id]
+            # Compared as the columns store them, so unchanged prices write nothing
+            old = {field: row[field] for field in RESULT_FIELDS}
+            old.update({field: as_stored(field, derived[field]) for field in _derived_fields(row)})
+            new = {field: as_stored(field, record[field]) for field in RESULT_FIELDS}
+            if old == new:
+                continue
+
+            values = dict(new, snapshot_id=None, engine_version='')
+            if row['snapshot_id'] is not None:
+                # Stays compact: NULL columns stay NULL, derived from the new snapshot
+                values.update({field: None for field in _derived_fields(row)})
+                values['snapshot_id'] = register_snapshot(pricing, profiles[row['project_id']], row['project_id'])
+                values['engine_version'] = ENGINE_VERSION
+            changed.append((simulation_id, values))
+            history.append(InvestmentSimulationHistory(
+                simulation_id=simulation_id,
+                values={field: None if old[field] is None else str(old[field]) for field in RESULT_FIELDS},
+                pricing_version=pricing.version
+            ))
+
+        if changed and not dry_run:
+            with transaction.atomic():
+                InvestmentSimulationHistory.objects.bulk_create(history, batch_size=RESIMULATION_BULK_BATCH_SIZE)
+                _update_results(changed)
+
+        totals['processed'] += len(rows)
+        totals['updated'] += len(changed)
+        totals['stale'] += sum(1 for row in rows if _is_stale(row))
+        if progress:
+            progress(dict(totals))
+
+    def snapshots_of(rows):
+        return {
+            row['snapshot_id']: load_snapshot(row['snapshot_id'])
+            for row in rows if _derived_fields(row) and not _is_stale(row)
+        }
+
+    chunks = _iter_chunks(queryset, chunk_size)
+    if workers <= 1:
+        for rows in chunks:
+            write(rows, _compute_chunk(pricing, profiles, snapshots_of(rows), rows))
+        return totals
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        pending = deque()
+        for rows in chunks:
+            pending.append((rows, executor.submit(_compute_chunk, pricing, profiles, snapshots_of(rows), rows)))
+            if len(pending) >= workers * RESIMULATION_CHUNKS_PER_WORKER:
+                done_rows, future = pending.popleft()
+                write(done_rows, future.result())
+        while pending:
+            done_rows, future = pending.popleft()
+            write(done_rows, future.result())
+
+    return totals
@@ -0,0 +1,167 @@
+"""
+Memoized simulation results
+
+SimulationResultCache sits in front of SolarInvestmentCalculator.simulate().
+Entries are keyed by the normalized inputs (project, tariff category,
+simulation type, bill and input value rounded to their model precision) plus
+the pricing version, the engine profile and ENGINE_VERSION. A price change
+therefore makes every earlier key unreachable without an explicit
+invalidation; the in-process entries are also dropped as soon as a new
+pricing version is seen.
+
+Lookups go through a bounded in-process LRU first and then Django's cache,
+which every worker shares. Hits, misses and evictions are counted per process.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .results import SimulationResult
+from .simulation_engine import ENGINE_VERSION, SolarInvestmentCalculator
+
+
+RESULT_CACHE_KEY_PREFIX = 'simulations:result:'
+
+# Result attributes that belong to the request, not to the computation
+REQUEST_FIELDS = ('project', 'tariff_category', 'user_email', 'user_phone')
+
+CENT = Decimal('0.01')
+
+
+def normalize_input(simulation_type: str, value):
+    """Input value as the model would store it, so equivalent requests share a key"""
+    if simulation_type == 'panels':
+        return int(value)
+    return Decimal(str(value)).quantize(CENT)
+
+
+class SimulationResultCache:
+    """Two-tier (process LRU, then Django's cache) store of simulation results"""
+
+    def __init__(self, max_entries: int, timeout: int, shared: bool = True):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._pricing_version = None
+        self._counters = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def key_for(
+        self,
+        calculator: SolarInvestmentCalculator,
+        simulation_type: str,
+        monthly_bill_ars,
+        input_value
+    ) -> str:
+        profile = calculator.profile
+        payload = '|'.join(str(part) for part in (
+            calculator.project.pk,
+            calculator.tariff_category.pk,
+            simulation_type,
+            Decimal(str(monthly_bill_ars)).quantize(CENT),
+            normalize_input(simulation_type, input_value),
+            calculator.pricing.version,
+            profile.panel_power_kw,
+            profile.annual_generation_factor,
+            profile.performance_ratio,
+            ENGINE_VERSION,
+        ))
+        return RESULT_CACHE_KEY_PREFIX + hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, values: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = values
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def get_or_compute(self, key: str, pricing_version: str, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            if pricing_version != self._pricing_version:
+                # Entries of an earlier pricing version can no longer be hit
+                self._entries.clear()
+                self._pricing_version = pricing_version
+            values = self._entries.get(key)
+            if values is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return values
+
+        values = cache.get(key) if self.shared else None
+        if values is not None:
+            with self._lock:
+                self._counters['shared_hits'] += 1
+        else:
+            values = compute()
+            with self._lock:
+                self._counters['misses'] += 1
+            if self.shared:
+                cache.set(key, values, self.timeout)
+
+        self._remember(key, values)
+        return values
+
+    def simulate(
+        self,
+        calculator: SolarInvestmentCalculator,
+        simulation_type: str,
+        monthly_bill_ars,
+        input_value,
+        user_email: str = "",
+        user_phone: str = ""
+    ) -> SimulationResult:
+        """calculator.simulate(), answered from the cache when possible"""
+        # Computed from the normalized inputs, so every request sharing a key gets the same result
+        monthly_bill_ars = Decimal(str(monthly_bill_ars)).quantize(CENT)
+        input_value = normalize_input(simulation_type, input_value)
+
+        def compute():
+            result = calculator.simulate(simulation_type, monthly_bill_ars, input_value)
+            return {
+                name: getattr(result, name) for name in SimulationResult.__slots__ if name not in REQUEST_FIELDS
+            }
+
+        values = self.get_or_compute(
+            self.key_for(calculator, simulation_type, monthly_bill_ars, input_value),
+            calculator.pricing.version,
+            compute
+        )
+        return SimulationResult(
+            project=calculator.project,
+            tariff_category=calculator.tariff_category,
+            user_email=user_email,
+            user_phone=user_phone,
+            **values
+        )
+
+    def clear(self):
+        """Drop the in-process entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._pricing_version = None
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = sum(self._counters[name] for name in ('hits', 'shared_hits', 'misses'))
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                hit_rate=round((lookups - self._counters['misses']) / lookups, 4) if lookups else 0.0,
+            )
+
+
+simulation_results = SimulationResultCache(
+    max_entries=getattr(settings, 'SIMULATION_RESULT_CACHE_SIZE', 2048),
+    timeout=getattr(settings, 'SIMULATION_RESULT_CACHE_TIMEOUT', 60 * 60),
+    shared=getattr(settings, 'SIMULATION_RESULT_CACHE_SHARED', True),
+)
@@ -0,0 +1,70 @@
+"""
+Lightweight simulation results
+
+SolarInvestmentCalculator returns SimulationResult objects instead of unsaved
+InvestmentSimulation instances. They are plain slotted objects, cheap to build
+in bulk, and are only converted to a model instance when a simulation is saved.
+"""
+
+from .models import InvestmentSimulation
+
+
+# Decimal places of every Decimal output, taken from the InvestmentSimulation
+# fields they map to (savings in USD are model properties, shown with 2 places).
+RESULT_DECIMAL_PLACES = {
+    field_name: InvestmentSimulation._meta.get_field(field_name).decimal_places
+    for field_name in [
+        'monthly_bill_ars', 'bill_coverage_percentage', 'investment_amount_usd',
+        'total_investment_usd', 'total_investment_ars',
+        'installed_power_kw', 'annual_generation_kwh', 'monthly_generation_kwh',
+        'monthly_savings_ars', 'annual_savings_ars',
+        'payback_period_years', 'bill_coverage_achieved', 'roi_annual',
+        'exchange_rate_used',
+    ]
+}
+RESULT_DECIMAL_PLACES.update({'monthly_savings_usd': 2, 'annual_savings_usd': 2})
+
+
+class SimulationResult:
+    """Outcome of one simulation, decoupled from the ORM"""
+
+    __slots__ = (
+        'project', 'tariff_category', 'simulation_type',
+        'user_email', 'user_phone', 'monthly_bill_ars',
+        'bill_coverage_percentage', 'number_of_panels', 'investment_amount_usd',
+        'total_investment_usd', 'total_investment_ars',
+        'installed_power_kw', 'annual_generation_kwh', 'monthly_generation_kwh',
+        'monthly_savings_ars', 'annual_savings_ars',
+        'payback_period_years', 'bill_coverage_achieved', 'roi_annual',
+        'exchange_rate_used',
+    )
+
+    def __init__(self, **values):
+        values.setdefault('user_email', '')
+        values.setdefault('user_phone', '')
+        for name in self.__slots__:
+            setattr(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f"Campos desconocidos: {', '.join(values)}")
+
+    def __repr__(self):
+        return (
+            f"SimulationResult({self.simulation_type}, panels={self.number_of_panels}, "
+            f"investment_usd={self.total_investment_usd})"
+        )
+
+    @property
+    def monthly_savings_usd(self):
+        """Calculate monthly savings in USD"""
+        return self.monthly_savings_ars / self.exchange_rate_used
+
+    @property
+    def annual_savings_usd(self):
+        """Calculate annual savings in USD using blue exchange rate: (monthly_savings_ars / exchange_rate) * 12"""
+        return (self.monthly_savings_ars / self.exchange_rate_used) * 12
+
+    def to_model(self, **extra) -> InvestmentSimulation:
+        """Build an unsaved InvestmentSimulation, e.g. to persist the result"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(extra)
+        return InvestmentSimulation(**fields)
@@ -0,0 +1,230 @@
+"""
+Monte Carlo risk simulation on exchange rate and energy price
+
+Samples yearly paths for the ARS/USD exchange rate and the energy price as
+correlated geometric Brownian motions, and reports the distribution of
+payback, ROI and NPV (in USD) of a simulated investment.
+
+Paths are generated in fixed-size chunks, each with its own child seed of
+the request seed, so memory stays bounded and results are reproducible.
+Runs too large for a request go through the job worker (see jobs.py), which
+consumes iter_monte_carlo() to renew its heartbeat after every chunk.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Generator, Optional, Sequence, Tuple
+
+import numpy as np
+from django.utils import timezone
+
+from .history import PriceHistory, get_price_history
+from .projection import DEFAULT_DISCOUNT_RATE_PERCENTAGE, DEFAULT_PROJECTION_YEARS, payback_years
+
+
+MONTE_CARLO_CHUNK_PATHS = 25000
+
+# Fallback annual log drift / volatility when history is too short
+DEFAULT_EXCHANGE_RATE_DRIFT = 0.0
+DEFAULT_EXCHANGE_RATE_VOLATILITY = 0.30
+DEFAULT_ENERGY_PRICE_DRIFT = 0.0
+DEFAULT_ENERGY_PRICE_VOLATILITY = 0.20
+MIN_HISTORY_OBSERVATIONS = 3
+
+PERCENTILES = (10, 50, 90)
+
+
+def estimate_drift_and_volatility(dates: Sequence, values: Sequence) -> Optional[Tuple[float, float]]:
+    """
+    Annualized log drift and volatility from an irregular price history.
+
+    Each log return r_i over dt_i years contributes r_i / dt_i to the drift and
+    r_i / sqrt(dt_i) to the volatility. Returns None with too few observations.
+    """
+    points = sorted((date, float(value)) for date, value in zip(dates, values) if value and value > 0)
+    if len(points) < MIN_HISTORY_OBSERVATIONS:
+        return None
+
+    ordinals = np.array([date.toordinal() for date, _ in points], dtype=np.float64)
+    log_values = np.log([value for _, value in points])
+    elapsed_years = np.diff(ordinals) / 365.25
+    valid = elapsed_years > 0
+    if valid.sum() < MIN_HISTORY_OBSERVATIONS - 1:
+        return None
+
+    log_returns = np.diff(log_values)[valid]
+    elapsed_years = elapsed_years[valid]
+    drift = log_returns.sum() / elapsed_years.sum()
+    volatility = float(np.std(log_returns / np.sqrt(elapsed_years) - drift * np.sqrt(elapsed_years), ddof=1))
+    return float(drift), volatility
+
+
+@dataclass(frozen=True)
+class MarketParameters:
+    """Annual log drift and log volatility of the sampled market variables"""
+
+    exchange_rate_drift: float = DEFAULT_EXCHANGE_RATE_DRIFT
+    exchange_rate_volatility: float = DEFAULT_EXCHANGE_RATE_VOLATILITY
+    energy_price_drift: float = DEFAULT_ENERGY_PRICE_DRIFT
+    energy_price_volatility: float = DEFAULT_ENERGY_PRICE_VOLATILITY
+    correlation: float = 0.0
+
+    @classmethod
+    def from_history(
+        cls,
+        history: Optional[PriceHistory] = None,
+        as_of: Optional[date] = None,
+        **overrides
+    ) -> 'MarketParameters':
+        """
+        Estimate parameters from the cached price history (see history.py),
+        up to as_of (today by default): scheduled future prices are not history
+        """
+        history = history if history is not None else get_price_history()
+        as_of = as_of if as_of is not None else timezone.localdate()
+        estimated = {}
+
+        exchange_rate_stats = estimate_drift_and_volatility(*history.exchange_rates.until(as_of))
+        if exchange_rate_stats:
+            estimated['exchange_rate_drift'], estimated['exchange_rate_volatility'] = exchange_rate_stats
+
+        energy_price_stats = estimate_drift_and_volatility(*history.energy_prices.until(as_of))
+        if energy_price_stats:
+            estimated['energy_price_drift'], estimated['energy_price_volatility'] = energy_price_stats
+
+        estimated.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**estimated)
+
+
+def _simulate_chunk(
+    seed: np.random.SeedSequence,
+    paths: int,
+    total_investment_usd: float,
+    annual_savings_ars: float,
+    exchange_rate: float,
+    years: int,
+    degradation: float,
+    discount_rate: float,
+    market: MarketParameters
+) -> Dict[str, np.ndarray]:
+    """Payback, ROI and NPV for one chunk of sampled paths"""
+    generator = np.random.default_rng(seed)
+    shocks = generator.standard_normal((2, paths, years - 1))
+    exchange_rate_shocks = shocks[0]
+    energy_price_shocks = (
+        market.correlation * shocks[0]
+        + math.sqrt(max(1 - market.correlation ** 2, 0.0)) * shocks[1]
+    )
+
+    # Year 1 uses today's prices; later years follow the sampled log paths
+    def log_path(drift, volatility, path_shocks):
+        steps = drift + volatility * path_shocks
+        return np.concatenate([np.zeros((paths, 1)), np.cumsum(steps, axis=1)], axis=1)
+
+    exchange_rate_factor = np.exp(log_path(
+        market.exchange_rate_drift, market.exchange_rate_volatility, exchange_rate_shocks
+    ))
+    energy_price_factor = np.exp(log_path(
+        market.energy_price_drift, market.energy_price_volatility, energy_price_shocks
+    ))
+    degradation_factor = (1 - degradation) ** np.arange(years, dtype=np.float64)
+
+    flows = np.empty((paths, years + 1))
+    flows[:, 0] = -total_investment_usd
+    flows[:, 1:] = (
+        annual_savings_ars * degradation_factor * energy_price_factor
+        / (exchange_rate * exchange_rate_factor)
+    )
+
+    discount = (1 + discount_rate) ** -np.arange(years + 1, dtype=np.float64)
+    return {
+        'payback_years': payback_years(flows),
+        'roi_annual': flows[:, 1:].mean(axis=1) / total_investment_usd * 100,
+        'npv_usd': (flows * discount).sum(axis=1),
+    }
+
+
+def iter_monte_carlo(
+    total_investment_usd: float,
+    annual_savings_ars: float,
+    exchange_rate: float,
+    paths: int = 10000,
+    years: int = DEFAULT_PROJECTION_YEARS,
+    seed: int = 0,
+    degradation: float = 0.005,
+    discount_rate: float = DEFAULT_DISCOUNT_RATE_PERCENTAGE / 100,
+    market: Optional[MarketParameters] = None
+) -> Generator[int, None, Dict[str, Any]]:
+    """
+    Sample paths and summarize payback, ROI and NPV percentiles, one chunk at
+    a time: yields the number of paths sampled so far after each chunk and
+    returns the summary.
+    """
+    market = market or MarketParameters()
+    if total_investment_usd <= 0 or years < 2:
+        raise ValueError('La simulación de riesgo requiere una inversión positiva y al menos 2 años')
+
+    chunk_sizes = [MONTE_CARLO_CHUNK_PATHS] * (paths // MONTE_CARLO_CHUNK_PATHS)
+    if paths % MONTE_CARLO_CHUNK_PATHS:
+        chunk_sizes.append(paths % MONTE_CARLO_CHUNK_PATHS)
+    chunk_seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    arguments = (
+        float(total_investment_usd), float(annual_savings_ars), float(exchange_rate),
+        years, degradation, discount_rate, market
+    )
+
+    chunks = []
+    sampled = 0
+    for chunk_seed, chunk_paths in zip(chunk_seeds, chunk_sizes):
+        chunks.append(_simulate_chunk(chunk_seed, chunk_paths, *arguments))
+        sampled += chunk_paths
+        yield sampled
+
+    results = {
+        metric: np.concatenate([chunk[metric] for chunk in chunks])
+        for metric in ('payback_years', 'roi_annual', 'npv_usd')
+    }
+
+    # Paths that never pay back count as an infinite payback
+    payback = np.where(np.isnan(results['payback_years']), np.inf, results['payback_years'])
+
+    def summarize(values):
+        # Interpolating between infinite paybacks gives nan, reported as None
+        with np.errstate(invalid='ignore'):
+            percentiles = np.percentile(values, PERCENTILES)
+        return {
+            f'p{percentile}': (round(float(value), 2) if np.isfinite(value) else None)
+            for percentile, value in zip(PERCENTILES, percentiles)
+        }
+
+    return {
+        'paths': paths,
+        'years': years,
+        'seed': seed,
+        'market': {
+            'exchange_rate_drift_percentage': round(market.exchange_rate_drift * 100, 2),
+            'exchange_rate_volatility_percentage': round(market.exchange_rate_volatility * 100, 2),
+            'energy_price_drift_percentage': round(market.energy_price_drift * 100, 2),
+            'energy_price_volatility_percentage': round(market.energy_price_volatility * 100, 2),
+            'correlation': round(market.correlation, 3),
+        },
+        'payback_years': summarize(payback),
+        'roi_annual': summarize(results['roi_annual']),
+        'npv_usd': summarize(results['npv_usd']),
+        'probability_of_payback': round(float(np.isfinite(payback).mean()), 4),
+    }
+
+
+def run_to_completion(steps: Generator[Any, None, Any]) -> Any:
+    """Value returned by a generator such as iter_monte_carlo(), ignoring what it yields"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as finished:
+            return finished.value
+
+
+def run_monte_carlo(*args, **kwargs) -> Dict[str, Any]:
+    """iter_monte_carlo() run in one go"""
+    return run_to_completion(iter_monte_carlo(*args, **kwargs))
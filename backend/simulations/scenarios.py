@@ -0,0 +1,177 @@
+"""
+Scenario comparisons, sensitivity sweeps and risk simulations
+
+Comparisons and sweeps are computed in blocks so the same code serves the
+synchronous views, which collect every block into one response, and the job
+worker (jobs.py), which stores each block as it is produced and reports
+progress in between. Risk simulations are one result, computed in the view
+or, above SIMULATION_RISK_SYNC_MAX_PATHS paths, by the worker, which steps
+through iter_risk_analysis() to report that it is alive between chunks.
+"""
+
+from typing import Any, Dict, Generator, Iterator, List, Optional
+
+import numpy as np
+
+from .results import SimulationResult
+from .risk import MarketParameters, run_to_completion
+from .serializers import SimulationResultSerializer
+from .simulation_engine import SolarInvestmentCalculator, quantize_batch_results
+
+
+# Scenario lists of a comparison, in the order their results are returned
+COMPARISON_SCENARIOS = [
+    ('bill_coverage', 'bill_coverage_percentages'),
+    ('panels', 'panel_quantities'),
+    ('investment', 'investment_amounts'),
+]
+COMPARISON_BLOCK_SIZE = 1000
+
+# Largest grid (energy prices x exchange rates x panel counts) per sweep
+SWEEP_MAX_CELLS = 2000000
+SWEEP_COLUMNS = [
+    'number_of_panels', 'total_investment_usd', 'total_investment_ars',
+    'monthly_savings_ars', 'annual_savings_ars',
+    'payback_period_years', 'roi_annual',
+]
+
+
+def comparison_size(data: Dict[str, Any]) -> int:
+    """Number of scenarios of a validated SimulationComparisonSerializer value"""
+    return sum(len(data.get(field) or ()) for _, field in COMPARISON_SCENARIOS)
+
+
+def iter_comparison_blocks(
+    calculator: SolarInvestmentCalculator,
+    data: Dict[str, Any],
+    block_size: int = COMPARISON_BLOCK_SIZE
+) -> Iterator[List[Dict[str, Any]]]:
+    """Comparison results, block_size scenarios at a time, each block in one vectorized pass"""
+    monthly_bill = data['monthly_bill_ars']
+    projection_options = data.get('projection')
+
+    for simulation_type, field in COMPARISON_SCENARIOS:
+        scenario_parameters = data.get(field) or []
+        for start in range(0, len(scenario_parameters), block_size):
+            parameters = scenario_parameters[start:start + block_size]
+            columns = calculator.simulate_batch(simulation_type, monthly_bill, parameters)
+            records = quantize_batch_results(columns)
+            if projection_options is not None:
+                projections = calculator.project_cash_flows(
+                    columns['total_investment_usd'],
+                    columns['annual_savings_ars'],
+                    **projection_options
+                )
+            block = []
+            for index, (parameter, record) in enumerate(zip(parameters, records)):
+                simulation = SimulationResult(
+                    project=calculator.project,
+                    tariff_category=calculator.tariff_category,
+                    simulation_type=simulation_type,
+                    **record
+                )
+                scenario = {
+                    'type': simulation_type,
+                    'parameter': parameter if simulation_type == 'panels' else float(parameter),
+                    'simulation': SimulationResultSerializer.to_representation(simulation)
+                }
+                if projection_options is not None:
+                    scenario['projection'] = projections[index]
+                block.append(scenario)
+            yield block
+
+
+def sweep_axis(spec: Optional[Dict[str, Any]], default) -> np.ndarray:
+    """Expand a validated SweepRangeSerializer value into an array of points"""
+    if not spec:
+        return np.array([float(default)])
+    if spec.get('values'):
+        return np.array([float(value) for value in spec['values']])
+    return np.linspace(float(spec['start']), float(spec['stop']), spec['steps'])
+
+
+def sweep_axes(calculator: SolarInvestmentCalculator, data: Dict[str, Any]):
+    """Energy prices, exchange rates and panel counts of a validated SensitivitySweepSerializer value"""
+    energy_prices = sweep_axis(data.get('energy_price'), calculator.pricing.energy_price_ars_per_kwh)
+    exchange_rates = sweep_axis(data.get('exchange_rate'), calculator.exchange_rate)
+    panel_counts = np.unique(np.maximum(np.rint(sweep_axis(data['number_of_panels'], 1)), 1))
+    return energy_prices, exchange_rates, panel_counts
+
+
+def sweep_column_names(data: Dict[str, Any]) -> List[str]:
+    column_names = list(SWEEP_COLUMNS)
+    if data.get('monthly_bill_ars'):
+        column_names.append('bill_coverage_achieved')
+    return column_names
+
+
+def iter_sweep_blocks(
+    calculator: SolarInvestmentCalculator,
+    data: Dict[str, Any],
+    energy_prices: np.ndarray,
+    exchange_rates: np.ndarray,
+    panel_counts: np.ndarray
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Sweep results one energy price at a time: a block holds one row per
+    exchange rate with every column over the panel counts.
+    """
+    column_names = sweep_column_names(data)
+    shape = (1, len(exchange_rates), len(panel_counts))
+
+    for energy_price in energy_prices:
+        columns = calculator.sensitivity_sweep(
+            [energy_price], exchange_rates, panel_counts,
+            monthly_bill_ars=data.get('monthly_bill_ars')
+        )
+        grids = {
+            column_name: np.broadcast_to(columns[column_name], shape)[0].round(2).tolist()
+            for column_name in column_names
+        }
+        yield [
+            {
+                'energy_price_ars_per_kwh': round(float(energy_price), 2),
+                'exchange_rate': round(float(exchange_rate), 2),
+                'columns': {column_name: grids[column_name][index] for column_name in column_names},
+            }
+            for index, exchange_rate in enumerate(exchange_rates)
+        ]
+
+
+def iter_risk_analysis(
+    calculator: SolarInvestmentCalculator,
+    simulation: SimulationResult,
+    data: Dict[str, Any]
+) -> Generator[int, None, Dict[str, Any]]:
+    """
+    Monte Carlo risk of a simulation for a validated RiskSimulationSerializer
+    value, chunk by chunk: yields the paths sampled so far, returns the result
+    """
+    def as_fraction(field_name, scale=100):
+        value = data.get(field_name)
+        return float(value) / scale if value is not None else None
+
+    market = MarketParameters.from_history(
+        exchange_rate_drift=as_fraction('exchange_rate_drift_percentage'),
+        exchange_rate_volatility=as_fraction('exchange_rate_volatility_percentage'),
+        energy_price_drift=as_fraction('energy_price_drift_percentage'),
+        energy_price_volatility=as_fraction('energy_price_volatility_percentage'),
+        correlation=as_fraction('correlation', scale=1)
+    )
+    return calculator.iter_simulate_risk(
+        simulation,
+        paths=data['paths'],
+        years=data['years'],
+        seed=data['seed'],
+        market=market,
+        discount_rate_percentage=data['discount_rate_percentage']
+    )
+
+
+def risk_analysis(
+    calculator: SolarInvestmentCalculator,
+    simulation: SimulationResult,
+    data: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Monte Carlo risk of a simulation for a validated RiskSimulationSerializer value"""
+    return run_to_completion(iter_risk_analysis(calculator, simulation, data))
@@ -1,13 +1,29 @@
+import uuid
+from decimal import Decimal
 from rest_framework import serializers
-from .models import InvestmentSimulation, TariffCategory, ExchangeRate
+from .models import (
+    InvestmentSimulation, TariffCategory, TariffBlock, ExchangeRate, SimulationJob, SimulationJobResult,
+    CapacityReservation
+)
+from .results import RESULT_DECIMAL_PLACES
+
+
+class TariffBlockSerializer(serializers.ModelSerializer):
+    """Serializer for tariff consumption blocks"""
+    
+    class Meta:
+        model = TariffBlock
+        fields = ['from_kwh', 'price_ars_per_kwh']
 
 
 class TariffCategorySerializer(serializers.ModelSerializer):
     """Serializer for simplified tariff categories"""
     
+    blocks = TariffBlockSerializer(many=True, read_only=True)
+    
     class Meta:
         model = TariffCategory
-        fields = ['id', 'name', 'code', 'description']
+        fields = ['id', 'name', 'code', 'description', 'fixed_charge_ars', 'tax_percentage', 'blocks']
 
 
 class ExchangeRateSerializer(serializers.ModelSerializer):
@@ -18,44 +34,42 @@ class ExchangeRateSerializer(serializers.ModelSerializer):
         fields = ['id', 'rate', 'source', 'date', 'created_at']
 
 
-class SimulationInputSerializer(serializers.Serializer):
-    """Serializer for simulation input parameters"""
+class ProjectionOptionsSerializer(serializers.Serializer):
+    """Serializer for the optional multi-year cash-flow projection"""
     
-    project_id = serializers.IntegerField()
-    monthly_bill_ars = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
-    tariff_category_id = serializers.IntegerField()
-    user_email = serializers.EmailField(required=False)  # Opcional para usuarios autenticados
-    user_phone = serializers.CharField(max_length=20, required=False)  # Opcional para usuarios autenticados
-    access_code = serializers.CharField(max_length=50, required=False, help_text="Código de acceso al proyecto")
+    years = serializers.IntegerField(min_value=1, max_value=50, default=25)
+    tariff_escalation_percentage = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=-50, max_value=500, default=0
+    )
+    exchange_rate_drift_percentage = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=-50, max_value=500, default=0
+    )
+    discount_rate_percentage = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, default=8
+    )
+
+
+class SimulationParametersSerializer(serializers.Serializer):
+    """Base of the serializers that size one simulation per project"""
     
     # One of these three must be provided
     bill_coverage_percentage = serializers.DecimalField(
-        max_digits=5, decimal_places=2, min_value=0, max_value=100, 
+        max_digits=5, decimal_places=2, min_value=0, max_value=100,
         required=False, allow_null=True
     )
     number_of_panels = serializers.IntegerField(min_value=1, required=False, allow_null=True)
     investment_amount_usd = serializers.DecimalField(
-        max_digits=10, decimal_places=2, min_value=0, 
+        max_digits=10, decimal_places=2, min_value=0,
         required=False, allow_null=True
     )
     
-    def validate_user_phone(self, value):
-        """Validate that phone number starts with +54"""
-        if not value.startswith('+54'):
-            value = '+54' + value.lstrip('+').lstrip('54')
-        return value
-    
     def validate(self, data):
         """Validate that exactly one simulation parameter is provided"""
-        simulation_params = [
-            data.get('bill_coverage_percentage'),
-            data.get('number_of_panels'),
-            data.get('investment_amount_usd')
+        provided_params = [
+            name for name in ('bill_coverage_percentage', 'number_of_panels', 'investment_amount_usd')
+            if data.get(name) is not None
         ]
         
-        # Count non-null parameters
-        provided_params = [param for param in simulation_params if param is not None]
-        
         if len(provided_params) != 1:
             raise serializers.ValidationError(
                 "Debe proporcionar exactamente uno de los siguientes parámetros: "
@@ -65,6 +79,70 @@ class SimulationInputSerializer(serializers.Serializer):
         return data
 
 
+class SimulationInputSerializer(SimulationParametersSerializer):
+    """Serializer for simulation input parameters"""
+    
+    project_id = serializers.IntegerField()
+    monthly_bill_ars = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    tariff_category_id = serializers.IntegerField()
+    user_email = serializers.EmailField(required=False)  # Opcional para usuarios autenticados
+    user_phone = serializers.CharField(max_length=20, required=False)  # Opcional para usuarios autenticados
+    access_code = serializers.CharField(max_length=50, required=False, help_text="Código de acceso al proyecto")
+    projection = ProjectionOptionsSerializer(required=False)
+    
+    def validate_user_phone(self, value):
+        """Validate that phone number starts with +54"""
+        if not value.startswith('+54'):
+            value = '+54' + value.lstrip('+').lstrip('54')
+        return value
+
+
+class RiskSimulationSerializer(SimulationInputSerializer):
+    """Serializer for Monte Carlo risk simulation parameters"""
+    
+    paths = serializers.IntegerField(min_value=100, max_value=1000000, default=10000)
+    years = serializers.IntegerField(min_value=2, max_value=50, default=25)
+    seed = serializers.IntegerField(min_value=0, default=0)
+    discount_rate_percentage = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, default=8
+    )
+    
+    # Optional overrides of the volatility estimated from history (annual %)
+    exchange_rate_drift_percentage = serializers.DecimalField(
+        max_digits=6, decimal_places=2, required=False, allow_null=True
+    )
+    exchange_rate_volatility_percentage = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    energy_price_drift_percentage = serializers.DecimalField(
+        max_digits=6, decimal_places=2, required=False, allow_null=True
+    )
+    energy_price_volatility_percentage = serializers.DecimalField(
+        max_digits=6, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    correlation = serializers.DecimalField(
+        max_digits=4, decimal_places=3, min_value=-1, max_value=1, required=False, allow_null=True
+    )
+
+
+class HourlySimulationSerializer(serializers.Serializer):
+    """Serializer for the hourly (8760 h) simulation mode"""
+    
+    project_id = serializers.IntegerField()
+    tariff_category_id = serializers.IntegerField()
+    monthly_bill_ars = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    number_of_panels = serializers.IntegerField(min_value=1)
+    # Share of the energy price paid for the monthly surplus injected into the grid
+    injection_price_percentage = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, default=0
+    )
+    
+    def validate_monthly_bill_ars(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("La factura mensual debe ser mayor a cero")
+        return value
+
+
 class InvestmentSimulationSerializer(serializers.ModelSerializer):
     """Serializer for investment simulation results"""
     
@@ -93,6 +171,58 @@ class InvestmentSimulationSerializer(serializers.ModelSerializer):
         ]
 
 
+class SimulationResultSerializer:
+    """
+    Fast read-only serializer for SimulationResult objects.
+    
+    Produces the same representation as InvestmentSimulationSerializer for an
+    unsaved simulation without going through DRF field machinery: a fresh id
+    (the model's uuid4 default), no created_at, decimal fields as strings and
+    the USD savings properties as unrounded Decimals.
+    """
+    
+    fields = InvestmentSimulationSerializer.Meta.fields
+    
+    _exponents = {
+        field_name: Decimal(1).scaleb(-decimal_places)
+        for field_name, decimal_places in RESULT_DECIMAL_PLACES.items()
+    }
+    _usd_properties = ('monthly_savings_usd', 'annual_savings_usd')
+    
+    def __init__(self, instance, many=False):
+        self.instance = instance
+        self.many = many
+    
+    @classmethod
+    def to_representation(cls, result):
+        exponents = cls._exponents
+        data = {
+            'id': str(uuid.uuid4()),
+            'project_name': result.project.name,
+            'project_location': result.project.location,
+            'project_commercial_whatsapp': result.project.commercial_whatsapp,
+            'tariff_category_name': result.tariff_category.name if result.tariff_category else None,
+            'user_email': result.user_email,
+            'user_phone': result.user_phone,
+            'simulation_type': result.simulation_type,
+            'number_of_panels': result.number_of_panels,
+            'created_at': None,
+        }
+        for field_name, exponent in exponents.items():
+            if field_name in cls._usd_properties:
+                data[field_name] = getattr(result, field_name)
+                continue
+            value = getattr(result, field_name)
+            data[field_name] = '{:f}'.format(Decimal(value).quantize(exponent)) if value is not None else None
+        return {field_name: data[field_name] for field_name in cls.fields}
+    
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(result) for result in self.instance]
+        return self.to_representation(self.instance)
+
+
 class SimulationSummarySerializer(serializers.ModelSerializer):
     """Serializer for simulation summary (minimal fields)"""
     
@@ -112,6 +242,14 @@ class SimulationSummarySerializer(serializers.ModelSerializer):
         ]
 
 
+class BulkSimulationRowSerializer(SimulationParametersSerializer):
+    """One row of a bulk simulation (NDJSON object or CSV record)"""
+    
+    ref = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    monthly_bill_ars = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    tariff_category = serializers.CharField(max_length=20, help_text="Código o id de la categoría tarifaria")
+
+
 class SimulationComparisonSerializer(serializers.Serializer):
     """Serializer for comparing multiple simulation scenarios"""
     
@@ -123,18 +261,22 @@ class SimulationComparisonSerializer(serializers.Serializer):
     bill_coverage_percentages = serializers.ListField(
         child=serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100),
         required=False,
-        allow_empty=False
+        allow_empty=False,
+        max_length=50000
     )
     panel_quantities = serializers.ListField(
         child=serializers.IntegerField(min_value=1),
         required=False,
-        allow_empty=False
+        allow_empty=False,
+        max_length=50000
     )
     investment_amounts = serializers.ListField(
         child=serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0),
         required=False,
-        allow_empty=False
+        allow_empty=False,
+        max_length=50000
     )
+    projection = ProjectionOptionsSerializer(required=False)
     
     def validate(self, data):
         """Validate that at least one scenario list is provided"""
@@ -149,4 +291,148 @@ class SimulationComparisonSerializer(serializers.Serializer):
                 "Debe proporcionar al menos una lista de escenarios para comparar."
             )
         
-        return data
\ No newline at end of file
+        return data
+
+
+class SweepRangeSerializer(serializers.Serializer):
+    """A sweep axis: explicit values, or start/stop/steps (inclusive, evenly spaced)"""
+    
+    values = serializers.ListField(
+        child=serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0),
+        required=False,
+        allow_empty=False,
+        max_length=500
+    )
+    start = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    stop = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    steps = serializers.IntegerField(min_value=1, max_value=500, default=10)
+    
+    def validate(self, data):
+        """Validate that either values or start/stop are provided"""
+        if not data.get('values') and (data.get('start') is None or data.get('stop') is None):
+            raise serializers.ValidationError(
+                "Debe proporcionar 'values' o bien 'start' y 'stop'."
+            )
+        return data
+
+
+class SensitivitySweepSerializer(serializers.Serializer):
+    """Serializer for sensitivity sweeps over price, exchange rate and size"""
+    
+    FORMAT_CHOICES = [('json', 'JSON columnar'), ('binary', 'Float32 binario')]
+    
+    project_id = serializers.IntegerField()
+    monthly_bill_ars = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True
+    )
+    energy_price = SweepRangeSerializer(required=False)
+    exchange_rate = SweepRangeSerializer(required=False)
+    number_of_panels = SweepRangeSerializer()
+    format = serializers.ChoiceField(choices=FORMAT_CHOICES, default='json')
+
+
+class GoalSeekSerializer(serializers.Serializer):
+    """Serializer for goal-seek requests (target payback, ROI or coverage)"""
+    
+    GOAL_CHOICES = [
+        ('payback_years', 'Período de retorno máximo (años)'),
+        ('roi_annual', 'ROI anual mínimo (%)'),
+        ('bill_coverage', 'Cobertura de factura mínima (%)'),
+    ]
+    
+    project_id = serializers.IntegerField()
+    monthly_bill_ars = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    tariff_category_id = serializers.IntegerField()
+    goal = serializers.ChoiceField(choices=GOAL_CHOICES)
+    target = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0)
+
+
+class ProjectRankingSerializer(SimulationParametersSerializer):
+    """Serializer for ranking every project with capacity for one bill"""
+    
+    ORDER_CHOICES = [
+        ('payback', 'Menor período de retorno'),
+        ('roi', 'Mayor ROI anual'),
+        ('coverage', 'Mayor cobertura de factura'),
+    ]
+    
+    monthly_bill_ars = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    tariff_category_id = serializers.IntegerField()
+    order_by = serializers.ChoiceField(choices=ORDER_CHOICES, default='payback')
+    limit = serializers.IntegerField(min_value=1, required=False)
+
+
+class PortfolioAllocationSerializer(serializers.Serializer):
+    """Serializer for splitting a USD budget across projects"""
+    
+    budget_usd = serializers.DecimalField(max_digits=14, decimal_places=2, min_value=1)
+    project_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=500,
+        help_text="Proyectos a considerar (por defecto, todos con potencia disponible)"
+    )
+
+
+class SimulationJobSerializer(serializers.ModelSerializer):
+    """Serializer for the status and progress of a queued simulation job"""
+    
+    progress = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = SimulationJob
+        fields = [
+            'id', 'kind', 'status', 'total', 'processed', 'progress',
+            'summary', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+
+
+class SimulationJobResultSerializer(serializers.ModelSerializer):
+    """Serializer for one stored result of a simulation job"""
+    
+    class Meta:
+        model = SimulationJobResult
+        fields = ['index', 'data']
+
+
+class CapacityReservationInputSerializer(serializers.Serializer):
+    """Serializer for holding capacity of a project"""
+    
+    project_id = serializers.IntegerField()
+    simulation_id = serializers.UUIDField(required=False, allow_null=True)
+    
+    # One of these three must be provided
+    power_kw = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=Decimal('0.01'),
+        required=False, allow_null=True
+    )
+    number_of_panels = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    
+    def validate(self, data):
+        """Validate that exactly one way of sizing the reservation is provided"""
+        provided_params = [
+            name for name in ('power_kw', 'number_of_panels', 'simulation_id')
+            if data.get(name) is not None
+        ]
+        
+        if len(provided_params) != 1:
+            raise serializers.ValidationError(
+                "Debe proporcionar exactamente uno de los siguientes parámetros: "
+                "power_kw, number_of_panels, o simulation_id"
+            )
+        
+        return data
+
+
+class CapacityReservationSerializer(serializers.ModelSerializer):
+    """Serializer for capacity reservations"""
+    
+    project_name = serializers.CharField(source='project.name', read_only=True)
+    
+    class Meta:
+        model = CapacityReservation
+        fields = [
+            'id', 'project', 'project_name', 'simulation', 'power_kw', 'status',
+            'expires_at', 'created_at', 'closed_at'
+        ]
@@ -0,0 +1,47 @@
+"""
+Signal handlers for the simulations app
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import SiteSettings
+from projects.models import SolarProject
+
+from .models import EnergyPrice, ExchangeRate, PricingTier, TariffBlock, TariffCategory
+from .history import invalidate_price_history
+from .pricing import invalidate_pricing_cache
+from .profiles import invalidate_engine_profiles
+
+
+@receiver(post_save, sender=EnergyPrice)
+@receiver(post_delete, sender=EnergyPrice)
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+@receiver(post_save, sender=PricingTier)
+@receiver(post_delete, sender=PricingTier)
+@receiver(post_save, sender=TariffCategory)
+@receiver(post_delete, sender=TariffCategory)
+@receiver(post_save, sender=TariffBlock)
+@receiver(post_delete, sender=TariffBlock)
+def pricing_changed(sender, **kwargs):
+    """Invalidate cached pricing once the change is committed"""
+    transaction.on_commit(invalidate_pricing_cache)
+
+
+@receiver(post_save, sender=EnergyPrice)
+@receiver(post_delete, sender=EnergyPrice)
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def price_history_changed(sender, **kwargs):
+    """Reload the as-of price history once the change is committed"""
+    transaction.on_commit(invalidate_price_history)
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_save, sender=SolarProject)
+@receiver(post_delete, sender=SolarProject)
+def engine_profile_changed(sender, **kwargs):
+    """Recompile engine profiles once the change is committed"""
+    transaction.on_commit(invalidate_engine_profiles)
@@ -5,26 +5,197 @@ This module contains the core logic for calculating solar investment returns
 based on user monthly bill, tariff category, and investment parameters.
 """
 
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, Any, Optional
-from .models import InvestmentSimulation, TariffCategory, ExchangeRate, EnergyPrice, ENERGY_PRICE_ARS_PER_KWH
+from decimal import Context, Decimal, ROUND_HALF_UP, ROUND_FLOOR
+from typing import Dict, Any, Generator, List, Optional, Sequence, Tuple
+import numpy as np
+from .models import TariffCategory
+from .results import RESULT_DECIMAL_PLACES, SimulationResult
+from .pricing import DEFAULT_TIER_TABLE, PricingSnapshot, TierTable, get_current_pricing
+from .profiles import EngineProfile, get_engine_profile
+from .hourly import hourly_summary, profile_store, simulate_hourly
+from .history import get_price_history
+from .risk import MarketParameters, iter_monte_carlo, run_to_completion
+from .reservations import reservable_power
+from .projection import DEFAULT_PROJECTION_YEARS, DEFAULT_DISCOUNT_RATE_PERCENTAGE, project_cash_flows, projection_records
 from projects.models import SolarProject
 
 
+# Version of the formulas. Compact simulations (see storage.py) record it and
+# derive their results with the current engine, so bump it whenever a change
+# alters the results of existing inputs, after materializing compact rows.
+ENGINE_VERSION = '1'
+
+
+def max_affordable_panels(
+    investment_amount_usd: Decimal,
+    tiers: Sequence[Tuple[int, Decimal]] = DEFAULT_TIER_TABLE
+) -> int:
+    """
+    Return the largest number of panels whose tiered cost fits the investment.
+
+    Because the tier price applies uniformly to every panel, the total cost is
+    not monotonic (9 panels at $700 cost more than 10 panels at $500), so each
+    tier is solved independently and the best feasible count wins:
+    within tier [min_i, min_{i+1} - 1] the answer is floor(investment / price_i),
+    clamped to the tier range. Runs in O(len(tiers)) with no upper panel cap.
+    
+    As in TierTable.price_for, counts below the first tier are priced at it,
+    so the first tier's range starts at one panel whatever its minimum.
+    """
+    if investment_amount_usd <= 0:
+        return 0
+    
+    best_panels = 0
+    for index, (tier_min, price_per_panel) in enumerate(tiers):
+        affordable = int((investment_amount_usd / price_per_panel).to_integral_value(ROUND_FLOOR))
+        if index + 1 < len(tiers):
+            affordable = min(affordable, tiers[index + 1][0] - 1)
+        if affordable >= (tier_min if index else 1):
+            best_panels = max(best_panels, affordable)
+    
+    return best_panels
+
+
+def tiered_cost_array(
+    number_of_panels: np.ndarray,
+    tiers: Sequence[Tuple[int, Decimal]] = DEFAULT_TIER_TABLE
+) -> np.ndarray:
+    """Vectorized counterpart of TierTable.cost_for (total USD investment)"""
+    table = tiers if isinstance(tiers, TierTable) else TierTable(tiers)
+    tier_index = np.clip(np.searchsorted(table.breakpoint_array, number_of_panels, side='right') - 1, 0, None)
+    return number_of_panels * table.price_array[tier_index]
+
+
+def max_affordable_panels_array(
+    investment_amount_usd: np.ndarray,
+    tiers: Sequence[Tuple[int, Decimal]] = DEFAULT_TIER_TABLE
+) -> np.ndarray:
+    """Vectorized counterpart of max_affordable_panels"""
+    best_panels = np.zeros(np.shape(investment_amount_usd), dtype=np.int64)
+    for index, (tier_min, price_per_panel) in enumerate(tiers):
+        affordable = np.floor(investment_amount_usd / float(price_per_panel)).astype(np.int64)
+        if index + 1 < len(tiers):
+            affordable = np.minimum(affordable, tiers[index + 1][0] - 1)
+        best_panels = np.where(affordable >= (tier_min if index else 1), np.maximum(best_panels, affordable), best_panels)
+    return best_panels
+
+
+# Significant digits kept from a float before quantizing: drops the float64
+# error (~1e-15 relative) so a value that is exactly a tie in Decimal is a
+# tie here too, and rounds like the scalar path
+BATCH_SIGNIFICANT_DIGITS = Context(prec=13)
+
+
+def quantize_batch_results(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Convert the float columns produced by simulate_batch into one dict per
+    scenario, quantizing every value to the model's Decimal precision.
+    This is the only place where batch results go back to Decimal.
+    
+    Values are rounded like DecimalField rounds the scalar results when they
+    are saved: with the current decimal context (half-even by default).
+    """
+    size = len(columns['number_of_panels'])
+    records = [{} for _ in range(size)]
+    create_decimal = BATCH_SIGNIFICANT_DIGITS.create_decimal
+    
+    for column_name, values in columns.items():
+        if column_name in RESULT_DECIMAL_PLACES:
+            exponent = Decimal(1).scaleb(-RESULT_DECIMAL_PLACES[column_name])
+            converted = [create_decimal(repr(value)).quantize(exponent) for value in values.tolist()]
+        else:
+            converted = values.tolist()
+        for record, value in zip(records, converted):
+            record[column_name] = value
+    
+    return records
+
+
+def capacity_check(required_power_kw: Decimal, available_power_kw: Decimal) -> Dict[str, Any]:
+    """Whether a project with available_power_kw left can host required_power_kw"""
+    return {
+        'has_capacity': required_power_kw <= available_power_kw,
+        'required_power_kw': float(required_power_kw),
+        'available_power_kw': float(available_power_kw),
+        'utilization_percentage': float((required_power_kw / available_power_kw) * 100) if available_power_kw > 0 else 0
+    }
+
+
+# Input column of a stored simulation for each simulation type
+SIMULATION_INPUT_FIELDS = {
+    'bill_coverage': 'bill_coverage_percentage',
+    'panels': 'number_of_panels',
+    'investment': 'investment_amount_usd',
+}
+
+
+# Goal-seek targets and the batch column each one constrains
+GOAL_SEEK_METRICS = {
+    'payback_years': 'payback_period_years',
+    'roi_annual': 'roi_annual',
+    'bill_coverage': 'bill_coverage_achieved',
+}
+
+
+def _last_satisfying(low: int, high: int, predicate) -> Optional[int]:
+    """Largest n in [low, high] with predicate(n), for predicates true-then-false"""
+    if not predicate(low):
+        return None
+    while low < high:
+        middle = (low + high + 1) // 2
+        if predicate(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _first_satisfying(low: int, high: int, predicate) -> Optional[int]:
+    """Smallest n in [low, high] with predicate(n), for predicates false-then-true"""
+    if not predicate(high):
+        return None
+    while low < high:
+        middle = (low + high) // 2
+        if predicate(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
 class SolarInvestmentCalculator:
     """
     Calculator for solar investment simulations
     """
     
-    def __init__(self, project: SolarProject, tariff_category: TariffCategory):
+    def __init__(
+        self,
+        project: SolarProject,
+        tariff_category: TariffCategory,
+        pricing: Optional[PricingSnapshot] = None,
+        profile: Optional[EngineProfile] = None
+    ):
         self.project = project
         self.tariff_category = tariff_category
-        self.exchange_rate = ExchangeRate.get_latest_rate()
         
-        # Solar generation factors (typical for Argentina)
-        self.annual_generation_factor = 1500  # kWh per kWp per year (average)
+        # All formulas read prices from this snapshot, loaded once per calculator
+        self.pricing = pricing if pricing is not None else get_current_pricing()
+        self.exchange_rate = self.pricing.exchange_rate
+        self.tiers = self.pricing.tiers_for(project.pk if project is not None else None)
+        
+        # Physical parameters from SiteSettings and the project (see profiles.py)
+        self.profile = profile if profile is not None else get_engine_profile(project)
+        self.annual_generation_factor = self.profile.annual_generation_factor  # kWh per kWp per year
+        self.performance_ratio = self.profile.performance_ratio  # System efficiency
         self.system_degradation = Decimal('0.005')  # 0.5% annual degradation
-        self.performance_ratio = Decimal('0.85')  # System efficiency
+        
+        # Monthly ARS saving of one panel: 0.66 × precio_energia × 24 × 30 × 0.19
+        self.savings_per_panel_ars = self.profile.savings_per_panel_ars(self.pricing.energy_price_ars_per_kwh)
+        
+        # Block tariff of the category (see tariffs.py); None bills a flat energy price
+        self.tariff_schedule = self.pricing.schedule_for(
+            tariff_category.pk if tariff_category is not None else None
+        )
     
     def simulate_by_bill_coverage(
         self, 
@@ -32,27 +203,36 @@ class SolarInvestmentCalculator:
         bill_coverage_percentage: Decimal,
         user_email: str = "",
         user_phone: str = ""
-    ) -> InvestmentSimulation:
+    ) -> SimulationResult:
         """
         Simulate investment based on desired bill coverage percentage
         Using new formulas:
         - energia_generada = monto_factura_total / precio_energia  
         - potencia = energia_generada / 24 / 0.19 / 30
         - paneles = potencia / 0.66
+        With a block tariff, the energy is that share of the kWh consumption
+        derived from the bill.
         """
-        # Calculate target monthly savings in ARS
-        target_monthly_savings_ars = monthly_bill_ars * (bill_coverage_percentage / 100)
-        
-        # Nueva fórmula: energía_generada = monto_factura_total / precio_energia
-        # target_monthly_savings_ars es el equivalente al "monto de factura" que queremos cubrir
-        energy_price_ars = Decimal(str(EnergyPrice.get_current_price()))
-        required_monthly_generation_kwh = target_monthly_savings_ars / energy_price_ars
+        if self.tariff_schedule is None:
+            # Calculate target monthly savings in ARS
+            target_monthly_savings_ars = monthly_bill_ars * (bill_coverage_percentage / 100)
+            
+            # Nueva fórmula: energía_generada = monto_factura_total / precio_energia
+            # target_monthly_savings_ars es el equivalente al "monto de factura" que queremos cubrir
+            energy_price_ars = self.pricing.energy_price_ars_per_kwh
+            required_monthly_generation_kwh = target_monthly_savings_ars / energy_price_ars
+        else:
+            required_monthly_generation_kwh = (
+                self._monthly_consumption_kwh(monthly_bill_ars) * (bill_coverage_percentage / 100)
+            )
         
         # Nueva fórmula: potencia = energia_generada / 24 / 0.19 / 30
-        required_power_kw = required_monthly_generation_kwh / Decimal('24') / Decimal('0.19') / Decimal('30')
+        required_power_kw = required_monthly_generation_kwh / self.profile.monthly_kwh_per_kw
         
         # Nueva fórmula: paneles = potencia / 0.66
-        number_of_panels = int((required_power_kw / Decimal('0.66')).to_integral_value(ROUND_HALF_UP))
+        number_of_panels = int(
+            (required_power_kw / self.profile.panel_efficiency_factor).to_integral_value(ROUND_HALF_UP)
+        )
         
         # Recalculate actual power based on number of panels calculated
         # actual_power_kw already calculated above as required_power_kw 
@@ -67,7 +247,7 @@ class SolarInvestmentCalculator:
         total_investment_ars = total_investment_usd * self.exchange_rate
         
         # Calculate savings using new formula (based on number of panels)
-        monthly_savings_ars = self._calculate_monthly_savings(number_of_panels)
+        monthly_savings_ars = self._calculate_monthly_savings(number_of_panels, monthly_bill_ars)
         annual_savings_ars = monthly_savings_ars * 12
         
         # Calculate annual savings in USD using blue exchange rate
@@ -79,8 +259,8 @@ class SolarInvestmentCalculator:
         roi_annual = (annual_savings_ars / total_investment_ars) * 100 if total_investment_ars > 0 else Decimal('0')
         actual_bill_coverage = (monthly_savings_ars / monthly_bill_ars) * 100
         
-        # Create simulation object
-        simulation = InvestmentSimulation(
+        # Create simulation result
+        simulation = SimulationResult(
             project=self.project,
             user_email=user_email,
             user_phone=user_phone,
@@ -110,9 +290,10 @@ class SolarInvestmentCalculator:
         number_of_panels: int,
         user_email: str = "",
         user_phone: str = ""
-    ) -> InvestmentSimulation:
+    ) -> SimulationResult:
         """
-        Simulate investment based on number of panels with tiered pricing:
+        Simulate investment based on number of panels with tiered pricing
+        (PricingTier; default tiers shown):
         - 1-9 panels: $700 USD per panel
         - 10-99 panels: $500 USD per panel  
         - 100+ panels: $400 USD per panel
@@ -124,9 +305,8 @@ class SolarInvestmentCalculator:
         number_of_panels = self._apply_bill_restrictions(number_of_panels, monthly_bill_ars)
         
         # Calculate system specifications
-        panel_power_kw = self.project.panel_power_wp / 1000
-        actual_power_kw = number_of_panels * panel_power_kw
-        actual_annual_generation = actual_power_kw * self.annual_generation_factor * self.performance_ratio
+        actual_power_kw = number_of_panels * self.profile.panel_power_kw
+        actual_annual_generation = number_of_panels * self.profile.annual_generation_kwh_per_panel
         actual_monthly_generation = actual_annual_generation / 12
         
         # Calculate investment using tiered pricing
@@ -134,7 +314,7 @@ class SolarInvestmentCalculator:
         total_investment_ars = total_investment_usd * self.exchange_rate
         
         # Calculate savings using new formula (based on number of panels)
-        monthly_savings_ars = self._calculate_monthly_savings(number_of_panels)
+        monthly_savings_ars = self._calculate_monthly_savings(number_of_panels, monthly_bill_ars)
         annual_savings_ars = monthly_savings_ars * 12
         
         # Calculate annual savings in USD using blue exchange rate
@@ -146,8 +326,8 @@ class SolarInvestmentCalculator:
         roi_annual = (annual_savings_ars / total_investment_ars) * 100 if total_investment_ars > 0 else Decimal('0')
         bill_coverage_achieved = (monthly_savings_ars / monthly_bill_ars) * 100
         
-        # Create simulation object
-        simulation = InvestmentSimulation(
+        # Create simulation result
+        simulation = SimulationResult(
             project=self.project,
             user_email=user_email,
             user_phone=user_phone,
@@ -176,7 +356,7 @@ class SolarInvestmentCalculator:
         investment_amount_usd: Decimal,
         user_email: str = "",
         user_phone: str = ""
-    ) -> InvestmentSimulation:
+    ) -> SimulationResult:
         """
         Simulate investment based on investment amount
         Applies bill-based restrictions to prevent excessive investments.
@@ -193,47 +373,27 @@ class SolarInvestmentCalculator:
         investment_amount_usd = min(investment_amount_usd, max_investment_usd_100_coverage)
         
         # Calculate how many panels can be bought with the investment using tiered pricing
-        # We need to reverse-engineer from investment to panels using tiered pricing
-        
-        # Try different quantities to find how many panels this investment can buy
-        max_panels_possible = 1000  # Reasonable upper limit
-        best_panels = 0
-        
-        for test_panels in range(1, max_panels_possible + 1):
-            cost_for_panels = self._calculate_total_investment_tiered(test_panels)
-            if cost_for_panels <= investment_amount_usd:
-                best_panels = test_panels
-            else:
-                break
+        best_panels = max_affordable_panels(investment_amount_usd, self.tiers)
         
         # Use the exact number of panels that can be afforded with tiered pricing
         equivalent_panels = Decimal(str(best_panels))
         number_of_panels = best_panels
         
         # Calculate actual power based on the panels we can afford
-        panel_power_kw = self.project.panel_power_wp / 1000
-        actual_power_kw = equivalent_panels * panel_power_kw
+        actual_power_kw = equivalent_panels * self.profile.panel_power_kw
         
         # Keep the user's exact investment amount
         actual_investment_usd = investment_amount_usd
         actual_investment_ars = actual_investment_usd * self.exchange_rate
         
         # Calculate generation based on actual power (not rounded panels)
-        actual_annual_generation = actual_power_kw * self.annual_generation_factor * self.performance_ratio
+        actual_annual_generation = equivalent_panels * self.profile.annual_generation_kwh_per_panel
         actual_monthly_generation = actual_annual_generation / 12
         
         # Calculate savings using the same formula as _calculate_monthly_savings
         # But with equivalent fractional panels instead of whole panels
         # Formula: equivalent_panels × 0.66 × precio_energia × 24 × 30 × 0.19
-        energy_price_ars = Decimal(str(EnergyPrice.get_current_price()))
-        monthly_savings_ars = (
-            equivalent_panels * 
-            Decimal('0.66') * 
-            energy_price_ars * 
-            Decimal('24') * 
-            Decimal('30') * 
-            Decimal('0.19')
-        )
+        monthly_savings_ars = self._calculate_monthly_savings(equivalent_panels, monthly_bill_ars)
         annual_savings_ars = monthly_savings_ars * 12
         
         # Calculate annual savings in USD using blue exchange rate
@@ -245,8 +405,8 @@ class SolarInvestmentCalculator:
         roi_annual = (annual_savings_ars / actual_investment_ars) * 100 if actual_investment_ars > 0 else Decimal('0')
         bill_coverage_achieved = (monthly_savings_ars / monthly_bill_ars) * 100
         
-        # Create simulation object
-        simulation = InvestmentSimulation(
+        # Create simulation result
+        simulation = SimulationResult(
             project=self.project,
             user_email=user_email,
             user_phone=user_phone,
@@ -270,39 +430,476 @@ class SolarInvestmentCalculator:
         
         return simulation
     
+    def simulate_batch(
+        self,
+        simulation_type: str,
+        monthly_bills_ars,
+        parameters,
+        apply_bill_restrictions: bool = True,
+        energy_prices_ars_per_kwh=None,
+        exchange_rates=None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Vectorized simulation of many scenarios in a single pass.
+        
+        monthly_bills_ars and parameters are broadcast against each other;
+        parameters are coverage percentages, panel counts or USD amounts
+        depending on simulation_type ('bill_coverage', 'panels', 'investment').
+        The formulas mirror simulate_by_bill_coverage, simulate_by_panels and
+        simulate_by_investment, but run on float64 arrays. Use
+        quantize_batch_results to obtain Decimal values with model precision.
+        apply_bill_restrictions=False skips the 100% bill coverage limit
+        for the panels and investment modes.
+        
+        energy_prices_ars_per_kwh and exchange_rates override the pricing
+        snapshot without touching the database; they are broadcast with the
+        other inputs, so a sensitivity grid is a single call.
+        """
+        if energy_prices_ars_per_kwh is None:
+            energy_prices_ars_per_kwh = float(self.pricing.energy_price_ars_per_kwh)
+        if exchange_rates is None:
+            exchange_rates = float(self.exchange_rate)
+        bills, parameters, energy_price_ars, exchange_rate = np.broadcast_arrays(*[
+            np.atleast_1d(np.asarray(values, dtype=np.float64))
+            for values in (monthly_bills_ars, parameters, energy_prices_ars_per_kwh, exchange_rates)
+        ])
+        tiers = self.tiers
+        profile = self.profile
+        schedule = self.tariff_schedule
+        savings_kwh_per_panel = float(profile.monthly_savings_kwh_per_panel)
+        panel_power_kw = float(profile.panel_power_kw)
+        annual_generation_per_kw = float(profile.annual_generation_factor * profile.performance_ratio)
+        
+        # Same limit as _calculate_bill_based_limits (to_integral_value rounds half-even)
+        if schedule is None:
+            savings_per_panel_ars = savings_kwh_per_panel * energy_price_ars
+            max_panels_for_bill = np.rint(bills / savings_per_panel_ars).astype(np.int64)
+        else:
+            # Energy price overrides scale every block price
+            price_scale = energy_price_ars / float(self.pricing.energy_price_ars_per_kwh)
+            consumption_kwh = schedule.consumption_for_bill(bills, price_scale)
+            max_panels_for_bill = np.rint(consumption_kwh / savings_kwh_per_panel).astype(np.int64)
+        
+        columns = {'monthly_bill_ars': bills}
+        
+        if simulation_type == 'bill_coverage':
+            if schedule is None:
+                monthly_generation_kwh = bills * (parameters / 100) / energy_price_ars
+            else:
+                monthly_generation_kwh = consumption_kwh * (parameters / 100)
+            installed_power_kw = monthly_generation_kwh / float(profile.monthly_kwh_per_kw)
+            number_of_panels = np.floor(installed_power_kw / float(profile.panel_efficiency_factor) + 0.5).astype(np.int64)
+            total_investment_usd = tiered_cost_array(number_of_panels, tiers)
+            columns['bill_coverage_percentage'] = parameters
+        elif simulation_type == 'panels':
+            number_of_panels = parameters.astype(np.int64)
+            if apply_bill_restrictions:
+                number_of_panels = np.minimum(number_of_panels, max_panels_for_bill)
+            installed_power_kw = number_of_panels * panel_power_kw
+            monthly_generation_kwh = installed_power_kw * annual_generation_per_kw / 12
+            total_investment_usd = tiered_cost_array(number_of_panels, tiers)
+        elif simulation_type == 'investment':
+            investment_amount_usd = parameters
+            if apply_bill_restrictions:
+                investment_amount_usd = np.minimum(investment_amount_usd, tiered_cost_array(max_panels_for_bill, tiers))
+            number_of_panels = max_affordable_panels_array(investment_amount_usd, tiers)
+            installed_power_kw = number_of_panels * panel_power_kw
+            monthly_generation_kwh = installed_power_kw * annual_generation_per_kw / 12
+            total_investment_usd = investment_amount_usd
+            columns['investment_amount_usd'] = investment_amount_usd
+        else:
+            raise ValueError(f"Tipo de simulación inválido: {simulation_type}")
+        
+        total_investment_ars = total_investment_usd * exchange_rate
+        if schedule is None:
+            monthly_savings_ars = number_of_panels * savings_per_panel_ars
+        else:
+            monthly_savings_ars = schedule.avoided_cost(
+                consumption_kwh, number_of_panels * savings_kwh_per_panel, price_scale
+            )
+        annual_savings_ars = monthly_savings_ars * 12
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            payback_period = np.where(annual_savings_ars > 0, total_investment_ars / annual_savings_ars, 999.0)
+            roi_annual = np.where(total_investment_ars > 0, annual_savings_ars / total_investment_ars * 100, 0.0)
+            bill_coverage_achieved = np.where(bills > 0, monthly_savings_ars / bills * 100, 0.0)
+        
+        columns.update({
+            'number_of_panels': number_of_panels,
+            'total_investment_usd': total_investment_usd,
+            'total_investment_ars': total_investment_ars,
+            'installed_power_kw': installed_power_kw,
+            'annual_generation_kwh': monthly_generation_kwh * 12,
+            'monthly_generation_kwh': monthly_generation_kwh,
+            'monthly_savings_ars': monthly_savings_ars,
+            'annual_savings_ars': annual_savings_ars,
+            'payback_period_years': payback_period,
+            'bill_coverage_achieved': bill_coverage_achieved,
+            'roi_annual': roi_annual,
+            'exchange_rate_used': exchange_rate,
+        })
+        
+        return columns
+    
+    def simulate(
+        self,
+        simulation_type: str,
+        monthly_bill_ars: Decimal,
+        input_value,
+        user_email: str = "",
+        user_phone: str = ""
+    ) -> SimulationResult:
+        """Run the simulation mode of simulation_type with its input value"""
+        simulate = {
+            'bill_coverage': self.simulate_by_bill_coverage,
+            'panels': self.simulate_by_panels,
+            'investment': self.simulate_by_investment,
+        }[simulation_type]
+        return simulate(monthly_bill_ars, input_value, user_email=user_email, user_phone=user_phone)
+    
+    def resimulate(self, simulation) -> SimulationResult:
+        """Run a stored InvestmentSimulation again with this calculator's pricing"""
+        return self.simulate(
+            simulation.simulation_type,
+            simulation.monthly_bill_ars,
+            getattr(simulation, SIMULATION_INPUT_FIELDS[simulation.simulation_type]),
+            user_email=simulation.user_email,
+            user_phone=simulation.user_phone
+        )
+    
+    def resimulate_batch(self, simulations: Sequence, as_of_dates: Optional[Sequence] = None) -> List[Dict[str, Any]]:
+        """
+        Re-evaluate many stored simulations of this calculator's project and
+        tariff category with one simulate_batch call per simulation type.
+        
+        With as_of_dates (one date per simulation) each one uses the energy
+        price and exchange rate in force on its date, read from the in-memory
+        price history, so a backtest runs no per-row queries. Returns the
+        quantized records in input order.
+        """
+        history = get_price_history() if as_of_dates is not None else None
+        indexes_by_type = {}
+        for index, simulation in enumerate(simulations):
+            indexes_by_type.setdefault(simulation.simulation_type, []).append(index)
+        
+        records = [None] * len(simulations)
+        for simulation_type, indexes in indexes_by_type.items():
+            input_field = SIMULATION_INPUT_FIELDS[simulation_type]
+            overrides = {}
+            if history is not None:
+                dates = [as_of_dates[index] for index in indexes]
+                overrides = {
+                    'energy_prices_ars_per_kwh': history.energy_prices.values_at(dates),
+                    'exchange_rates': history.exchange_rates.values_at(dates),
+                }
+            columns = self.simulate_batch(
+                simulation_type,
+                [float(simulations[index].monthly_bill_ars) for index in indexes],
+                [float(getattr(simulations[index], input_field)) for index in indexes],
+                **overrides
+            )
+            for index, record in zip(indexes, quantize_batch_results(columns)):
+                records[index] = record
+        
+        return records
+    
+    def simulate_hourly(
+        self,
+        monthly_bill_ars: Decimal,
+        number_of_panels: int,
+        injection_price_percentage: Decimal = Decimal('0'),
+        user_email: str = "",
+        user_phone: str = ""
+    ) -> Tuple[SimulationResult, Dict[str, Any]]:
+        """
+        Panels simulation valued with the hourly energy balance (see hourly.py)
+        
+        Annual consumption is the bill expressed in kWh (monthly_bill_ars /
+        precio_energia, or through the block tariff, times 12), shaped by the
+        tariff category load profile;
+        generation is the panels' annual kWh shaped by the project profile.
+        Savings replace the flat 24 × 30 × 0.19 formula; the rest of the
+        result follows simulate_by_panels, including the bill restriction.
+        """
+        number_of_panels = self._apply_bill_restrictions(number_of_panels, monthly_bill_ars)
+        energy_price_ars = float(self.pricing.energy_price_ars_per_kwh)
+        
+        balance = simulate_hourly(
+            profile_store.get('generation', self.project.pk),
+            profile_store.get('load', self.tariff_category.code),
+            annual_generation_kwh=number_of_panels * float(self.profile.annual_generation_kwh_per_panel),
+            annual_consumption_kwh=float(self._monthly_consumption_kwh(monthly_bill_ars)) * 12,
+            energy_price_ars_per_kwh=energy_price_ars,
+            injection_price_percentage=float(injection_price_percentage),
+            tariff_schedule=self.tariff_schedule
+        )
+        
+        columns = self.simulate_batch('panels', monthly_bill_ars, number_of_panels, apply_bill_restrictions=False)
+        annual_savings_ars = np.atleast_1d(balance['monthly_savings_ars'].sum())
+        total_investment_ars = columns['total_investment_ars']
+        bills = columns['monthly_bill_ars']
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns.update({
+                'monthly_savings_ars': annual_savings_ars / 12,
+                'annual_savings_ars': annual_savings_ars,
+                'payback_period_years': np.where(
+                    annual_savings_ars > 0, total_investment_ars / annual_savings_ars, 999.0
+                ),
+                'roi_annual': np.where(
+                    total_investment_ars > 0, annual_savings_ars / total_investment_ars * 100, 0.0
+                ),
+                'bill_coverage_achieved': np.where(bills > 0, annual_savings_ars / 12 / bills * 100, 0.0),
+            })
+        
+        simulation = SimulationResult(
+            project=self.project,
+            tariff_category=self.tariff_category,
+            simulation_type='panels',
+            user_email=user_email,
+            user_phone=user_phone,
+            **quantize_batch_results(columns)[0]
+        )
+        return simulation, hourly_summary(balance)
+    
+    def quote_curve(self, max_panels: int, monthly_bill_ars: Optional[Decimal] = None) -> Dict[str, Any]:
+        """
+        Outputs for every panel count from 1 to max_panels, as compact columns.
+        
+        With a flat energy price the curve does not depend on the bill: clients
+        derive the bill limit as round(monthly_bill_ars / savings_per_panel_ars)
+        and the coverage as monthly_savings_ars / monthly_bill_ars * 100.
+        
+        With a block tariff the kWh are valued at the marginal block rates of
+        the consumption behind the bill, so the curve is evaluated for
+        monthly_bill_ars (required) and carries its bill limit and coverage.
+        """
+        panels = np.arange(1, max_panels + 1)
+        column_names = [
+            'total_investment_usd', 'total_investment_ars',
+            'installed_power_kw', 'monthly_generation_kwh',
+            'monthly_savings_ars', 'annual_savings_ars',
+            'payback_period_years', 'roi_annual',
+        ]
+        curve = {
+            'pricing_version': self.pricing.version,
+            'exchange_rate_used': float(self.exchange_rate),
+            'tariff_category_id': self.tariff_category.pk if self.tariff_category is not None else None,
+        }
+        
+        if self.tariff_schedule is None:
+            columns = self.simulate_batch('panels', 0, panels, apply_bill_restrictions=False)
+            curve['savings_per_panel_ars'] = float(self._calculate_monthly_savings(1))
+        else:
+            if monthly_bill_ars is None:
+                raise ValueError('Con una tarifa por bloques la curva requiere monthly_bill_ars')
+            columns = self.simulate_batch('panels', float(monthly_bill_ars), panels, apply_bill_restrictions=False)
+            limits = self._calculate_bill_based_limits(monthly_bill_ars)
+            curve.update({
+                'monthly_bill_ars': float(monthly_bill_ars),
+                'max_panels_for_bill_coverage': limits['max_panels_for_bill_coverage'],
+                # Saving of the first panel; the next ones fall into cheaper blocks
+                'savings_per_panel_ars': float(limits['savings_per_panel_ars']),
+            })
+            column_names.append('bill_coverage_achieved')
+        
+        curve['number_of_panels'] = panels.tolist()
+        for column_name in column_names:
+            curve[column_name] = np.round(columns[column_name], RESULT_DECIMAL_PLACES[column_name]).tolist()
+        
+        return curve
+    
+    def sensitivity_sweep(
+        self,
+        energy_prices_ars_per_kwh,
+        exchange_rates,
+        panel_counts,
+        monthly_bill_ars: Optional[Decimal] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Panels simulation over the full grid energy price x exchange rate x
+        panel count, computed in one batch call. Every column has shape
+        (len(energy_prices), len(exchange_rates), len(panel_counts)).
+        The bill limit is applied only when monthly_bill_ars is given.
+        """
+        energy_prices = np.asarray(energy_prices_ars_per_kwh, dtype=np.float64)[:, None, None]
+        rates = np.asarray(exchange_rates, dtype=np.float64)[None, :, None]
+        panels = np.asarray(panel_counts, dtype=np.float64)[None, None, :]
+        
+        return self.simulate_batch(
+            'panels',
+            float(monthly_bill_ars) if monthly_bill_ars is not None else 0,
+            panels,
+            apply_bill_restrictions=monthly_bill_ars is not None,
+            energy_prices_ars_per_kwh=energy_prices,
+            exchange_rates=rates
+        )
+    
+    def goal_seek(
+        self,
+        monthly_bill_ars: Decimal,
+        goal: str,
+        target: Decimal,
+        user_email: str = "",
+        user_phone: str = ""
+    ) -> Optional[SimulationResult]:
+        """
+        Find the panel count that meets a target and simulate it.
+        
+        - 'payback_years': largest system whose payback is <= target
+        - 'roi_annual': largest system whose annual ROI is >= target
+        - 'bill_coverage': smallest system whose bill coverage is >= target
+        
+        The search is bounded by the 100% bill coverage limit and the project's
+        available capacity. Within a price tier payback and ROI are monotonic in
+        the panel count, so each tier is solved by bisection and the best
+        feasible tier wins. Returns None when no panel count meets the target.
+        """
+        if goal not in GOAL_SEEK_METRICS:
+            raise ValueError(f"Objetivo inválido: {goal}")
+        
+        max_panels = self._apply_bill_restrictions(self.max_panels_for_capacity(), monthly_bill_ars)
+        if max_panels < 1:
+            return None
+        
+        metric_column = GOAL_SEEK_METRICS[goal]
+        target = float(target)
+        
+        def meets_target(panels: int) -> bool:
+            columns = self.simulate_batch(
+                'panels', monthly_bill_ars, panels, apply_bill_restrictions=False
+            )
+            value = float(columns[metric_column][0])
+            return value <= target if goal == 'payback_years' else value >= target
+        
+        if goal == 'bill_coverage':
+            # Coverage grows with the panel count: smallest panel count reaching the target
+            number_of_panels = _first_satisfying(1, max_panels, meets_target)
+        else:
+            number_of_panels = None
+            tiers = self.tiers
+            for index, (tier_min, _) in enumerate(tiers):
+                # Counts below the first tier are priced at it (see max_affordable_panels)
+                tier_min = tier_min if index else 1
+                tier_max = tiers[index + 1][0] - 1 if index + 1 < len(tiers) else max_panels
+                tier_max = min(tier_max, max_panels)
+                if tier_min > tier_max:
+                    continue
+                candidate = _last_satisfying(tier_min, tier_max, meets_target)
+                if candidate is not None:
+                    number_of_panels = max(number_of_panels or 0, candidate)
+        
+        if number_of_panels is None:
+            return None
+        
+        return self.simulate_by_panels(monthly_bill_ars, number_of_panels, user_email, user_phone)
+    
+    def max_panels_for_capacity(self) -> int:
+        """Number of panels that fit in the project's reservable power"""
+        panel_power_kw = self.profile.panel_power_kw
+        if panel_power_kw <= 0:
+            return 0
+        return int((reservable_power(self.project) / panel_power_kw).to_integral_value(ROUND_FLOOR))
+    
+    def project_cash_flows(
+        self,
+        total_investment_usd,
+        annual_savings_ars,
+        years: int = DEFAULT_PROJECTION_YEARS,
+        tariff_escalation_percentage: Decimal = Decimal('0'),
+        exchange_rate_drift_percentage: Decimal = Decimal('0'),
+        discount_rate_percentage: Decimal = Decimal(DEFAULT_DISCOUNT_RATE_PERCENTAGE)
+    ) -> List[Dict[str, Any]]:
+        """
+        Multi-year USD projection for one or many simulations.
+        
+        Applies system_degradation, tariff escalation and exchange rate drift
+        year by year and returns, per scenario, the cumulative cash flow,
+        simple and discounted payback, NPV and IRR (see projection.py).
+        """
+        projection = project_cash_flows(
+            np.atleast_1d(np.asarray(total_investment_usd, dtype=np.float64)),
+            np.atleast_1d(np.asarray(annual_savings_ars, dtype=np.float64)),
+            float(self.exchange_rate),
+            years=years,
+            degradation=float(self.system_degradation),
+            tariff_escalation=float(tariff_escalation_percentage) / 100,
+            exchange_rate_drift=float(exchange_rate_drift_percentage) / 100,
+            discount_rate=float(discount_rate_percentage) / 100
+        )
+        return projection_records(projection)
+    
+    def simulate_risk(
+        self,
+        simulation: SimulationResult,
+        paths: int = 10000,
+        years: int = DEFAULT_PROJECTION_YEARS,
+        seed: int = 0,
+        market: Optional[MarketParameters] = None,
+        discount_rate_percentage: Decimal = Decimal(DEFAULT_DISCOUNT_RATE_PERCENTAGE)
+    ) -> Dict[str, Any]:
+        """
+        Seeded Monte Carlo over exchange rate and energy price paths for a
+        simulation, returning P10/P50/P90 payback, ROI and NPV (see risk.py).
+        Market parameters default to the historical volatility in the database.
+        """
+        return run_to_completion(self.iter_simulate_risk(
+            simulation, paths, years, seed, market, discount_rate_percentage
+        ))
+    
+    def iter_simulate_risk(
+        self,
+        simulation: SimulationResult,
+        paths: int = 10000,
+        years: int = DEFAULT_PROJECTION_YEARS,
+        seed: int = 0,
+        market: Optional[MarketParameters] = None,
+        discount_rate_percentage: Decimal = Decimal(DEFAULT_DISCOUNT_RATE_PERCENTAGE)
+    ) -> Generator[int, None, Dict[str, Any]]:
+        """simulate_risk chunk by chunk (see iter_monte_carlo)"""
+        return iter_monte_carlo(
+            total_investment_usd=float(simulation.total_investment_usd),
+            annual_savings_ars=float(simulation.annual_savings_ars),
+            exchange_rate=float(self.exchange_rate),
+            paths=paths,
+            years=years,
+            seed=seed,
+            degradation=float(self.system_degradation),
+            discount_rate=float(discount_rate_percentage) / 100,
+            market=market if market is not None else MarketParameters.from_history()
+        )
+    
     def _calculate_tiered_panel_price(self, number_of_panels: int) -> Decimal:
         """
-        Calculate panel price based on tiered pricing:
+        Calculate panel price based on the project's tier table (PricingTier),
+        by default:
         - 1-9 panels: $700 USD per panel
         - 10-99 panels: $500 USD per panel  
         - 100+ panels: $400 USD per panel
         """
-        if number_of_panels <= 9:
-            return Decimal('700')
-        elif number_of_panels <= 99:
-            return Decimal('500')
-        else:
-            return Decimal('400')
+        return self.tiers.price_for(number_of_panels)
     
     def _calculate_total_investment_tiered(self, number_of_panels: int) -> Decimal:
         """
-        Calculate total investment using uniform pricing based on tier:
+        Calculate total investment using uniform pricing based on tier
+        (default tiers shown):
         - 1-9 panels: $700 USD per panel (ALL panels at $700)
         - 10-99 panels: $500 USD per panel (ALL panels at $500)
         - 100+ panels: $400 USD per panel (ALL panels at $400)
         """
         # Determine the price per panel based on total quantity
-        if number_of_panels <= 9:
-            price_per_panel = Decimal('700')
-        elif number_of_panels <= 99:
-            price_per_panel = Decimal('500')
-        else:
-            price_per_panel = Decimal('400')
+        price_per_panel = self._calculate_tiered_panel_price(number_of_panels)
         
         total_cost = number_of_panels * price_per_panel
         return total_cost
 
-    def _calculate_monthly_savings(self, number_of_panels: int) -> Decimal:
+    def _monthly_consumption_kwh(self, monthly_bill_ars: Decimal) -> Decimal:
+        """Monthly kWh behind a bill: bill / precio_energia, or inverted through the block tariff"""
+        if self.tariff_schedule is None:
+            return monthly_bill_ars / self.pricing.energy_price_ars_per_kwh
+        return Decimal(repr(float(self.tariff_schedule.consumption_for_bill(float(monthly_bill_ars)))))
+    
+    def _calculate_monthly_savings(self, number_of_panels, monthly_bill_ars: Optional[Decimal] = None) -> Decimal:
         """
         Calculate monthly savings based on new formula:
         Ahorro Mensual (ARS) = cant_paneles × 0.66 × precio_energia × 24 × 30 × 0.19
@@ -314,32 +911,23 @@ class SolarInvestmentCalculator:
         - 24: Hours per day
         - 30: Days per month
         - 0.19: System performance factor
-        """
-        energy_price_ars = Decimal(str(EnergyPrice.get_current_price()))
         
-        monthly_savings_ars = (
-            Decimal(str(number_of_panels)) * 
-            Decimal('0.66') * 
-            energy_price_ars * 
-            Decimal('24') * 
-            Decimal('30') * 
-            Decimal('0.19')
-        )
+        The product of the constants and the energy price is precomputed in
+        savings_per_panel_ars. With a block tariff and a bill, the panels' kWh
+        are instead valued at the marginal block rates of the consumption.
+        """
+        if self.tariff_schedule is None or monthly_bill_ars is None:
+            return Decimal(str(number_of_panels)) * self.savings_per_panel_ars
         
-        return monthly_savings_ars
+        avoided_kwh = float(number_of_panels) * float(self.profile.monthly_savings_kwh_per_panel)
+        consumption_kwh = self.tariff_schedule.consumption_for_bill(float(monthly_bill_ars))
+        return Decimal(repr(float(self.tariff_schedule.avoided_cost(consumption_kwh, avoided_kwh))))
     
     def get_project_capacity_check(self, required_power_kw: Decimal) -> Dict[str, Any]:
         """
         Check if the project has enough available capacity
         """
-        available_power_kw = self.project.available_power
-        
-        return {
-            'has_capacity': required_power_kw <= available_power_kw,
-            'required_power_kw': float(required_power_kw),
-            'available_power_kw': float(available_power_kw),
-            'utilization_percentage': float((required_power_kw / available_power_kw) * 100) if available_power_kw > 0 else 0
-        }
+        return capacity_check(required_power_kw, reservable_power(self.project))
     
     def _calculate_bill_based_limits(self, monthly_bill_ars: Decimal) -> Dict[str, Any]:
         """
@@ -356,20 +944,20 @@ class SolarInvestmentCalculator:
         
         # Calculate maximum panels based on what would generate savings equal to the bill
         # For 100% coverage, we need panels that generate monthly_bill_ars in savings
-        energy_price_ars = Decimal(str(EnergyPrice.get_current_price()))
-        
         # Use the new coverage formula in reverse
         # monthly_bill_ars = number_of_panels * ahorro_por_panel
         # ahorro_por_panel = 0.66 × 101.25 × 24 × 30 × 0.19 = 9,141.66
-        ahorro_por_panel = (
-            Decimal('0.66') * 
-            energy_price_ars * 
-            Decimal('24') * 
-            Decimal('30') * 
-            Decimal('0.19')
-        )
+        ahorro_por_panel = self.savings_per_panel_ars
         
-        max_panels_for_bill = int((monthly_bill_ars / ahorro_por_panel).to_integral_value())
+        if self.tariff_schedule is None:
+            max_panels_for_bill = int((monthly_bill_ars / ahorro_por_panel).to_integral_value())
+        else:
+            # Block tariff: panels whose kWh match the consumption behind the bill
+            consumption_kwh = self._monthly_consumption_kwh(monthly_bill_ars)
+            max_panels_for_bill = int(
+                (consumption_kwh / self.profile.monthly_savings_kwh_per_panel).to_integral_value()
+            )
+            ahorro_por_panel = self._calculate_monthly_savings(1, monthly_bill_ars)
         
         return {
             'max_investment_usd': max_investment_usd,
@@ -0,0 +1,256 @@
+"""
+Compact simulation storage
+
+With SIMULATION_STORAGE_MODE = 'compact', new simulations are saved with their
+inputs, a SimulationSnapshot id and the engine version only; the result
+columns stay NULL. A snapshot holds the prices and engine parameters one
+project was simulated with. Its id is a hash of its content, so every
+simulation saved under the same state shares one row.
+
+Results are derived the first time they are read (InvestmentSimulation.from_db
+defers the NULL columns) through a memoized engine call, so the API response
+does not change. materialize_results() writes them back into the row for
+simulations that are read often. A compact row can only be derived by the
+ENGINE_VERSION that saved it: materialize_simulations() must run before the
+version is bumped, or resimulate_simulations() after.
+"""
+
+import hashlib
+import json
+from decimal import Decimal
+from functools import lru_cache
+from types import MappingProxyType, SimpleNamespace
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.utils import format_number
+from django.db.models import Count, Sum
+
+from projects.models import SolarProject
+
+from .models import InvestmentSimulation, SimulationSnapshot, TariffCategory
+from .pricing import PricingSnapshot, TierTable
+from .profiles import EngineProfile
+from .simulation_engine import ENGINE_VERSION, SIMULATION_INPUT_FIELDS, SolarInvestmentCalculator
+from .tariffs import TariffSchedule
+
+
+STORAGE_MODE_FULL = 'full'
+STORAGE_MODE_COMPACT = 'compact'
+
+MATERIALIZE_CHUNK_SIZE = 500
+
+
+class StaleEngineVersion(Exception):
+    """A compact simulation was saved by another ENGINE_VERSION and cannot be derived"""
+
+
+def compact_storage_enabled() -> bool:
+    return getattr(settings, 'SIMULATION_STORAGE_MODE', STORAGE_MODE_FULL) == STORAGE_MODE_COMPACT
+
+
+def snapshot_data(pricing: PricingSnapshot, profile: EngineProfile, project_id: Optional[int]) -> Dict[str, Any]:
+    """JSON form of every price and parameter the engine reads for one project"""
+    return {
+        'energy_price_ars_per_kwh': str(pricing.energy_price_ars_per_kwh),
+        'exchange_rate': str(pricing.exchange_rate),
+        'panel_price_tiers': [[tier_min, str(price)] for tier_min, price in pricing.tiers_for(project_id)],
+        'tariff_schedules': {
+            str(tariff_category_id): {
+                'blocks': [[from_kwh, str(price)] for from_kwh, price in schedule.blocks],
+                'fixed_charge_ars': str(schedule.fixed_charge_ars),
+                'tax_percentage': str(schedule.tax_percentage),
+            }
+            for tariff_category_id, schedule in pricing.tariff_schedules.items()
+        },
+        'panel_power_kw': str(profile.panel_power_kw),
+        'annual_generation_factor': str(profile.annual_generation_factor),
+        'performance_ratio': str(profile.performance_ratio),
+    }
+
+
+def snapshot_version(data: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+# (pricing version, profile, project id) -> snapshot version already stored
+_registered_versions: Dict[Tuple[str, EngineProfile, Optional[int]], str] = {}
+
+
+def register_snapshot(pricing: PricingSnapshot, profile: EngineProfile, project_id: Optional[int]) -> str:
+    """Store the snapshot of a project's current state once and return its version"""
+    key = (pricing.version, profile, project_id)
+    version = _registered_versions.get(key)
+    if version is None:
+        data = snapshot_data(pricing, profile, project_id)
+        version = snapshot_version(data)
+        SimulationSnapshot.objects.get_or_create(version=version, defaults={'data': data})
+        # Remembered once the row is committed: a rolled back snapshot must be
+        # created again by the next save
+        transaction.on_commit(lambda: _registered_versions.__setitem__(key, version))
+    return version
+
+
+@lru_cache(maxsize=256)
+def load_snapshot(version: str) -> Tuple[PricingSnapshot, EngineProfile]:
+    """Pricing and profile of a stored snapshot (rows never change, so they are cached for good)"""
+    data = SimulationSnapshot.objects.get(pk=version).data
+    pricing = PricingSnapshot(
+        energy_price_ars_per_kwh=Decimal(data['energy_price_ars_per_kwh']),
+        exchange_rate=Decimal(data['exchange_rate']),
+        panel_price_tiers=TierTable(data['panel_price_tiers']),
+        tariff_schedules=MappingProxyType({
+            int(tariff_category_id): TariffSchedule(
+                schedule['blocks'], Decimal(schedule['fixed_charge_ars']), Decimal(schedule['tax_percentage'])
+            )
+            for tariff_category_id, schedule in data['tariff_schedules'].items()
+        }),
+    )
+    profile = EngineProfile(
+        panel_power_kw=Decimal(data['panel_power_kw']),
+        annual_generation_factor=Decimal(data['annual_generation_factor']),
+        performance_ratio=Decimal(data['performance_ratio']),
+    )
+    return pricing, profile
+
+
+def as_stored(name: str, value):
+    """Round a result the way saving it in its column would"""
+    if isinstance(value, Decimal):
+        field = InvestmentSimulation._meta.get_field(name)
+        return Decimal(format_number(value, field.max_digits, field.decimal_places))
+    return value
+
+
+def check_engine_version(engine_version: str):
+    if engine_version != ENGINE_VERSION:
+        raise StaleEngineVersion(
+            f'Simulación compacta guardada con el motor {engine_version or "desconocido"} '
+            f'(actual: {ENGINE_VERSION}); ejecute resimulate_simulations para recalcularla'
+        )
+
+
+@lru_cache(maxsize=getattr(settings, 'SIMULATION_DERIVATION_CACHE_SIZE', 4096))
+def _derive(
+    snapshot_version: str,
+    engine_version: str,
+    project_id: int,
+    tariff_category_id: int,
+    simulation_type: str,
+    monthly_bill_ars: Decimal,
+    input_value
+) -> Tuple[Tuple[str, Any], ...]:
+    check_engine_version(engine_version)
+    pricing, profile = load_snapshot(snapshot_version)
+    calculator = SolarInvestmentCalculator(
+        SolarProject(pk=project_id), TariffCategory(pk=tariff_category_id), pricing=pricing, profile=profile
+    )
+    result = calculator.resimulate(SimpleNamespace(
+        simulation_type=simulation_type,
+        monthly_bill_ars=monthly_bill_ars,
+        user_email='',
+        user_phone='',
+        **{SIMULATION_INPUT_FIELDS[simulation_type]: input_value}
+    ))
+    return tuple((name, as_stored(name, getattr(result, name))) for name in InvestmentSimulation.RESULT_FIELDS)
+
+
+def derive_results(simulation) -> Dict[str, Any]:
+    """
+    Results of a compact simulation, computed from its snapshot and memoized.
+    Raises StaleEngineVersion for rows saved by another ENGINE_VERSION.
+    """
+    return dict(_derive(
+        simulation.snapshot_id,
+        simulation.engine_version,
+        simulation.project_id,
+        simulation.tariff_category_id,
+        simulation.simulation_type,
+        simulation.monthly_bill_ars,
+        getattr(simulation, SIMULATION_INPUT_FIELDS[simulation.simulation_type]),
+    ))
+
+
+def save_simulation(simulation: InvestmentSimulation, calculator: SolarInvestmentCalculator) -> InvestmentSimulation:
+    """
+    Save a new simulation computed by calculator. In compact mode its results
+    are left out of the row but kept on the instance for the response.
+    """
+    if not compact_storage_enabled():
+        simulation.save()
+        return simulation
+
+    simulation.snapshot_id = register_snapshot(calculator.pricing, calculator.profile, simulation.project_id)
+    simulation.engine_version = ENGINE_VERSION
+    input_field = SIMULATION_INPUT_FIELDS[simulation.simulation_type]
+    results = {name: getattr(simulation, name) for name in InvestmentSimulation.RESULT_FIELDS if name != input_field}
+    for name in results:
+        setattr(simulation, name, None)
+    simulation.save()
+    for name, value in results.items():
+        setattr(simulation, name, value)
+    return simulation
+
+
+def materialize_results(simulation: InvestmentSimulation) -> bool:
+    """Write the derived results of a compact simulation into its row; False if there were none"""
+    derived_fields = getattr(simulation, '_derived_fields', frozenset())
+    if not derived_fields:
+        return False
+
+    values = derive_results(simulation)
+    InvestmentSimulation.objects.filter(pk=simulation.pk).update(
+        **{name: values[name] for name in derived_fields}
+    )
+    for name in derived_fields:
+        simulation.__dict__.setdefault(name, values[name])
+    simulation._derived_fields = frozenset()
+    return True
+
+
+def materialize_simulations(queryset=None) -> int:
+    """Materialize every compact simulation of queryset, e.g. before bumping ENGINE_VERSION"""
+    if queryset is None:
+        queryset = InvestmentSimulation.objects.all()
+    queryset = queryset.filter(snapshot__isnull=False, total_investment_usd__isnull=True)
+    return sum(materialize_results(simulation) for simulation in queryset.iterator(chunk_size=MATERIALIZE_CHUNK_SIZE))
+
+
+def result_averages(queryset, fields: Iterable[str]) -> Dict[str, Optional[Decimal]]:
+    """
+    Averages of result fields over queryset, compact rows included: stored
+    columns are summed in the database and the NULL ones of compact rows are
+    derived with one batch call per snapshot, project and tariff category.
+    """
+    fields = list(fields)
+    stored = queryset.aggregate(
+        **{f'{name}__count': Count(name) for name in fields},
+        **{f'{name}__sum': Sum(name) for name in fields}
+    )
+    counts = {name: stored[f'{name}__count'] for name in fields}
+    sums = {name: stored[f'{name}__sum'] or Decimal('0') for name in fields}
+
+    columns = ['project_id', 'tariff_category_id', 'snapshot_id', 'engine_version', 'simulation_type', 'monthly_bill_ars']
+    columns = list(dict.fromkeys(columns + list(SIMULATION_INPUT_FIELDS.values()) + fields))
+    compact = queryset.filter(snapshot__isnull=False, total_investment_usd__isnull=True)
+    groups = {}
+    for row in compact.values(*columns).iterator(chunk_size=MATERIALIZE_CHUNK_SIZE):
+        if row[SIMULATION_INPUT_FIELDS[row['simulation_type']]] is None:
+            continue
+        check_engine_version(row['engine_version'])
+        groups.setdefault((row['snapshot_id'], row['project_id'], row['tariff_category_id']), []).append(row)
+
+    for (version, project_id, tariff_category_id), rows in groups.items():
+        pricing, profile = load_snapshot(version)
+        calculator = SolarInvestmentCalculator(
+            SolarProject(pk=project_id), TariffCategory(pk=tariff_category_id), pricing=pricing, profile=profile
+        )
+        for row, record in zip(rows, calculator.resimulate_batch([SimpleNamespace(**row) for row in rows])):
+            # Only the columns the row left NULL, the others were summed above
+            for name in fields:
+                if row[name] is None and record[name] is not None:
+                    counts[name] += 1
+                    sums[name] += as_stored(name, record[name])
+
+    return {name: sums[name] / counts[name] if counts[name] else None for name in fields}
@@ -0,0 +1,89 @@
+"""
+Block tariff bill model
+
+A TariffSchedule is the compiled form of a TariffCategory with TariffBlock
+rows: the monthly bill is (fixed charge + energy charge) × (1 + taxes), where
+the energy charge bills every kWh at the price of the block it falls in.
+
+The energy charge is piecewise linear in the consumption, so the schedule
+keeps it as (kWh, ARS) breakpoint arrays and evaluates it, and its inverse,
+with np.interp. Every method accepts scalars or arrays.
+"""
+
+from decimal import Decimal
+from typing import Iterable, Tuple
+
+import numpy as np
+
+
+# Consumption of the last breakpoint, standing in for "no upper limit"
+OPEN_BLOCK_KWH = 1e12
+
+
+class TariffSchedule:
+    """Consumption blocks, fixed charge and taxes of a tariff category"""
+
+    __slots__ = ('blocks', 'fixed_charge_ars', 'tax_percentage', 'tax_factor', 'kwh_points', 'energy_charge_points')
+
+    def __init__(
+        self,
+        blocks: Iterable[Tuple[int, Decimal]],
+        fixed_charge_ars: Decimal = Decimal('0'),
+        tax_percentage: Decimal = Decimal('0')
+    ):
+        compiled = dict(sorted((int(from_kwh), Decimal(price)) for from_kwh, price in blocks))
+        if not compiled:
+            raise ValueError('El cuadro tarifario debe tener al menos un bloque de consumo')
+        if any(price <= 0 for price in compiled.values()):
+            raise ValueError('Los precios de los bloques de consumo deben ser positivos')
+
+        # The first block always starts at 0 kWh
+        thresholds = [0] + list(compiled)[1:]
+        prices = list(compiled.values())
+        self.blocks = tuple(zip(thresholds, prices))
+        self.fixed_charge_ars = Decimal(fixed_charge_ars)
+        self.tax_percentage = Decimal(tax_percentage)
+        self.tax_factor = 1 + float(self.tax_percentage) / 100
+
+        self.kwh_points = np.array(thresholds + [OPEN_BLOCK_KWH], dtype=np.float64)
+        block_charges = np.diff(self.kwh_points) * np.array([float(price) for price in prices])
+        self.energy_charge_points = np.concatenate([[0.0], np.cumsum(block_charges)])
+
+    def __repr__(self):
+        return f"TariffSchedule({list(self.blocks)}, fixed={self.fixed_charge_ars}, tax={self.tax_percentage}%)"
+
+    def signature(self) -> str:
+        blocks = ';'.join(f'{from_kwh}:{price}' for from_kwh, price in self.blocks)
+        return f'{blocks}+{self.fixed_charge_ars}x{self.tax_percentage}'
+
+    def energy_charge(self, consumption_kwh, price_scale=1.0):
+        """ARS energy charge (before taxes) of a monthly consumption"""
+        return np.interp(consumption_kwh, self.kwh_points, self.energy_charge_points) * price_scale
+
+    def bill_for_consumption(self, consumption_kwh, price_scale=1.0):
+        """Monthly bill in ARS, taxes included"""
+        return (float(self.fixed_charge_ars) + self.energy_charge(consumption_kwh, price_scale)) * self.tax_factor
+
+    def consumption_for_bill(self, monthly_bill_ars, price_scale=1.0):
+        """Monthly kWh that produce a bill (0 when it only covers the fixed charge)"""
+        energy_charge = np.maximum(
+            np.asarray(monthly_bill_ars, dtype=np.float64) / self.tax_factor - float(self.fixed_charge_ars), 0.0
+        )
+        return np.interp(energy_charge / price_scale, self.energy_charge_points, self.kwh_points)
+
+    def avoided_cost(self, consumption_kwh, avoided_kwh, price_scale=1.0):
+        """
+        Bill reduction in ARS when avoided_kwh of the consumption are self-generated:
+        the avoided kWh come off the top blocks first, so each one is valued at
+        the marginal block rate. kWh beyond the consumption are not valued.
+        """
+        consumption_kwh = np.asarray(consumption_kwh, dtype=np.float64)
+        remaining_kwh = np.maximum(consumption_kwh - avoided_kwh, 0.0)
+        return (
+            self.energy_charge(consumption_kwh, price_scale) - self.energy_charge(remaining_kwh, price_scale)
+        ) * self.tax_factor
+
+    def marginal_price(self, consumption_kwh) -> Decimal:
+        """ARS per kWh (taxes included) of the block a consumption ends in"""
+        index = max(int(np.searchsorted(self.kwh_points, consumption_kwh, side='left')) - 1, 0)
+        return self.blocks[min(index, len(self.blocks) - 1)][1] * (1 + self.tax_percentage / 100)
@@ -0,0 +1,1645 @@
+from decimal import Decimal
+
+import itertools
+import json
+import pickle
+import threading
+import time
+import uuid
+from dataclasses import replace
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock, skipIf
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.backends.utils import format_number
+from django.db.models import Avg
+from django.contrib.admin.sites import site
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+
+from authentication.models import ProjectAccess
+from core.models import SiteSettings
+from projects.admin import SolarProjectAdmin
+from projects.models import SolarProject
+
+from .bulk import BulkSimulator, bulk_simulate, iter_ndjson_rows
+from .caching import ProcessCache, cache_is_shared, generation_cache
+from .coalescing import SingleFlight
+from .history import PriceHistory, invalidate_price_history
+from .hourly import HOURS_PER_YEAR, MONTH_START_HOURS, normalize_profile, simulate_hourly
+from .jobs import JOB_PLANNERS, claim_next_job, enqueue_job, requeue_stale_jobs, run_job
+from .models import (
+    CapacityReservation, EnergyPrice, ExchangeRate, InvestmentSimulation, InvestmentSimulationHistory, PricingTier,
+    SimulationJob, SimulationSnapshot, TariffBlock, TariffCategory
+)
+from .portfolio import ProjectOption, allocate_budget
+from .pricing import (
+    DEFAULT_TIER_TABLE, PANEL_PRICE_TIERS, PRICING_GENERATION_CACHE_KEY, PricingSnapshot, TierTable, get_current_pricing,
+    get_pricing_as_of, invalidate_pricing_cache
+)
+from .profiles import EngineProfile, get_engine_profile, invalidate_engine_profiles
+from .projection import internal_rate_of_return, net_present_value, payback_years, yearly_cash_flows
+from .ranking import RANKING_ORDERS, ProjectRanker
+from .reservations import (
+    CapacityUnavailable, confirm_reservation, expire_reservations, release_reservation, reservable_power,
+    reserve_capacity, return_idle_shards
+)
+from .resimulation import resimulate_simulations
+from .result_cache import SimulationResultCache
+from .risk import MarketParameters
+from .results import RESULT_DECIMAL_PLACES
+from .serializers import (
+    BulkSimulationRowSerializer, InvestmentSimulationSerializer, ProjectRankingSerializer, SimulationInputSerializer,
+    SimulationResultSerializer
+)
+from .simulation_engine import (
+    SolarInvestmentCalculator, max_affordable_panels, max_affordable_panels_array,
+    quantize_batch_results, tiered_cost_array
+)
+from . import jobs, storage
+
+
+def _create_project(**fields):
+    values = {
+        'name': 'Parque Solar', 'description': 'Proyecto de prueba', 'location': 'Mendoza',
+        'total_power_installed': Decimal('500.00'), 'total_power_projected': Decimal('1000.00'),
+        'available_power': Decimal('100.00'), 'price_per_wp_usd': Decimal('1.00'), 'owners': 'WeSolar',
+    }
+    values.update(fields)
+    return SolarProject.objects.create(**values)
+
+
+SIMULATION_INPUTS = [
+    ('panels', panels) for panels in (1, 6, 9, 10, 37, 99, 100, 140)
+] + [
+    ('investment', Decimal(amount)) for amount in ('700.00', '4298.74', '9999.99', '52000.00')
+] + [
+    ('bill_coverage', Decimal(percentage)) for percentage in ('12.50', '50.00', '75.50', '100.00')
+]
+
+
+def _save_simulations(project, tariff_category, bills=('85000.00', '250000.00', '1200000.00')):
+    """One saved simulation per bill and SIMULATION_INPUTS entry, computed by the scalar path"""
+    calculator = SolarInvestmentCalculator(project, tariff_category)
+    simulations = []
+    for bill in bills:
+        for simulation_type, value in SIMULATION_INPUTS:
+            result = calculator.simulate(simulation_type, Decimal(bill), value)
+            simulation = result.to_model(user_email='cliente@example.com', user_phone='+541100000000')
+            simulation.save()
+            simulations.append(simulation)
+    return simulations
+
+
+def _tiered_cost(number_of_panels, tiers=PANEL_PRICE_TIERS):
+    price_per_panel = tiers[0][1]
+    for tier_min, tier_price in tiers:
+        if number_of_panels >= tier_min:
+            price_per_panel = tier_price
+    return number_of_panels * price_per_panel
+
+
+def _brute_force_max_panels(investment_amount_usd, tiers=PANEL_PRICE_TIERS, upper=2000):
+    best = 0
+    for panels in range(1, upper + 1):
+        if _tiered_cost(panels, tiers) <= investment_amount_usd:
+            best = panels
+    return best
+
+
+class MaxAffordablePanelsTests(SimpleTestCase):
+    """The closed-form solver must agree with an exhaustive search"""
+
+    def test_matches_brute_force_on_dense_grid(self):
+        for cents in range(0, 8_100_000, 4_990):
+            budget = Decimal(cents) / 100
+            self.assertEqual(
+                max_affordable_panels(budget),
+                _brute_force_max_panels(budget),
+                msg=f'budget={budget}'
+            )
+
+    def test_tier_boundaries(self):
+        # 9 panels at $700 cost more than 10 panels at $500
+        self.assertEqual(max_affordable_panels(Decimal('5000')), 10)
+        self.assertEqual(max_affordable_panels(Decimal('6299.99')), 12)
+        self.assertEqual(max_affordable_panels(Decimal('40000')), 100)
+        self.assertEqual(max_affordable_panels(Decimal('39999.99')), 79)
+        self.assertEqual(max_affordable_panels(Decimal('699.99')), 0)
+        self.assertEqual(max_affordable_panels(Decimal('0')), 0)
+
+    def test_no_upper_panel_cap(self):
+        self.assertEqual(max_affordable_panels(Decimal('1000000')), 2500)
+
+    def test_custom_tier_table(self):
+        tiers = ((1, Decimal('300')), (5, Decimal('100')), (20, Decimal('90')))
+        for budget in range(0, 4000, 3):
+            budget = Decimal(budget)
+            self.assertEqual(
+                max_affordable_panels(budget, tiers),
+                _brute_force_max_panels(budget, tiers, upper=100),
+                msg=f'budget={budget}'
+            )
+
+
+class TierTableTests(TestCase):
+    """The tier table, the solver and the batch cost must share one pricing rule"""
+
+    def test_compilation(self):
+        table = TierTable([(10, '500'), (1, 700), (100, Decimal('400'))])
+        self.assertEqual(table.breakpoints, (1, 10, 100))
+        self.assertEqual(table.prices, (Decimal('700'), Decimal('500'), Decimal('400')))
+        self.assertEqual(list(table.breakpoint_array), [1, 10, 100])
+        self.assertEqual(table, DEFAULT_TIER_TABLE)
+        self.assertEqual(table.signature(), '1:700;10:500;100:400')
+        with self.assertRaises(ValueError):
+            TierTable([])
+
+    def test_lookup_solver_and_batch_agree(self):
+        # The first tier starts above one panel: smaller counts are priced at it
+        table = TierTable([(5, '300'), (20, '90')])
+        self.assertEqual(table.price_for(1), Decimal('300'))
+        self.assertEqual(table.cost_for(3), Decimal('900'))
+        panels = np.arange(1, 60)
+        self.assertEqual(tiered_cost_array(panels, table).tolist(), [float(table.cost_for(int(n))) for n in panels])
+        budgets = list(range(0, 4000, 7))
+        solved = max_affordable_panels_array(np.array(budgets, dtype=float), table)
+        for budget, panels_from_array in zip(budgets, solved):
+            expected = _brute_force_max_panels(Decimal(budget), table, upper=100)
+            self.assertEqual(max_affordable_panels(Decimal(budget), table), expected, msg=f'budget={budget}')
+            self.assertEqual(panels_from_array, expected, msg=f'budget={budget}')
+        self.assertEqual(max_affordable_panels(Decimal('1200')), max_affordable_panels(Decimal('1200'), DEFAULT_TIER_TABLE))
+
+    def test_project_tiers_override_the_default(self):
+        self.addCleanup(invalidate_pricing_cache)
+        project = _create_project()
+        other_project = _create_project()
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingTier.objects.create(project=project, min_panels=5, price_per_panel_usd=Decimal('300'))
+            PricingTier.objects.create(project=project, min_panels=20, price_per_panel_usd=Decimal('90'))
+
+        calculator = SolarInvestmentCalculator(project, None)
+        self.assertEqual(calculator.tiers, TierTable([(5, 300), (20, 90)]))
+        self.assertEqual(SolarInvestmentCalculator(other_project, None).tiers, DEFAULT_TIER_TABLE)
+        # $1,200 buys four panels at the first project tier, not zero
+        result = calculator.simulate('investment', Decimal('250000'), Decimal('1200'))
+        self.assertEqual(result.number_of_panels, 4)
+        self.assertEqual(result.total_investment_usd, Decimal('1200'))
+        columns = calculator.simulate_batch('investment', [250000.0], [1200.0])
+        self.assertEqual(columns['number_of_panels'].tolist(), [4])
+        # Goal-seek searches the same range: this bill limits the system to three panels
+        small_bill = (calculator.savings_per_panel_ars * Decimal('3.2')).quantize(Decimal('0.01'))
+        self.assertEqual(calculator._calculate_bill_based_limits(small_bill)['max_panels_for_bill_coverage'], 3)
+        self.assertEqual(calculator.goal_seek(small_bill, 'roi_annual', Decimal('0.01')).number_of_panels, 3)
+
+
+def _stored(field_name, value):
+    """value as InvestmentSimulation's DecimalField saves it"""
+    field = InvestmentSimulation._meta.get_field(field_name)
+    return Decimal(format_number(value, field.max_digits, field.decimal_places))
+
+
+class BatchScalarParityTests(SimpleTestCase):
+    """simulate_batch must store exactly what the scalar simulations store"""
+
+    def setUp(self):
+        project = SolarProject(id=1, name='Parque', location='Mendoza', panel_power_wp=Decimal('550'))
+        self.calculator = SolarInvestmentCalculator(
+            project, None,
+            pricing=PricingSnapshot(energy_price_ars_per_kwh=Decimal('120.50'), exchange_rate=Decimal('1180.00')),
+            profile=EngineProfile(panel_power_kw=Decimal('0.55'))
+        )
+
+    def assertParity(self, simulation_type, bills, inputs):
+        columns = self.calculator.simulate_batch(
+            simulation_type, [float(bill) for bill in bills], [float(value) for value in inputs]
+        )
+        for bill, value, record in zip(bills, inputs, quantize_batch_results(columns)):
+            result = self.calculator.simulate(simulation_type, bill, value)
+            self.assertEqual(record['number_of_panels'], result.number_of_panels)
+            for field_name in RESULT_DECIMAL_PLACES:
+                if field_name in record and field_name not in ('monthly_savings_usd', 'annual_savings_usd'):
+                    self.assertEqual(
+                        record[field_name], _stored(field_name, getattr(result, field_name)),
+                        msg=f'{simulation_type} bill={bill} input={value} {field_name}'
+                    )
+
+    def test_panels(self):
+        panels = list(range(1, 301))
+        self.assertParity('panels', [Decimal('250000.00')] * len(panels), panels)
+
+    def test_investment(self):
+        amounts = [Decimal(cents) / 100 for cents in range(70000, 6000000, 19993)]
+        self.assertParity('investment', [Decimal('400000.00')] * len(amounts), amounts)
+
+    def test_bill_coverage(self):
+        bills = [Decimal(cents) / 100 for cents in range(1000000, 40000000, 131071)]
+        self.assertParity('bill_coverage', bills, [Decimal('75.50')] * len(bills))
+
+
+class PricingSnapshotTests(TestCase):
+    """A calculator prices every formula from the one snapshot it was built with"""
+
+    def setUp(self):
+        self.addCleanup(invalidate_pricing_cache)
+        self.project = _create_project()
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+
+    def test_version_follows_the_values(self):
+        pricing = PricingSnapshot(energy_price_ars_per_kwh=Decimal('120.50'), exchange_rate=Decimal('1180.00'))
+        same = PricingSnapshot(energy_price_ars_per_kwh=Decimal('120.50'), exchange_rate=Decimal('1180.00'))
+        self.assertEqual(pricing.version, same.version)
+        self.assertNotEqual(pricing.version, replace(pricing, exchange_rate=Decimal('1181.00'), version='').version)
+        self.assertEqual(pickle.loads(pickle.dumps(pricing)), pricing)
+        with self.assertRaises(AttributeError):
+            pricing.exchange_rate = Decimal('1.00')
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_price_change_does_not_reach_a_built_calculator(self):
+        calculator = SolarInvestmentCalculator(self.project, self.tariff_category)
+        before = calculator.simulate('panels', Decimal('250000.00'), 12)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(rate=calculator.exchange_rate * 2, date=date.today())
+
+        again = calculator.simulate('panels', Decimal('250000.00'), 12)
+        self.assertEqual(again.total_investment_ars, before.total_investment_ars)
+        self.assertEqual(again.exchange_rate_used, before.exchange_rate_used)
+        fresh = SolarInvestmentCalculator(self.project, self.tariff_category)
+        self.assertEqual(fresh.exchange_rate, calculator.exchange_rate * 2)
+        self.assertNotEqual(fresh.pricing.version, calculator.pricing.version)
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=3600)
+    def test_warm_calculator_runs_no_queries(self):
+        SolarInvestmentCalculator(self.project, self.tariff_category)
+        with self.assertNumQueries(0):
+            calculator = SolarInvestmentCalculator(self.project, self.tariff_category)
+            for simulation_type, value in SIMULATION_INPUTS:
+                calculator.simulate(simulation_type, Decimal('250000.00'), value)
+
+
+class EngineProfileTests(TestCase):
+    """Physical parameters come from SiteSettings and the project, compiled once"""
+
+    def setUp(self):
+        self.addCleanup(invalidate_engine_profiles)
+        self.project = _create_project(panel_power_wp=Decimal('550'))
+
+    def test_coefficients(self):
+        profile = EngineProfile(panel_power_kw=Decimal('0.55'))
+        self.assertEqual(profile.annual_generation_kwh_per_panel, Decimal('0.55') * 1500 * Decimal('0.85'))
+        self.assertEqual(profile.savings_per_panel_ars(Decimal('100')), Decimal('0.66') * 24 * 30 * Decimal('0.19') * 100)
+        self.assertEqual(profile.version, EngineProfile(panel_power_kw=Decimal('0.550')).version)
+        self.assertNotEqual(profile.version, EngineProfile(panel_power_kw=Decimal('0.6')).version)
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_site_settings_and_panel_power_reach_new_calculators(self):
+        before = SolarInvestmentCalculator(self.project, None).simulate('panels', Decimal('250000.00'), 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            site_settings = SiteSettings.get_settings()
+            site_settings.default_annual_generation_factor = Decimal('1800.00')
+            site_settings.default_performance_ratio = Decimal('0.800')
+            site_settings.save()
+
+        profile = get_engine_profile(self.project)
+        self.assertEqual((profile.annual_generation_factor, profile.performance_ratio), (Decimal('1800'), Decimal('0.8')))
+        after = SolarInvestmentCalculator(self.project, None).simulate('panels', Decimal('250000.00'), 20)
+        self.assertEqual(
+            after.monthly_generation_kwh / before.monthly_generation_kwh, Decimal('1800') * Decimal('0.8') / (1500 * Decimal('0.85'))
+        )
+
+        # An edited, unsaved project never reads the profile of its previous power
+        self.project.panel_power_wp = Decimal('600')
+        self.assertEqual(get_engine_profile(self.project).panel_power_kw, Decimal('0.6'))
+        self.assertEqual(SolarInvestmentCalculator(self.project, None).simulate('panels', Decimal('250000.00'), 20).installed_power_kw, 12)
+
+
+class CashFlowProjectionTests(SimpleTestCase):
+    """Projection metrics on cash flows with a known answer"""
+
+    def test_known_irr_npv_and_payback(self):
+        flows = np.array([
+            [-100.0, 110.0, 0.0, 0.0],
+            [-1000.0, 500.0, 500.0, 500.0],
+            [-100.0, 40.0, 40.0, 40.0],
+            # Never recovered
+            [-100.0, 10.0, 10.0, 10.0],
+        ])
+        irr = internal_rate_of_return(flows)
+        self.assertAlmostEqual(irr[0], 0.10, places=9)
+        self.assertAlmostEqual(irr[1], 0.2337519285, places=9)
+        self.assertAlmostEqual(net_present_value(flows[:2], irr[:2])[0], 0.0, places=6)
+        self.assertAlmostEqual(net_present_value(flows[:2], irr[:2])[1], 0.0, places=6)
+        self.assertAlmostEqual(net_present_value(flows, 0.0)[2], 20.0)
+        self.assertLess(irr[3], 0)
+
+        payback = payback_years(flows)
+        self.assertAlmostEqual(payback[0], 100 / 110)
+        self.assertAlmostEqual(payback[1], 2.0)
+        self.assertAlmostEqual(payback[2], 2.5)
+        self.assertTrue(np.isnan(payback[3]))
+
+    def test_yearly_flows_apply_degradation_escalation_and_drift(self):
+        flows = yearly_cash_flows(
+            np.array([1000.0]), np.array([120000.0]), 1200.0, years=3,
+            degradation=0.01, tariff_escalation=0.10, exchange_rate_drift=0.20
+        )
+        factor = 0.99 * 1.10 / 1.20
+        self.assertEqual(flows.shape, (1, 4))
+        np.testing.assert_allclose(flows[0], [-1000.0, 100.0, 100.0 * factor, 100.0 * factor ** 2])
+
+    def test_calculator_projection(self):
+        project = SolarProject(id=1, name='Parque', location='Mendoza', panel_power_wp=Decimal('550'))
+        calculator = SolarInvestmentCalculator(
+            project, None,
+            pricing=PricingSnapshot(energy_price_ars_per_kwh=Decimal('120.50'), exchange_rate=Decimal('1000.00')),
+            profile=EngineProfile(panel_power_kw=Decimal('0.55'))
+        )
+        records = calculator.project_cash_flows(
+            [Decimal('5000'), Decimal('10000')], [Decimal('1000000'), Decimal('1000000')],
+            years=10, discount_rate_percentage=Decimal('0')
+        )
+        self.assertEqual(len(records), 2)
+        first = records[0]
+        self.assertEqual(len(first['cumulative_cash_flow_usd']), 11)
+        self.assertEqual(first['cumulative_cash_flow_usd'][:2], [-5000.0, -4000.0])
+        # Without discounting both paybacks match and NPV is the final cumulative flow
+        self.assertEqual(first['discounted_payback_years'], first['payback_years'])
+        self.assertAlmostEqual(first['npv_usd'], first['cumulative_cash_flow_usd'][-1], places=1)
+        self.assertGreater(first['irr_percentage'], records[1]['irr_percentage'])
+
+
+class ProcessCacheTests(TestCase):
+    """Invalidations must reach every process, including management commands"""
+
+    def setUp(self):
+        generation_cache().clear()
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return self.loads
+
+    def test_generations_backend_is_shared(self):
+        self.assertTrue(cache_is_shared())
+        # Only the generation tokens go to the database
+        self.assertIsInstance(caches['default'], LocMemCache)
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_invalidation_reaches_other_workers(self):
+        # Two caches on the same key stand for two worker processes
+        worker_a = ProcessCache('tests:generation', self._load)
+        worker_b = ProcessCache('tests:generation', self._load)
+        self.assertEqual(worker_a.get(), 1)
+        self.assertEqual(worker_b.get(), 2)
+        self.assertEqual(worker_b.get(), 2)
+
+        worker_a.invalidate()
+        self.assertEqual(worker_b.get(), 3)
+        self.assertEqual(worker_b.get(), 3)
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_price_change_reaches_other_workers(self):
+        self.addCleanup(invalidate_pricing_cache)
+        ExchangeRate.objects.create(rate=Decimal('1000.00'), date=date(2020, 1, 1))
+        other_worker = ProcessCache(PRICING_GENERATION_CACHE_KEY, PricingSnapshot.load)
+        self.assertEqual(other_worker.get().exchange_rate, Decimal('1000.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(rate=Decimal('1250.00'), date=date(2021, 1, 1))
+        self.assertEqual(other_worker.get().exchange_rate, Decimal('1250.00'))
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'generations': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        },
+        PRICING_CACHE_CHECK_SECONDS=0
+    )
+    def test_process_local_backend_reloads_after_max_age(self):
+        self.assertFalse(cache_is_shared())
+        worker = ProcessCache('tests:generation', self._load)
+        with self.settings(PRICING_CACHE_MAX_AGE_SECONDS=3600):
+            self.assertEqual(worker.get(), 1)
+            self.assertEqual(worker.get(), 1)
+        with self.settings(PRICING_CACHE_MAX_AGE_SECONDS=0):
+            self.assertEqual(worker.get(), 2)
+
+
+class QuoteCurveTests(TestCase):
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_site_settings_change_invalidates_curve(self):
+        cache.clear()
+        project = _create_project()
+        url = reverse('simulations:quote-curve', args=[project.pk]) + '?max_panels=20'
+        client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            site_settings = SiteSettings.objects.create(pk=1, default_performance_ratio=Decimal('0.850'))
+        first = client.get(url)
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            site_settings.default_performance_ratio = Decimal('0.800')
+            site_settings.save()
+        second = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertNotEqual(second.data['monthly_generation_kwh'], first.data['monthly_generation_kwh'])
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_block_tariff_curve_matches_the_engine(self):
+        cache.clear()
+        self.addCleanup(invalidate_pricing_cache)
+        project = _create_project()
+        with self.captureOnCommitCallbacks(execute=True):
+            tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+            for from_kwh, price in [(0, '60.00'), (300, '140.00'), (700, '230.00')]:
+                TariffBlock.objects.create(
+                    tariff_category=tariff_category, from_kwh=from_kwh, price_ars_per_kwh=Decimal(price)
+                )
+        url = reverse('simulations:quote-curve', args=[project.pk])
+        client = APIClient()
+        params = {'tariff_category_id': tariff_category.pk, 'max_panels': 60}
+        self.assertEqual(client.get(url, params).status_code, 400)
+
+        curve = client.get(url, dict(params, monthly_bill_ars='180000')).data
+        calculator = SolarInvestmentCalculator(project, tariff_category)
+        limits = calculator._calculate_bill_based_limits(Decimal('180000'))
+        self.assertEqual(curve['max_panels_for_bill_coverage'], limits['max_panels_for_bill_coverage'])
+        for panels in range(1, limits['max_panels_for_bill_coverage'] + 1):
+            result = calculator.simulate('panels', Decimal('180000'), panels)
+            for name in ('monthly_savings_ars', 'payback_period_years', 'bill_coverage_achieved'):
+                self.assertAlmostEqual(curve[name][panels - 1], float(getattr(result, name)), places=2, msg=(panels, name))
+
+        other_bill = client.get(url, dict(params, monthly_bill_ars='90000'))
+        flat = client.get(url, {'max_panels': 60})
+        self.assertEqual(len({curve_response['ETag'] for curve_response in (
+            client.get(url, dict(params, monthly_bill_ars='180000')), other_bill, flat
+        )}), 3)
+        self.assertNotIn('bill_coverage_achieved', flat.data)
+
+
+class SimulationParametersSerializerTests(SimpleTestCase):
+    """Every serializer that sizes a simulation takes exactly one sizing parameter"""
+
+    def test_exactly_one_parameter(self):
+        base_data = [
+            (SimulationInputSerializer, {'project_id': 1, 'monthly_bill_ars': '250000', 'tariff_category_id': 1}),
+            (BulkSimulationRowSerializer, {'monthly_bill_ars': '250000', 'tariff_category': 'T1'}),
+            (ProjectRankingSerializer, {'monthly_bill_ars': '250000', 'tariff_category_id': 1}),
+        ]
+        for serializer_class, data in base_data:
+            self.assertFalse(serializer_class(data=data).is_valid(), msg=serializer_class.__name__)
+            self.assertFalse(
+                serializer_class(data=dict(data, number_of_panels=10, investment_amount_usd='5000')).is_valid(),
+                msg=serializer_class.__name__
+            )
+            serializer = serializer_class(data=dict(data, number_of_panels=10, bill_coverage_percentage=None))
+            self.assertTrue(serializer.is_valid(), msg=serializer.errors)
+
+
+class SensitivitySweepTests(TestCase):
+    """Every sweep cell must match a scalar simulation at that price and rate"""
+
+    def setUp(self):
+        cache.clear()
+        self.project = _create_project()
+        self.url = reverse('simulations:sensitivity-sweep')
+        self.request = {
+            'project_id': self.project.pk, 'monthly_bill_ars': '900000.00',
+            'energy_price': {'values': ['95.00', '160.00']},
+            'exchange_rate': {'start': '1000.00', 'stop': '1600.00', 'steps': 3},
+            'number_of_panels': {'start': '1', 'stop': '40', 'steps': 40},
+        }
+
+    def test_json_cells_match_scalar_simulations(self):
+        response = APIClient().post(self.url, self.request, format='json')
+        self.assertEqual(response.status_code, 200)
+        axes, shape, columns = response.data['axes'], response.data['shape'], response.data['columns']
+        self.assertEqual(axes['exchange_rate'], [1000.0, 1300.0, 1600.0])
+        self.assertEqual(shape, [2, 3, 40])
+
+        current = get_current_pricing()
+        bill = Decimal(self.request['monthly_bill_ars'])
+        for price_index, energy_price in enumerate(axes['energy_price_ars_per_kwh']):
+            for rate_index, exchange_rate in enumerate(axes['exchange_rate']):
+                calculator = SolarInvestmentCalculator(self.project, None, pricing=replace(
+                    current, energy_price_ars_per_kwh=Decimal(str(energy_price)),
+                    exchange_rate=Decimal(str(exchange_rate)), version=''
+                ))
+                for panel_index in range(0, 40, 3):
+                    cell = (price_index * shape[1] + rate_index) * shape[2] + panel_index
+                    result = calculator.simulate('panels', bill, axes['number_of_panels'][panel_index])
+                    for name in ('number_of_panels', 'total_investment_ars', 'payback_period_years', 'bill_coverage_achieved'):
+                        self.assertAlmostEqual(
+                            columns[name][cell], float(getattr(result, name)), delta=0.01,
+                            msg=(energy_price, exchange_rate, panel_index, name)
+                        )
+
+    def test_binary_format_matches_json(self):
+        client = APIClient()
+        response_json = client.post(self.url, self.request, format='json').data
+        response = client.post(self.url, dict(self.request, format='binary'), format='json')
+        self.assertEqual(response['X-Sweep-Shape'], '2,3,40')
+        column_names = response['X-Sweep-Columns'].split(',')
+        values = np.frombuffer(response.content, dtype='<f4')
+        self.assertEqual(len(values), 2 + 3 + 40 + len(column_names) * 240)
+        payback = values[45 + 240 * column_names.index('payback_period_years'):][:240]
+        np.testing.assert_allclose(payback, response_json['columns']['payback_period_years'], atol=0.01)
+
+    def test_large_sweep_is_queued_with_the_same_results(self):
+        expected = APIClient().post(self.url, self.request, format='json').data
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('inversor', 'inversor@example.com'))
+        with self.settings(SIMULATION_JOB_SYNC_MAX_CELLS=10):
+            response = client.post(self.url, self.request, format='json')
+        self.assertEqual(response.status_code, 202)
+
+        job = run_job(claim_next_job())
+        self.assertEqual((job.status, job.processed, job.total), (SimulationJob.STATUS_DONE, 6, 6))
+        rows = [result.data for result in job.results.order_by('index')]
+        self.assertEqual(
+            [(row['energy_price_ars_per_kwh'], row['exchange_rate']) for row in rows],
+            [(price, rate) for price in expected['axes']['energy_price_ars_per_kwh']
+             for rate in expected['axes']['exchange_rate']]
+        )
+        for index, row in enumerate(rows):
+            self.assertEqual(
+                row['columns']['roi_annual'], expected['columns']['roi_annual'][index * 40:(index + 1) * 40]
+            )
+
+    def test_invalid_axes_are_rejected(self):
+        client = APIClient()
+        zero_rate = dict(self.request, exchange_rate={'values': ['0']})
+        self.assertEqual(client.post(self.url, zero_rate, format='json').status_code, 400)
+        no_panels = {key: value for key, value in self.request.items() if key != 'number_of_panels'}
+        self.assertEqual(client.post(self.url, no_panels, format='json').status_code, 400)
+
+
+class GoalSeekTests(TestCase):
+    """Goal-seek must pick what a linear scan over every panel count picks"""
+
+    def setUp(self):
+        cache.clear()
+        self.project = _create_project()
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        self.calculator = SolarInvestmentCalculator(self.project, self.tariff_category)
+        self.bill = Decimal('1500000.00')
+
+    def _scan(self, goal, target, bill):
+        max_panels = self.calculator._apply_bill_restrictions(self.calculator.max_panels_for_capacity(), bill)
+        results = [self.calculator.simulate('panels', bill, panels) for panels in range(1, max_panels + 1)]
+        if goal == 'payback_years':
+            met = [result for result in results if result.payback_period_years <= target]
+            return max(result.number_of_panels for result in met) if met else None
+        if goal == 'roi_annual':
+            met = [result for result in results if result.roi_annual >= target]
+            return max(result.number_of_panels for result in met) if met else None
+        met = [result for result in results if result.bill_coverage_achieved >= target]
+        return min(result.number_of_panels for result in met) if met else None
+
+    def test_matches_linear_scan(self):
+        # Payback and ROI are flat within a tier, so the targets step across the tiers
+        targets = {
+            'payback_years': [Decimal(tenths) / 10 for tenths in range(5, 200, 7)],
+            'roi_annual': [Decimal(tenths) / 10 for tenths in range(5, 600, 23)],
+            'bill_coverage': [Decimal(tenths) / 10 for tenths in range(5, 1001, 61)],
+        }
+        answers = set()
+        for bill in map(Decimal, ('150000.00', '400000.00', '1500000.00')):
+            for goal, values in targets.items():
+                for target in values:
+                    result = self.calculator.goal_seek(bill, goal, target)
+                    expected = self._scan(goal, target, bill)
+                    self.assertEqual(result.number_of_panels if result else None, expected, msg=(bill, goal, target))
+                    answers.add((goal, expected))
+        # Every goal reaches several panel counts, and some targets are out of reach
+        for goal in targets:
+            self.assertGreater(len({panels for answer_goal, panels in answers if answer_goal == goal}), 3, msg=goal)
+            self.assertIn((goal, None), answers)
+
+    def test_endpoint(self):
+        url = reverse('simulations:goal-seek')
+        request = {
+            'project_id': self.project.pk, 'tariff_category_id': self.tariff_category.pk,
+            'monthly_bill_ars': str(self.bill), 'goal': 'bill_coverage', 'target': '50.00',
+        }
+        response = APIClient().post(url, request, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['simulation']['number_of_panels'], self._scan('bill_coverage', Decimal('50'), self.bill))
+        self.assertGreaterEqual(Decimal(response.data['simulation']['bill_coverage_achieved']), 50)
+
+        unreachable = APIClient().post(url, dict(request, goal='payback_years', target='0.10'), format='json')
+        self.assertEqual(unreachable.status_code, 422)
+        self.assertFalse(unreachable.data['success'])
+
+
+class HourlySimulationTests(TestCase):
+    """The 8760 h balance must conserve energy and agree with the monthly engine"""
+
+    def test_balance_identities(self):
+        hours = np.arange(HOURS_PER_YEAR)
+        # Sun from 8 to 18 h, a flat load: midday surplus, night imports
+        generation_profile = normalize_profile((hours % 24 >= 8) & (hours % 24 < 18))
+        load_profile = normalize_profile(np.ones(HOURS_PER_YEAR))
+        balance = simulate_hourly(
+            generation_profile, load_profile, annual_generation_kwh=[1000.0, 6000.0],
+            annual_consumption_kwh=3650.0, energy_price_ars_per_kwh=100.0, injection_price_percentage=50.0
+        )
+        np.testing.assert_allclose(balance['monthly_generation_kwh'].sum(axis=1), [1000.0, 6000.0], rtol=1e-5)
+        np.testing.assert_allclose(balance['monthly_consumption_kwh'].sum(axis=1), [3650.0, 3650.0], rtol=1e-5)
+        np.testing.assert_allclose(
+            balance['monthly_self_consumption_kwh'] + balance['monthly_grid_injection_kwh'],
+            balance['monthly_generation_kwh'], rtol=1e-9
+        )
+        np.testing.assert_allclose(
+            balance['monthly_self_consumption_kwh'] + balance['monthly_grid_import_kwh'],
+            balance['monthly_consumption_kwh'], rtol=1e-9
+        )
+        # The small system injects at midday and nets it all against the night
+        self.assertFalse(balance['monthly_surplus_kwh'][0].any())
+        np.testing.assert_allclose(balance['monthly_savings_ars'][0], balance['monthly_generation_kwh'][0] * 100.0)
+        # The large one has a surplus every month, paid at half the price
+        surplus = balance['monthly_surplus_kwh'][1]
+        self.assertTrue((surplus > 0).all())
+        np.testing.assert_allclose(
+            balance['monthly_savings_ars'][1],
+            (balance['monthly_consumption_kwh'][1]) * 100.0 + surplus * 50.0
+        )
+        self.assertEqual(len(MONTH_START_HOURS), 12)
+
+    def test_annual_totals_match_the_monthly_engine(self):
+        cache.clear()
+        project = _create_project()
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        calculator = SolarInvestmentCalculator(project, tariff_category)
+        bill = Decimal('400000.00')
+        for panels in (1, 12, 40):
+            simulation, hourly = calculator.simulate_hourly(bill, panels)
+            monthly = calculator.simulate('panels', bill, panels)
+            self.assertEqual(simulation.number_of_panels, monthly.number_of_panels)
+            self.assertEqual(simulation.total_investment_usd, monthly.total_investment_usd)
+            self.assertAlmostEqual(hourly['annual_generation_kwh'], float(monthly.monthly_generation_kwh) * 12, delta=0.2)
+            self.assertAlmostEqual(
+                hourly['annual_consumption_kwh'], float(bill / calculator.pricing.energy_price_ars_per_kwh) * 12, delta=0.2
+            )
+            self.assertAlmostEqual(
+                float(simulation.annual_savings_ars), sum(month['savings_ars'] for month in hourly['monthly']), delta=1
+            )
+
+    def test_endpoint(self):
+        project = _create_project()
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        url = reverse('simulations:hourly-simulation')
+        request = {
+            'project_id': project.pk, 'tariff_category_id': tariff_category.pk,
+            'monthly_bill_ars': '400000.00', 'number_of_panels': 12,
+        }
+        response = APIClient().post(url, request, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['hourly']['monthly']), 12)
+        self.assertEqual(response.data['simulation']['number_of_panels'], 12)
+        self.assertEqual(APIClient().post(url, dict(request, monthly_bill_ars='0'), format='json').status_code, 400)
+
+
+class BulkSimulationTests(TestCase):
+    """Bulk rows stream back in input order with the scalar engine's results"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('socio', 'socio@example.com')
+        self.project = _create_project()
+        ProjectAccess.objects.create(user=self.user, project=self.project)
+        self.residential = TariffCategory.objects.create(name='Residencial', code='T1')
+        self.commercial = TariffCategory.objects.create(name='Comercial', code='T2')
+        self.url = reverse('simulations:bulk-simulation', args=[self.project.pk])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rows = [
+            {'ref': 'a', 'monthly_bill_ars': '85000.00', 'tariff_category': 'T1', 'number_of_panels': 6},
+            {'ref': 'b', 'monthly_bill_ars': '250000.00', 'tariff_category': str(self.commercial.pk),
+             'investment_amount_usd': '4298.74'},
+            {'ref': 'c', 'monthly_bill_ars': '1200000.00', 'tariff_category': 'T2', 'bill_coverage_percentage': '75.50'},
+            {'ref': 'd', 'monthly_bill_ars': '250000.00', 'tariff_category': 'T1', 'number_of_panels': 140},
+        ]
+
+    def _post(self, body, content_type):
+        response = self.client.post(self.url, body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    @staticmethod
+    def _results(output):
+        # Every simulated row is saved, so ids and timestamps differ between runs
+        return {name: value for name, value in output['simulation'].items() if name not in ('id', 'created_at')}
+
+    def _assert_matches_scalar(self, output, row):
+        tariff_category = self.residential if row['tariff_category'] == 'T1' else self.commercial
+        simulation_type, input_field = next(
+            (simulation_type, input_field) for simulation_type, input_field in
+            [('panels', 'number_of_panels'), ('investment', 'investment_amount_usd'),
+             ('bill_coverage', 'bill_coverage_percentage')]
+            if input_field in row
+        )
+        expected = SolarInvestmentCalculator(self.project, tariff_category).simulate(
+            simulation_type, Decimal(row['monthly_bill_ars']), Decimal(str(row[input_field]))
+        )
+        self.assertTrue(output['success'], msg=output)
+        self.assertEqual(output['ref'], row['ref'])
+        self.assertEqual(output['simulation']['number_of_panels'], expected.number_of_panels)
+        for name in ('total_investment_usd', 'monthly_savings_ars', 'payback_period_years'):
+            self.assertEqual(
+                Decimal(str(output['simulation'][name])), storage.as_stored(name, getattr(expected, name)), msg=(row['ref'], name)
+            )
+
+    def test_ndjson_rows_and_errors_in_order(self):
+        lines = [json.dumps(self.rows[0]), '{no es json', '', json.dumps(self.rows[1]),
+                 json.dumps(dict(self.rows[2], number_of_panels=3)), json.dumps(dict(self.rows[3], tariff_category='X9')),
+                 json.dumps(self.rows[2]), '[1, 2]', json.dumps(self.rows[3])]
+        outputs = self._post('\n'.join(lines), 'application/x-ndjson')
+        # The blank line produces no output
+        self.assertEqual([output['line'] for output in outputs], [1, 2, 4, 5, 6, 7, 8, 9])
+        self.assertEqual(
+            [output['success'] for output in outputs], [True, False, True, False, False, True, False, True]
+        )
+        self.assertIn('errors', outputs[3])
+        self.assertIn('X9', outputs[4]['error'])
+        for output, row in zip([outputs[0], outputs[2], outputs[5], outputs[7]], self.rows):
+            self._assert_matches_scalar(output, row)
+
+    def test_csv_matches_ndjson(self):
+        header = ['ref', 'monthly_bill_ars', 'tariff_category', 'number_of_panels', 'investment_amount_usd',
+                  'bill_coverage_percentage']
+        lines = [','.join(header)] + [','.join(str(row.get(name, '')) for name in header) for row in self.rows]
+        csv_outputs = self._post('\n'.join(lines), 'text/csv')
+        ndjson_outputs = self._post('\n'.join(json.dumps(row) for row in self.rows), 'application/x-ndjson')
+        self.assertEqual(
+            [self._results(output) for output in csv_outputs], [self._results(output) for output in ndjson_outputs]
+        )
+        for output, row in zip(csv_outputs, self.rows):
+            self._assert_matches_scalar(output, row)
+
+    def test_chunking_keeps_order_and_results(self):
+        simulator = BulkSimulator(self.project, [self.residential, self.commercial])
+        lines = [json.dumps(row).encode() for row in self.rows * 5]
+        whole = list(bulk_simulate(simulator, iter_ndjson_rows(lines)))
+        chunked = list(bulk_simulate(simulator, iter_ndjson_rows(lines), chunk_size=3))
+        self.assertEqual([self._results(output) for output in chunked], [self._results(output) for output in whole])
+        self.assertEqual([output['ref'] for output in chunked], [row['ref'] for row in self.rows] * 5)
+
+    def test_project_access_is_required(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('otro', 'otro@example.com'))
+        response = other.post(self.url, json.dumps(self.rows[0]), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 403)
+
+
+class ProjectRankingTests(TestCase):
+    """Grouped ranking against the scalar engine simulated project by project"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(invalidate_pricing_cache)
+        self.addCleanup(invalidate_engine_profiles)
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        self.projects = [
+            _create_project(name='Parque Norte'),
+            _create_project(name='Parque Sur', panel_power_wp=Decimal('450')),
+            _create_project(name='Parque Este'),
+            _create_project(name='Parque Oeste'),
+            # Shares every engine input with the first project
+            _create_project(name='Parque Centro'),
+            _create_project(name='Parque Alto'),
+        ]
+        PricingTier.objects.create(project=self.projects[2], min_panels=1, price_per_panel_usd=Decimal('350'))
+        PricingTier.objects.create(project=self.projects[2], min_panels=30, price_per_panel_usd=Decimal('320'))
+        PricingTier.objects.create(project=self.projects[5], min_panels=1, price_per_panel_usd=Decimal('900'))
+        SolarProject.objects.filter(pk=self.projects[3].pk).update(available_power=Decimal('5.00'))
+        self.projects[3].refresh_from_db()
+        invalidate_pricing_cache()
+
+    def _expected(self, simulation_type, monthly_bill_ars, input_value, order_by):
+        column, descending = RANKING_ORDERS[order_by]
+        results = {}
+        for project in self.projects:
+            result = SolarInvestmentCalculator(project, self.tariff_category).simulate(
+                simulation_type, Decimal(monthly_bill_ars), Decimal(input_value)
+            )
+            results[project.pk] = (result, reservable_power(project) >= result.installed_power_kw)
+        order = sorted(
+            results,
+            key=lambda pk: (
+                not results[pk][1],
+                -getattr(results[pk][0], column) if descending else getattr(results[pk][0], column),
+                pk
+            )
+        )
+        return order, results
+
+    def test_ranking_matches_the_scalar_engine(self):
+        ranker = ProjectRanker(self.projects, self.tariff_category)
+        # Norte and Centro share one group
+        self.assertEqual(len(ranker.groups), 4)
+        for simulation_type, input_value in [('panels', '40'), ('investment', '9999.99'), ('bill_coverage', '75.50')]:
+            for order_by in RANKING_ORDERS:
+                with self.subTest(simulation_type=simulation_type, order_by=order_by):
+                    ranking = ranker.rank(
+                        simulation_type, float('1200000.00'), float(input_value), order_by=order_by
+                    )
+                    order, results = self._expected(simulation_type, '1200000.00', input_value, order_by)
+                    self.assertEqual([entry['project']['id'] for entry in ranking], order)
+                    self.assertEqual([entry['rank'] for entry in ranking], list(range(1, len(order) + 1)))
+                    for entry in ranking:
+                        result, has_capacity = results[entry['project']['id']]
+                        self.assertEqual(entry['capacity_check']['has_capacity'], has_capacity)
+                        self.assertEqual(entry['simulation']['number_of_panels'], result.number_of_panels)
+                        for name in ('total_investment_usd', 'payback_period_years', 'roi_annual',
+                                     'bill_coverage_achieved'):
+                            self.assertEqual(
+                                Decimal(str(entry['simulation'][name])), _stored(name, getattr(result, name)),
+                                msg=(entry['project']['name'], name)
+                            )
+
+    def test_grouped_projects_keep_their_own_fields(self):
+        ranking = ProjectRanker(self.projects, self.tariff_category).rank('panels', 250000.0, 40.0)
+        by_project = {entry['project']['id']: entry for entry in ranking}
+        north, center = by_project[self.projects[0].pk], by_project[self.projects[4].pk]
+        self.assertEqual(north['simulation']['project_name'], 'Parque Norte')
+        self.assertEqual(center['simulation']['project_name'], 'Parque Centro')
+        self.assertEqual(len({entry['simulation']['id'] for entry in ranking}), len(ranking))
+        # The low-capacity project ranks after every project that can host the system
+        self.assertEqual(ranking[-1]['project']['id'], self.projects[3].pk)
+        self.assertFalse(ranking[-1]['capacity_check']['has_capacity'])
+
+    def test_limit_keeps_the_top_of_the_ranking(self):
+        ranker = ProjectRanker(self.projects, self.tariff_category)
+        full = ranker.rank('investment', 250000.0, 9999.99, order_by='roi')
+        top = ranker.rank('investment', 250000.0, 9999.99, order_by='roi', limit=2)
+        self.assertEqual([entry['project']['id'] for entry in top], [entry['project']['id'] for entry in full[:2]])
+
+    def test_endpoint(self):
+        SolarProject.objects.exclude(pk__in=[project.pk for project in self.projects]).update(
+            available_power=Decimal('0.00')
+        )
+        SolarProject.objects.filter(pk=self.projects[4].pk).update(available_power=Decimal('0.00'))
+        url = reverse('simulations:rank-projects')
+        response = APIClient().post(url, {
+            'tariff_category_id': self.tariff_category.pk, 'monthly_bill_ars': '250000.00',
+            'number_of_panels': 40, 'order_by': 'roi',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order_by'], 'roi')
+        # Projects without reservable power are left out
+        del self.projects[4]
+        order, _ = self._expected('panels', '250000.00', '40', 'roi')
+        self.assertEqual([entry['project']['id'] for entry in response.data['ranking']], order)
+
+        response = APIClient().post(url, {
+            'tariff_category_id': 0, 'monthly_bill_ars': '250000.00', 'number_of_panels': 40,
+        }, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.data['success'])
+
+        response = APIClient().post(url, {
+            'tariff_category_id': self.tariff_category.pk, 'monthly_bill_ars': '250000.00', 'order_by': 'precio',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+
+
+class PortfolioAllocationTests(TestCase):
+    """Budget allocation against an exhaustive search over small portfolios"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(invalidate_pricing_cache)
+        self.addCleanup(invalidate_engine_profiles)
+        # 6, 8 and 12 panels of 550 Wp
+        self.projects = [
+            _create_project(name='Parque Norte', available_power=Decimal('3.30')),
+            _create_project(name='Parque Sur', available_power=Decimal('4.40')),
+            _create_project(name='Parque Este', available_power=Decimal('6.60')),
+        ]
+        # Four panels cost less than three in the first project
+        PricingTier.objects.create(project=self.projects[0], min_panels=1, price_per_panel_usd=Decimal('700'))
+        PricingTier.objects.create(project=self.projects[0], min_panels=4, price_per_panel_usd=Decimal('500'))
+        PricingTier.objects.create(project=self.projects[1], min_panels=1, price_per_panel_usd=Decimal('650'))
+        PricingTier.objects.create(project=self.projects[1], min_panels=5, price_per_panel_usd=Decimal('450'))
+        invalidate_pricing_cache()
+
+    def _options(self):
+        pricing = get_current_pricing()
+        return {
+            project.pk: ProjectOption(SolarInvestmentCalculator(project, None, pricing=pricing))
+            for project in self.projects
+        }
+
+    @staticmethod
+    def _cost(option, panels):
+        return panels * option.calculator.tiers.price_for(panels) if panels else Decimal('0')
+
+    def _brute_force_savings(self, options, budget_usd):
+        """Largest annual savings of any panel count per project within the budget"""
+        best = 0.0
+        for counts in itertools.product(*[range(option.max_panels + 1) for option in options.values()]):
+            cost = sum(self._cost(option, panels) for option, panels in zip(options.values(), counts))
+            if cost <= budget_usd:
+                best = max(best, sum(
+                    panels * option.savings_per_panel for option, panels in zip(options.values(), counts)
+                ))
+        return best
+
+    def _check(self, portfolio, options, budget_usd):
+        allocated = {item['project']['id']: item['number_of_panels'] for item in portfolio['allocations']}
+        cost = sum(self._cost(options[pk], panels) for pk, panels in allocated.items())
+        self.assertLessEqual(cost, budget_usd)
+        self.assertEqual(Decimal(str(portfolio['invested_usd'])), cost)
+        for pk, panels in allocated.items():
+            self.assertLessEqual(panels, options[pk].max_panels)
+        return sum(panels * options[pk].savings_per_panel for pk, panels in allocated.items())
+
+    def test_dynamic_program_matches_exhaustive_search(self):
+        options = self._options()
+        self.assertEqual([option.max_panels for option in options.values()], [6, 8, 12])
+        for budget in ('500', '2000', '2100', '2450', '4999.99', '7000', '9350', '15000', '40000'):
+            with self.subTest(budget=budget):
+                budget_usd = Decimal(budget)
+                portfolio = allocate_budget(self.projects, budget_usd, method='dp')
+                self.assertEqual(portfolio['method'], 'dp')
+                savings = self._check(portfolio, options, budget_usd)
+                self.assertAlmostEqual(savings, self._brute_force_savings(options, budget_usd), places=2)
+
+    def test_greedy_fallback_stays_within_budget_and_capacity(self):
+        options = self._options()
+        for budget in ('500', '2100', '4999.99', '9350', '40000'):
+            with self.subTest(budget=budget):
+                budget_usd = Decimal(budget)
+                with mock.patch('simulations.portfolio.DP_MAX_CELLS', 0):
+                    portfolio = allocate_budget(self.projects, budget_usd)
+                self.assertEqual(portfolio['method'], 'greedy')
+                savings = self._check(portfolio, options, budget_usd)
+                self.assertLessEqual(savings, self._brute_force_savings(options, budget_usd) + 0.01)
+        # A budget covering every project buys all of their capacity
+        self.assertEqual(portfolio['number_of_panels'], 26)
+
+    def test_endpoint(self):
+        url = reverse('simulations:portfolio-allocation')
+        response = APIClient().post(url, {
+            'budget_usd': '4999.99', 'project_ids': [project.pk for project in self.projects],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['success'])
+        self.assertEqual(response.data['method'], 'dp')
+        self.assertEqual(
+            {item['project']['id'] for item in response.data['allocations']} - {project.pk for project in self.projects},
+            set()
+        )
+        self.assertAlmostEqual(
+            response.data['remaining_usd'], response.data['budget_usd'] - response.data['invested_usd'], places=2
+        )
+
+        response = APIClient().post(url, {'budget_usd': '0.50'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+
+
+class SimulationResultSerializerTests(SimpleTestCase):
+    """The fast serializer must render what InvestmentSimulationSerializer renders"""
+
+    def test_matches_model_serializer(self):
+        project = SolarProject(id=1, name='Parque', location='Mendoza', panel_power_wp=Decimal('550'))
+        calculator = SolarInvestmentCalculator(
+            project, TariffCategory(id=1, name='Residencial', code='T1'),
+            pricing=PricingSnapshot(energy_price_ars_per_kwh=Decimal('120.50'), exchange_rate=Decimal('1180.00')),
+            profile=EngineProfile(panel_power_kw=Decimal('0.55'))
+        )
+        for simulation_type, value in [
+            ('panels', 12), ('investment', Decimal('8000.00')), ('bill_coverage', Decimal('60.00'))
+        ]:
+            result = calculator.simulate(simulation_type, Decimal('250000.00'), value)
+            expected = json.loads(json.dumps(InvestmentSimulationSerializer(result.to_model()).data, cls=JSONEncoder))
+            data = json.loads(json.dumps(SimulationResultSerializer(result).data, cls=JSONEncoder))
+
+            self.assertEqual(list(data), list(expected))
+            # Both are fresh uuid4 values of an unsaved simulation
+            self.assertEqual(uuid.UUID(data.pop('id')).version, uuid.UUID(expected.pop('id')).version)
+            self.assertEqual(data, expected, msg=simulation_type)
+
+
+class RiskSimulationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = _create_project()
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        for year, rate in [(2021, '100.00'), (2022, '180.00'), (2023, '350.00'), (2024, '900.00')]:
+            ExchangeRate.objects.create(rate=Decimal(rate), date=date(year, 1, 1))
+
+    def test_scheduled_rates_are_not_history(self):
+        before = MarketParameters.from_history(PriceHistory.load())
+        ExchangeRate.objects.create(rate=Decimal('99999.00'), date=date(2099, 1, 1))
+        self.assertEqual(MarketParameters.from_history(PriceHistory.load()), before)
+
+    def test_large_runs_are_queued(self):
+        request = {
+            'project_id': self.project.pk, 'tariff_category_id': self.tariff_category.pk,
+            'monthly_bill_ars': '250000.00', 'number_of_panels': 12, 'paths': 2000, 'seed': 7,
+        }
+        url = reverse('simulations:risk-simulation')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('inversor', 'inversor@example.com'))
+        with self.settings(SIMULATION_RISK_SYNC_MAX_PATHS=2000):
+            synchronous = client.post(url, request, format='json')
+        self.assertEqual(synchronous.status_code, 200)
+
+        with self.settings(SIMULATION_RISK_SYNC_MAX_PATHS=1000):
+            queued = client.post(url, request, format='json')
+        self.assertEqual(queued.status_code, 202)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.kind, 'risk')
+        self.assertEqual(job.status, SimulationJob.STATUS_DONE)
+        self.assertEqual(job.results.get().data, synchronous.data['risk'])
+
+
+class ResimulationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = _create_project()
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        _save_simulations(self.project, self.tariff_category)
+
+    def test_unchanged_prices_write_nothing(self):
+        rows_before = list(InvestmentSimulation.objects.order_by('pk').values())
+        self.assertEqual(resimulate_simulations(dry_run=True)['updated'], 0)
+        totals = resimulate_simulations()
+        self.assertEqual(totals, {'processed': len(rows_before), 'updated': 0, 'stale': 0})
+        self.assertFalse(InvestmentSimulationHistory.objects.exists())
+        self.assertEqual(list(InvestmentSimulation.objects.order_by('pk').values()), rows_before)
+
+    def test_price_change_updates_and_keeps_history(self):
+        count = InvestmentSimulation.objects.count()
+        pricing = replace(get_current_pricing(), exchange_rate=Decimal('2000.00'), version='')
+        self.assertEqual(resimulate_simulations(pricing=pricing)['updated'], count)
+        self.assertEqual(InvestmentSimulationHistory.objects.count(), count)
+        self.assertEqual(resimulate_simulations(pricing=pricing)['updated'], 0)
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_admin_action(self):
+        client = APIClient()
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura'))
+        selected = list(InvestmentSimulation.objects.order_by('pk').values_list('pk', flat=True)[:5])
+        # The price row is rolled back with the test, the pricing this process cached is not
+        self.addCleanup(invalidate_pricing_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(rate=Decimal('2000.00'), date=date.today())
+
+        response = client.post(
+            reverse('admin:simulations_investmentsimulation_changelist'),
+            {'action': 'resimulate_selected', '_selected_action': [str(pk) for pk in selected]},
+            follow=True
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['5 simulaciones recalculadas, 5 con resultados nuevos (los anteriores quedan en el historial)']
+        )
+        self.assertEqual(
+            set(InvestmentSimulationHistory.objects.values_list('simulation_id', flat=True)), set(selected)
+        )
+
+
+@override_settings(SIMULATION_STORAGE_MODE='compact')
+class CompactStorageTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        storage._registered_versions.clear()
+        storage._derive.cache_clear()
+        self.project = _create_project()
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        self.calculator = SolarInvestmentCalculator(self.project, self.tariff_category)
+
+    def _save(self, simulation_type='panels', bill='250000.00', value=12):
+        result = self.calculator.simulate(simulation_type, Decimal(bill), value)
+        simulation = result.to_model(user_email='cliente@example.com', user_phone='+541100000000')
+        return storage.save_simulation(simulation, self.calculator)
+
+    def test_round_trip(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            saved = [self._save(simulation_type, bill, value)
+                     for bill in ('85000.00', '1200000.00') for simulation_type, value in SIMULATION_INPUTS]
+        self.assertEqual(SimulationSnapshot.objects.count(), 1)
+        self.assertFalse(InvestmentSimulation.objects.filter(total_investment_usd__isnull=False).exists())
+        for simulation in saved:
+            loaded = InvestmentSimulation.objects.get(pk=simulation.pk)
+            for name in InvestmentSimulation.RESULT_FIELDS:
+                self.assertEqual(getattr(loaded, name), storage.as_stored(name, getattr(simulation, name)), msg=name)
+
+    def test_rolled_back_snapshot_is_created_again(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self._save()
+                    raise RuntimeError
+        self.assertFalse(SimulationSnapshot.objects.exists())
+        self.assertEqual(storage._registered_versions, {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            simulation = self._save()
+        self.assertTrue(SimulationSnapshot.objects.filter(pk=simulation.snapshot_id).exists())
+        self.assertEqual(list(storage._registered_versions.values()), [simulation.snapshot_id])
+
+    def test_other_engine_version_is_not_derived(self):
+        simulation = self._save()
+        InvestmentSimulation.objects.filter(pk=simulation.pk).update(engine_version='0')
+        with self.assertRaises(storage.StaleEngineVersion):
+            InvestmentSimulation.objects.get(pk=simulation.pk).total_investment_usd
+
+    def test_resimulation_skips_other_engine_versions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stale, current = self._save(value=12), self._save(value=20)
+        InvestmentSimulation.objects.filter(pk=stale.pk).update(engine_version='0')
+        pricing = replace(get_current_pricing(), exchange_rate=Decimal('2000.00'), version='')
+        totals = resimulate_simulations(pricing=pricing)
+        self.assertEqual(totals, {'processed': 2, 'updated': 1, 'stale': 1})
+        self.assertEqual(
+            list(InvestmentSimulationHistory.objects.values_list('simulation_id', flat=True)), [current.pk]
+        )
+        row = InvestmentSimulation.objects.filter(pk=stale.pk).values('snapshot_id', 'engine_version').get()
+        self.assertEqual(row, {'snapshot_id': stale.snapshot_id, 'engine_version': '0'})
+
+    def test_admin_action_materializes(self):
+        saved = [self._save(simulation_type, '250000.00', value) for simulation_type, value in SIMULATION_INPUTS]
+        client = APIClient()
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave-segura'))
+        response = client.post(
+            reverse('admin:simulations_investmentsimulation_changelist'),
+            {'action': 'materialize_selected', '_selected_action': [str(simulation.pk) for simulation in saved[:3]]},
+            follow=True
+        )
+        self.assertEqual(
+            [str(message) for message in response.context['messages']], ['3 simulaciones compactas materializadas']
+        )
+        for simulation in saved[:3]:
+            row = InvestmentSimulation.objects.filter(pk=simulation.pk).values(*InvestmentSimulation.RESULT_FIELDS).get()
+            self.assertEqual(row, {name: storage.as_stored(name, getattr(simulation, name)) for name in row})
+        self.assertEqual(InvestmentSimulation.objects.filter(total_investment_usd__isnull=True).count(), len(saved) - 3)
+
+    def test_stats_include_compact_simulations(self):
+        for simulation_type, value in SIMULATION_INPUTS:
+            self._save(simulation_type, '250000.00', value)
+        with self.settings(SIMULATION_STORAGE_MODE='full'):
+            _save_simulations(self.project, self.tariff_category, bills=('85000.00',))
+        self.assertTrue(InvestmentSimulation.objects.filter(total_investment_usd__isnull=True).exists())
+
+        url = reverse('simulations:simulation-stats')
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # The same averages once every compact simulation is materialized
+        storage.materialize_simulations()
+        self.assertEqual(response.data['total_simulations'], InvestmentSimulation.objects.count())
+        for key, name in [
+            ('average_investment_usd', 'total_investment_usd'),
+            ('average_payback_years', 'payback_period_years'),
+            ('average_roi_annual', 'roi_annual'),
+        ]:
+            expected = InvestmentSimulation.objects.aggregate(avg=Avg(name))['avg']
+            self.assertAlmostEqual(response.data[key], float(expected), places=6, msg=key)
+
+
+class SimulationResultCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = _create_project()
+        self.tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        self.calculator = SolarInvestmentCalculator(self.project, self.tariff_category)
+
+    def test_equivalent_requests_share_an_entry(self):
+        results = SimulationResultCache(max_entries=8, timeout=60)
+        first = results.simulate(self.calculator, 'investment', '250000', '4298.7399')
+        second = results.simulate(self.calculator, 'investment', Decimal('250000.00'), Decimal('4298.74'))
+        expected = self.calculator.simulate('investment', Decimal('250000.00'), Decimal('4298.74'))
+        for name in InvestmentSimulation.RESULT_FIELDS:
+            self.assertEqual(getattr(first, name), getattr(expected, name), msg=name)
+            self.assertEqual(getattr(second, name), getattr(expected, name), msg=name)
+        self.assertEqual(results.stats()['misses'], 1)
+        self.assertEqual(results.stats()['hits'], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        results = SimulationResultCache(max_entries=2, timeout=60, shared=False)
+        for panels in (1, 2, 1, 3, 1):
+            results.simulate(self.calculator, 'panels', '250000', panels)
+        self.assertEqual(results.stats()['evictions'], 1)
+        results.simulate(self.calculator, 'panels', '250000', 2)
+        self.assertEqual(results.stats()['misses'], 4)
+
+    def test_other_workers_read_the_shared_tier(self):
+        SimulationResultCache(max_entries=8, timeout=60).simulate(self.calculator, 'panels', '250000', 12)
+        other_worker = SimulationResultCache(max_entries=8, timeout=60)
+        other_worker.simulate(self.calculator, 'panels', '250000', 12)
+        self.assertEqual(other_worker.stats()['shared_hits'], 1)
+        self.assertEqual(other_worker.stats()['misses'], 0)
+
+    @override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+    def test_price_change_is_a_miss(self):
+        results = SimulationResultCache(max_entries=8, timeout=60)
+        before = results.simulate(self.calculator, 'panels', '250000', 12)
+        self.addCleanup(invalidate_pricing_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            ExchangeRate.objects.create(rate=Decimal('2000.00'), date=date.today())
+        calculator = SolarInvestmentCalculator(self.project, self.tariff_category)
+        after = results.simulate(calculator, 'panels', '250000', 12)
+        self.assertEqual(results.stats()['misses'], 2)
+        self.assertEqual(results.stats()['entries'], 1)
+        self.assertNotEqual(after.total_investment_ars, before.total_investment_ars)
+
+
+class SingleFlightTests(SimpleTestCase):
+    WAITERS = 4
+
+    def _wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+
+    def _run_concurrently(self, flights, compute):
+        """WAITERS + 1 calls to flights.do() on one key while compute is held open"""
+        release = threading.Event()
+        outcomes = [None] * (self.WAITERS + 1)
+
+        def held():
+            release.wait(5)
+            return compute()
+
+        def call(index):
+            try:
+                outcomes[index] = ('result', flights.do('key', held))
+            except Exception as error:
+                outcomes[index] = ('error', error)
+
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(self.WAITERS + 1)]
+        threads[0].start()
+        self._wait_until(lambda: flights.stats()['in_flight'])
+        for thread in threads[1:]:
+            thread.start()
+        self._wait_until(lambda: flights.stats()['coalesced'] == self.WAITERS)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_one_computation(self):
+        flights = SingleFlight(wait_timeout=5)
+        calls = []
+        outcomes = self._run_concurrently(flights, lambda: calls.append(1) or {'value': 42})
+        self.assertEqual(calls, [1])
+        self.assertEqual(outcomes, [('result', {'value': 42})] * (self.WAITERS + 1))
+        self.assertEqual(flights.stats(), {'executed': 1, 'coalesced': self.WAITERS, 'timeouts': 0, 'in_flight': 0})
+
+    def test_every_waiter_raises_its_own_exception(self):
+        def fail():
+            raise ValueError('Tarifa inválida')
+
+        outcomes = self._run_concurrently(SingleFlight(wait_timeout=5), fail)
+        errors = [error for kind, error in outcomes]
+        self.assertTrue(all(kind == 'error' for kind, error in outcomes))
+        self.assertTrue(all(isinstance(error, ValueError) and error.args == ('Tarifa inválida',) for error in errors))
+        self.assertEqual(len({id(error) for error in errors}), len(errors))
+        leader_error = next(error for error in errors if error.__cause__ is None)
+        self.assertTrue(all(error.__cause__ is leader_error for error in errors if error is not leader_error))
+
+
+class SimulationJobQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('inversor', 'inversor@example.com')
+
+    def _make_stale(self, job):
+        SimulationJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+
+    def test_jobs_are_claimed_once_in_order(self):
+        first = enqueue_job('compare', {}, self.user)
+        second = enqueue_job('compare', {}, self.user)
+        claims = [claim_next_job(), claim_next_job()]
+        self.assertEqual([job.pk for job in claims], [first.pk, second.pk])
+        self.assertTrue(all(job.status == SimulationJob.STATUS_RUNNING for job in claims))
+        self.assertNotEqual(claims[0].claim_token, claims[1].claim_token)
+        self.assertIsNone(claim_next_job())
+
+    def test_only_stale_jobs_are_requeued(self):
+        stale, alive = enqueue_job('compare', {}, self.user), enqueue_job('compare', {}, self.user)
+        claim_next_job(), claim_next_job()
+        self._make_stale(stale)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.claim_token), (SimulationJob.STATUS_PENDING, None))
+        self.assertEqual(SimulationJob.objects.get(pk=alive.pk).status, SimulationJob.STATUS_RUNNING)
+        self.assertEqual(claim_next_job().pk, stale.pk)
+
+    def test_requeued_run_stops_writing(self):
+        job = enqueue_job('compare', {}, self.user)
+        slow_run = claim_next_job()
+        replacement = []
+
+        def plan(params):
+            run = 'slow' if not replacement else 'new'
+
+            def blocks():
+                yield [{'run': run}]
+                if not replacement:
+                    # The slow worker missed its heartbeat: another one takes the job
+                    self._make_stale(job)
+                    requeue_stale_jobs()
+                    replacement.append(claim_next_job())
+                yield [{'run': run}]
+            return {}, 2, blocks()
+
+        with mock.patch.dict(JOB_PLANNERS, {'compare': plan}):
+            with self.assertLogs('simulations.jobs', 'WARNING'):
+                slow_run = run_job(slow_run)
+            self.assertEqual(slow_run.status, SimulationJob.STATUS_RUNNING)
+            self.assertEqual(slow_run.claim_token, replacement[0].claim_token)
+            self.assertEqual(slow_run.results.count(), 1)
+
+            new_run = run_job(replacement[0])
+        self.assertEqual((new_run.status, new_run.processed), (SimulationJob.STATUS_DONE, 2))
+        self.assertEqual(
+            list(new_run.results.order_by('index').values_list('index', 'data')),
+            [(0, {'run': 'new'}), (1, {'run': 'new'})]
+        )
+
+    def test_risk_job_renews_its_heartbeat_between_chunks(self):
+        project = _create_project()
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        params = {
+            'project_id': project.pk, 'tariff_category_id': tariff_category.pk,
+            'monthly_bill_ars': '250000.00', 'number_of_panels': 12, 'paths': 5000, 'seed': 7,
+        }
+        job = enqueue_job('risk', params, self.user, total=1)
+        heartbeats = []
+        original_update = jobs._update_claimed
+
+        def update_claimed(claimed, **fields):
+            if 'heartbeat_at' in fields:
+                heartbeats.append(fields['heartbeat_at'])
+            return original_update(claimed, **fields)
+
+        with mock.patch('simulations.risk.MONTE_CARLO_CHUNK_PATHS', 1000), \
+                mock.patch.object(jobs, '_update_claimed', update_claimed):
+            job = run_job(claim_next_job())
+            response = APIClient().post(reverse('simulations:risk-simulation'), params, format='json')
+        # The claim, one heartbeat per chunk of paths and the result
+        self.assertEqual(len(heartbeats), 1 + 5 + 1)
+        self.assertEqual((job.status, job.processed), (SimulationJob.STATUS_DONE, 1))
+        self.assertEqual(job.results.get().data, json.loads(json.dumps(response.data['risk'], cls=JSONEncoder)))
+
+    def test_jobs_are_only_visible_to_their_owner(self):
+        job = enqueue_job('compare', {}, self.user)
+        urls = [
+            reverse('simulations:simulation-job', args=[job.pk]),
+            reverse('simulations:simulation-job-results', args=[job.pk]),
+        ]
+        owner, other = APIClient(), APIClient()
+        owner.force_authenticate(self.user)
+        other.force_authenticate(User.objects.create_user('otro', 'otro@example.com'))
+        for url in urls:
+            self.assertEqual(owner.get(url).status_code, 200)
+            self.assertEqual(other.get(url).status_code, 404)
+            self.assertIn(APIClient().get(url).status_code, (401, 403))
+
+    @override_settings(SIMULATION_RISK_SYNC_MAX_PATHS=10)
+    def test_anonymous_requests_are_not_queued(self):
+        project = _create_project()
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        response = APIClient().post(reverse('simulations:risk-simulation'), {
+            'project_id': project.pk, 'tariff_category_id': tariff_category.pk,
+            'monthly_bill_ars': '250000.00', 'number_of_panels': 12, 'paths': 2000,
+        }, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(response.data['success'])
+        self.assertFalse(SimulationJob.objects.exists())
+
+
+@override_settings(CAPACITY_RESERVATION_SHARDS=4, CAPACITY_SHARD_REFILL_KW=10, CAPACITY_SHARD_IDLE_SECONDS=0)
+class CapacityReservationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = _create_project(available_power=Decimal('100.00'))
+
+    def _available_power(self):
+        return SolarProject.objects.values_list('available_power', flat=True).get(pk=self.project.pk)
+
+    def test_power_is_conserved(self):
+        # Amounts exact in binary: SQLite does F() arithmetic in floating point
+        holds = [reserve_capacity(self.project, Decimal(power)) for power in ('3.249', '12.00', '7.50', '40.00')]
+        self.assertEqual(holds[0].power_kw, Decimal('3.25'))
+        self.assertEqual(reservable_power(self.project), Decimal('37.25'))
+        self.assertLess(self._available_power(), Decimal('37.25'))
+
+        self.assertTrue(confirm_reservation(holds[0]))
+        self.assertTrue(release_reservation(holds[1]))
+        self.assertFalse(release_reservation(holds[1]))
+        CapacityReservation.objects.filter(pk=holds[2].pk).update(expires_at=timezone.now())
+        self.assertEqual(expire_reservations(), 1)
+        self.assertFalse(confirm_reservation(holds[2]))
+        self.assertEqual(reservable_power(self.project), Decimal('56.75'))
+
+        self.assertTrue(release_reservation(holds[3]))
+        return_idle_shards()
+        self.assertEqual(self._available_power(), Decimal('96.75'))
+        self.assertEqual(reservable_power(self.project), Decimal('96.75'))
+
+    def test_readers_count_the_power_parked_in_shards(self):
+        project = _create_project(available_power=Decimal('10.00'), panel_power_wp=Decimal('500'))
+        reserve_capacity(project, Decimal('1.00'))
+        # The hold lent the whole project row to a shard
+        self.assertEqual(SolarProject.objects.get(pk=project.pk).available_power, Decimal('0.00'))
+
+        calculator = SolarInvestmentCalculator(project, None)
+        self.assertEqual(calculator.max_panels_for_capacity(), 18)
+        self.assertTrue(calculator.get_project_capacity_check(Decimal('9.00'))['has_capacity'])
+        self.assertFalse(calculator.get_project_capacity_check(Decimal('9.01'))['has_capacity'])
+
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        response = APIClient().post(reverse('simulations:rank-projects'), {
+            'tariff_category_id': tariff_category.pk, 'monthly_bill_ars': '250000.00', 'number_of_panels': 4,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        ranked = {entry['project']['id']: entry['project']['available_power_kw'] for entry in response.data['ranking']}
+        self.assertEqual(ranked[project.pk], 9.0)
+
+        curve = APIClient().get(reverse('simulations:quote-curve', args=[project.pk]))
+        self.assertEqual(curve.status_code, 200)
+        self.assertEqual(curve.data['number_of_panels'][-1], 18)
+
+    def test_holds_never_exceed_the_project(self):
+        for _ in range(30):
+            try:
+                reserve_capacity(self.project, Decimal('7.75'))
+            except CapacityUnavailable:
+                break
+        held = sum(CapacityReservation.objects.values_list('power_kw', flat=True))
+        self.assertEqual(held, Decimal('7.75') * 12)
+        self.assertEqual(held + reservable_power(self.project), Decimal('100.00'))
+
+    def test_admin_edit_keeps_concurrent_holds(self):
+        # The change form was opened before the hold
+        stale = SolarProject.objects.get(pk=self.project.pk)
+        reserve_capacity(self.project, Decimal('25.00'))
+        return_idle_shards()
+
+        stale.name = 'Parque Solar Norte'
+        stale.available_power = Decimal('110.00')
+        form = SimpleNamespace(changed_data=['name', 'available_power'], initial={'available_power': Decimal('100.00')})
+        SolarProjectAdmin(SolarProject, site).save_model(None, stale, form, change=True)
+
+        project = SolarProject.objects.get(pk=self.project.pk)
+        self.assertEqual(project.name, 'Parque Solar Norte')
+        self.assertEqual(project.available_power, Decimal('85.00'))
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite cannot run concurrent write transactions')
+@override_settings(CAPACITY_RESERVATION_SHARDS=4, CAPACITY_SHARD_REFILL_KW=5)
+class ConcurrentCapacityReservationTests(TransactionTestCase):
+
+    def test_concurrent_holds_never_oversubscribe(self):
+        project = _create_project(available_power=Decimal('60.00'))
+        errors = []
+
+        def reserve_until_full():
+            try:
+                while True:
+                    try:
+                        reserve_capacity(project, Decimal('2.50'))
+                    except CapacityUnavailable:
+                        return
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reserve_until_full) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+        self.assertEqual(errors, [])
+        held = sum(CapacityReservation.objects.values_list('power_kw', flat=True))
+        self.assertEqual(held, Decimal('60.00'))
+        self.assertEqual(reservable_power(project), Decimal('0.00'))
+
+
+@override_settings(PRICING_CACHE_CHECK_SECONDS=0)
+class PriceScheduleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(invalidate_pricing_cache)
+        self.addCleanup(invalidate_price_history)
+        self.today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            EnergyPrice.objects.create(price_ars_per_kwh=Decimal('100.00'), effective_date=date(2020, 1, 1))
+            self.withdrawn = EnergyPrice.objects.create(
+                price_ars_per_kwh=Decimal('150.00'), effective_date=self.today - timedelta(days=30)
+            )
+            self.scheduled = EnergyPrice.objects.create(
+                price_ars_per_kwh=Decimal('200.00'), effective_date=self.today + timedelta(days=10)
+            )
+            ExchangeRate.objects.create(rate=Decimal('1100.00'), date=date(2020, 1, 1))
+            ExchangeRate.objects.create(rate=Decimal('1500.00'), date=self.today + timedelta(days=10))
+
+    def _assert_as_of_matches_current(self, day):
+        with mock.patch('django.utils.timezone.localdate', return_value=day):
+            current = (EnergyPrice.get_current_price(), ExchangeRate.get_latest_rate())
+        as_of = get_pricing_as_of(day)
+        self.assertEqual((as_of.energy_price_ars_per_kwh, as_of.exchange_rate), current, msg=day)
+
+    def test_withdrawn_price_is_not_history(self):
+        self.assertEqual(get_current_pricing().energy_price_ars_per_kwh, Decimal('150.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.withdrawn.is_active = False
+            self.withdrawn.save()
+        self.assertEqual(get_current_pricing().energy_price_ars_per_kwh, Decimal('100.00'))
+        for day in (self.today - timedelta(days=30), self.today):
+            self._assert_as_of_matches_current(day)
+            self.assertEqual(get_pricing_as_of(day).energy_price_ars_per_kwh, Decimal('100.00'))
+
+    def test_scheduled_values_start_on_their_date(self):
+        self.assertEqual(EnergyPrice.get_next_effective_date(), self.scheduled.effective_date)
+        self.assertEqual(ExchangeRate.get_next_rate_date(), self.scheduled.effective_date)
+        for day in (date(2019, 12, 31), date(2020, 1, 1), self.today, self.today + timedelta(days=9),
+                    self.today + timedelta(days=10), self.today + timedelta(days=400)):
+            self._assert_as_of_matches_current(day)
+
+        day_before = get_pricing_as_of(self.today + timedelta(days=9))
+        effective = get_pricing_as_of(self.today + timedelta(days=10))
+        self.assertEqual(
+            (day_before.energy_price_ars_per_kwh, day_before.exchange_rate), (Decimal('150.00'), Decimal('1100.00'))
+        )
+        self.assertEqual(
+            (effective.energy_price_ars_per_kwh, effective.exchange_rate), (Decimal('200.00'), Decimal('1500.00'))
+        )
+        self.assertEqual(get_current_pricing().energy_price_ars_per_kwh, Decimal('150.00'))
+
+    def test_backtest_batch_matches_scalar_as_of(self):
+        project = _create_project()
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        simulations = _save_simulations(project, tariff_category, bills=('250000.00',))
+        days = [date(2019, 12, 31), date(2021, 3, 1), self.today, self.today + timedelta(days=10)] * 4
+        days = days[:len(simulations)]
+        calculator = SolarInvestmentCalculator(project, tariff_category)
+        records = calculator.resimulate_batch(simulations, as_of_dates=days)
+        for simulation, day, record in zip(simulations, days, records):
+            expected = SolarInvestmentCalculator(project, tariff_category, pricing=get_pricing_as_of(day)).resimulate(simulation)
+            for name in ('number_of_panels', 'total_investment_ars', 'monthly_savings_ars', 'payback_period_years'):
+                self.assertEqual(record[name], storage.as_stored(name, getattr(expected, name)), msg=(day, simulation.simulation_type, name))
+
+    def test_as_of_endpoint(self):
+        user = User.objects.create_user('inversor', 'inversor@example.com')
+        project = _create_project()
+        tariff_category = TariffCategory.objects.create(name='Residencial', code='T1')
+        calculator = SolarInvestmentCalculator(project, tariff_category)
+        simulation = calculator.simulate('panels', Decimal('250000.00'), 12).to_model(user=user)
+        simulation.save()
+        url = reverse('simulations:simulation-as-of', args=[simulation.pk])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.get(url, {'date': '2021-03-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['energy_price_ars_per_kwh'], response.data['exchange_rate']), (100.0, 1100.0)
+        )
+        expected = SolarInvestmentCalculator(
+            project, tariff_category, pricing=get_pricing_as_of(date(2021, 3, 1))
+        ).resimulate(simulation)
+        self.assertEqual(
+            Decimal(response.data['simulation']['total_investment_ars']), _stored('total_investment_ars', expected.total_investment_ars)
+        )
+        # Without a date, the day it was created
+        self.assertEqual(client.get(url).data['as_of'], simulation.created_at.date().isoformat())
+        self.assertEqual(client.get(url, {'date': '2021-02-30'}).status_code, 400)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('otro', 'otro@example.com'))
+        self.assertEqual(other.get(url).status_code, 404)
+
+    def test_vectorized_lookup_matches_scalar(self):
+        history = PriceHistory.load()
+        days = [date(2019, 6, 1) + timedelta(days=offset) for offset in range(0, 4000, 17)]
+        for series in (history.energy_prices, history.exchange_rates):
+            self.assertEqual(list(series.values_at(days)), [float(series.value_at(day)) for day in days])
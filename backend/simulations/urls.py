@@ -9,11 +9,29 @@ urlpatterns = [
     path('exchange-rates/', views.ExchangeRateListView.as_view(), name='exchange-rates'),
     path('exchange-rate/current/', views.current_exchange_rate_view, name='current-exchange-rate'),
     path('calculate-limits/', views.calculate_limits_view, name='calculate-limits'),
+    path('quote-curve/<int:project_id>/', views.quote_curve_view, name='quote-curve'),
     
     # Simulation endpoints
     path('simulations/create/', views.create_simulation_view, name='create-simulation'),
     path('simulations/compare/', views.compare_simulations_view, name='compare-simulations'),
+    path('simulations/rank-projects/', views.rank_projects_view, name='rank-projects'),
+    path('simulations/portfolio/', views.portfolio_allocation_view, name='portfolio-allocation'),
+    path('simulations/bulk/<int:project_id>/', views.bulk_simulation_view, name='bulk-simulation'),
+    path('simulations/risk/', views.risk_simulation_view, name='risk-simulation'),
+    path('simulations/sweep/', views.sensitivity_sweep_view, name='sensitivity-sweep'),
+    path('simulations/jobs/<uuid:job_id>/', views.simulation_job_view, name='simulation-job'),
+    path('simulations/jobs/<uuid:job_id>/results/', views.SimulationJobResultsView.as_view(), name='simulation-job-results'),
+    path('simulations/goal-seek/', views.goal_seek_view, name='goal-seek'),
+    path('simulations/hourly/', views.hourly_simulation_view, name='hourly-simulation'),
     path('simulations/<uuid:id>/', views.SimulationDetailView.as_view(), name='simulation-detail'),
+    path('simulations/<uuid:id>/as-of/', views.simulation_as_of_view, name='simulation-as-of'),
     path('simulations/user/', views.UserSimulationsView.as_view(), name='user-simulations'),
     path('simulations/stats/', views.simulation_stats_view, name='simulation-stats'),
+    path('simulations/cache-stats/', views.simulation_cache_stats_view, name='simulation-cache-stats'),
+    
+    # Capacity reservations
+    path('reservations/', views.create_capacity_reservation_view, name='create-reservation'),
+    path('reservations/user/', views.UserCapacityReservationsView.as_view(), name='user-reservations'),
+    path('reservations/<uuid:id>/confirm/', views.confirm_capacity_reservation_view, name='confirm-reservation'),
+    path('reservations/<uuid:id>/release/', views.release_capacity_reservation_view, name='release-reservation'),
 ]
\ No newline at end of file
@@ -1,21 +1,56 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
+from django.conf import settings
 from django.db import transaction
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.contrib.auth.hashers import check_password
+from django.utils.dateparse import parse_date
 from decimal import Decimal
-from .models import InvestmentSimulation, TariffCategory, ExchangeRate
+import json
+import numpy as np
+from .models import InvestmentSimulation, TariffCategory, ExchangeRate, SimulationJob, CapacityReservation
 from projects.models import SolarProject
 from .serializers import (
     InvestmentSimulationSerializer,
     SimulationInputSerializer,
     TariffCategorySerializer,
     ExchangeRateSerializer,
+    SimulationResultSerializer,
     SimulationSummarySerializer,
-    SimulationComparisonSerializer
+    SimulationComparisonSerializer,
+    RiskSimulationSerializer,
+    SensitivitySweepSerializer,
+    GoalSeekSerializer,
+    HourlySimulationSerializer,
+    ProjectRankingSerializer,
+    PortfolioAllocationSerializer,
+    SimulationJobSerializer,
+    SimulationJobResultSerializer,
+    CapacityReservationInputSerializer,
+    CapacityReservationSerializer
 )
-from .simulation_engine import SolarInvestmentCalculator
+from .simulation_engine import ENGINE_VERSION, SIMULATION_INPUT_FIELDS, SolarInvestmentCalculator
+from .pricing import get_current_pricing, get_pricing_as_of
+from .bulk import BulkSimulator, bulk_simulate, iter_csv_rows, iter_ndjson_rows, ndjson_chunks
+from .coalescing import simulation_flights
+from .jobs import enqueue_job, sync_max_cells, sync_max_paths, sync_max_scenarios
+from .portfolio import allocate_budget
+from .ranking import ProjectRanker
+from .reservations import (
+    CapacityUnavailable, confirm_reservation, panels_power_kw, release_reservation, reservable_power,
+    reserve_capacity, with_reservable_power
+)
+from .result_cache import simulation_results
+from .scenarios import (
+    SWEEP_MAX_CELLS, comparison_size, iter_comparison_blocks, risk_analysis, sweep_axes, sweep_column_names
+)
+from .storage import materialize_results, result_averages, save_simulation
 from projects.models import SolarProject
 
 
@@ -40,11 +75,29 @@ def _check_project_access(user, project, access_code=None):
     return False
 
 
+def _run_simulation(calculator, data, user_email="", user_phone=""):
+    """
+    Run the simulation mode selected by validated SimulationInputSerializer data,
+    through the shared result cache
+    """
+    for simulation_type, input_field in SIMULATION_INPUT_FIELDS.items():
+        if data.get(input_field) is not None:
+            break
+    return simulation_results.simulate(
+        calculator,
+        simulation_type,
+        data['monthly_bill_ars'],
+        data[input_field],
+        user_email=user_email,
+        user_phone=user_phone
+    )
+
+
 class TariffCategoryListView(generics.ListAPIView):
     """
     API view to list all available tariff categories
     """
-    queryset = TariffCategory.objects.all()
+    queryset = TariffCategory.objects.prefetch_related('blocks')
     serializer_class = TariffCategorySerializer
 
 
@@ -62,7 +115,7 @@ def current_exchange_rate_view(request):
     API view to get the current exchange rate
     """
     try:
-        rate = ExchangeRate.get_latest_rate()
+        rate = get_current_pricing().exchange_rate
         return Response({
             'current_rate': float(rate),
             'currency_pair': 'USD/ARS'
@@ -74,6 +127,39 @@ def current_exchange_rate_view(request):
         )
 
 
+def _calculate_limits(monthly_bill_ars, project_id, tariff_category_id):
+    """
+    Response data and status of calculate_limits_view, computed once for
+    every identical concurrent request
+    """
+    try:
+        project = SolarProject.objects.get(id=project_id)
+        tariff_category = TariffCategory.objects.get(id=tariff_category_id)
+    except (SolarProject.DoesNotExist, TariffCategory.DoesNotExist):
+        return {'error': 'Proyecto o categoría tarifaria no encontrados'}, status.HTTP_404_NOT_FOUND
+    
+    # Initialize calculator and calculate limits
+    calculator = SolarInvestmentCalculator(project, tariff_category)
+    limits = calculator._calculate_bill_based_limits(monthly_bill_ars)
+    
+    # Calculate max investment based on 100% coverage
+    max_panels_100_coverage = limits['max_panels_for_bill_coverage']
+    max_investment_usd_100_coverage = calculator._calculate_total_investment_tiered(max_panels_100_coverage)
+    max_investment_ars_100_coverage = max_investment_usd_100_coverage * calculator.exchange_rate
+    
+    # Format response
+    return {
+        'monthly_bill_ars': float(monthly_bill_ars),
+        'max_investment_usd': float(max_investment_usd_100_coverage),
+        'max_investment_ars': float(max_investment_ars_100_coverage),
+        'max_panels_100_coverage': limits['max_panels_for_bill_coverage'],
+        'max_panels_allowed': limits['max_panels_for_bill_coverage'],  # Same as 100% coverage
+        'savings_per_panel_ars': float(limits['savings_per_panel_ars']),
+        'max_payback_years': limits['max_payback_years'],
+        'exchange_rate_used': float(calculator.exchange_rate)
+    }, status.HTTP_200_OK
+
+
 @api_view(['POST'])
 def calculate_limits_view(request):
     """
@@ -101,38 +187,11 @@ def calculate_limits_view(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            project = SolarProject.objects.get(id=project_id)
-            tariff_category = TariffCategory.objects.get(id=tariff_category_id)
-        except (SolarProject.DoesNotExist, TariffCategory.DoesNotExist):
-            return Response(
-                {'error': 'Proyecto o categoría tarifaria no encontrados'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Initialize calculator and calculate limits
-        from .simulation_engine import SolarInvestmentCalculator
-        calculator = SolarInvestmentCalculator(project, tariff_category)
-        limits = calculator._calculate_bill_based_limits(monthly_bill_ars)
-        
-        # Calculate max investment based on 100% coverage
-        max_panels_100_coverage = limits['max_panels_for_bill_coverage']
-        max_investment_usd_100_coverage = calculator._calculate_total_investment_tiered(max_panels_100_coverage)
-        max_investment_ars_100_coverage = max_investment_usd_100_coverage * calculator.exchange_rate
-        
-        # Format response
-        response_data = {
-            'monthly_bill_ars': float(monthly_bill_ars),
-            'max_investment_usd': float(max_investment_usd_100_coverage),
-            'max_investment_ars': float(max_investment_ars_100_coverage),
-            'max_panels_100_coverage': limits['max_panels_for_bill_coverage'],
-            'max_panels_allowed': limits['max_panels_for_bill_coverage'],  # Same as 100% coverage
-            'savings_per_panel_ars': float(limits['savings_per_panel_ars']),
-            'max_payback_years': limits['max_payback_years'],
-            'exchange_rate_used': float(calculator.exchange_rate)
-        }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
+        response_data, status_code = simulation_flights.do(
+            ('calculate_limits', monthly_bill_ars, str(project_id), str(tariff_category_id)),
+            lambda: _calculate_limits(monthly_bill_ars, project_id, tariff_category_id)
+        )
+        return Response(response_data, status=status_code)
         
     except Exception as e:
         return Response(
@@ -141,6 +200,78 @@ def calculate_limits_view(request):
         )
 
 
+# Upper bound for the number of points in a quote curve
+QUOTE_CURVE_MAX_PANELS = 5000
+QUOTE_CURVE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+@api_view(['GET'])
+def quote_curve_view(request, project_id):
+    """
+    API view returning every simulation output for 1..N panels of a project,
+    so the simulator can update locally while the user moves the slider.
+    
+    With ?tariff_category_id= of a category with a block tariff the curve
+    depends on the bill, so ?monthly_bill_ars= is required too.
+    
+    The curve is cached per (project, pricing version, engine profile, block
+    tariff and bill) and served with an ETag.
+    """
+    project = get_object_or_404(SolarProject, id=project_id)
+    tariff_category = None
+    if request.query_params.get('tariff_category_id'):
+        tariff_category = get_object_or_404(TariffCategory, id=request.query_params['tariff_category_id'])
+    
+    # SiteSettings and the panel power reach the formulas through the engine profile
+    calculator = SolarInvestmentCalculator(project, tariff_category, pricing=get_current_pricing())
+    
+    # A flat price gives one curve for every bill and category
+    tariff_key = 'flat'
+    monthly_bill_ars = None
+    if calculator.tariff_schedule is not None:
+        try:
+            monthly_bill_ars = Decimal(request.query_params['monthly_bill_ars']).quantize(Decimal('0.01'))
+            if not monthly_bill_ars > 0:
+                raise ValueError
+        except (KeyError, ArithmeticError, ValueError):
+            return Response({
+                'error': 'monthly_bill_ars (mayor a 0) es requerido para categorías con tarifa por bloques',
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
+        tariff_key = f"{tariff_category.pk}-{monthly_bill_ars}"
+    
+    # By default cover the project's reservable capacity
+    default_max_panels = calculator.max_panels_for_capacity() or 1
+    try:
+        max_panels = int(request.query_params.get('max_panels', default_max_panels))
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'max_panels debe ser un número entero'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    max_panels = min(max(max_panels, 1), QUOTE_CURVE_MAX_PANELS)
+    version = (
+        f"{project.pk}-{int(project.updated_at.timestamp())}-{calculator.pricing.version}-"
+        f"{calculator.profile.version}-{ENGINE_VERSION}-{tariff_key}-{max_panels}"
+    )
+    etag = f'"{version}"'
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        cache_key = f'simulations:quote_curve:{version}'
+        curve = cache.get(cache_key)
+        if curve is None:
+            curve = calculator.quote_curve(max_panels, monthly_bill_ars)
+            curve['project_id'] = project.pk
+            cache.set(cache_key, curve, QUOTE_CURVE_CACHE_TIMEOUT)
+        response = Response(curve, status=status.HTTP_200_OK)
+    
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def create_simulation_view(request):
@@ -179,45 +310,32 @@ def create_simulation_view(request):
                 user_email = serializer.validated_data.get('user_email', request.user.email)
                 user_phone = serializer.validated_data.get('user_phone', '')
                 
-                if serializer.validated_data.get('bill_coverage_percentage') is not None:
-                    simulation = calculator.simulate_by_bill_coverage(
-                        monthly_bill_ars=serializer.validated_data['monthly_bill_ars'],
-                        bill_coverage_percentage=serializer.validated_data['bill_coverage_percentage'],
-                        user_email=user_email,
-                        user_phone=user_phone
-                    )
-                elif serializer.validated_data.get('number_of_panels') is not None:
-                    simulation = calculator.simulate_by_panels(
-                        monthly_bill_ars=serializer.validated_data['monthly_bill_ars'],
-                        number_of_panels=serializer.validated_data['number_of_panels'],
-                        user_email=user_email,
-                        user_phone=user_phone
-                    )
-                elif serializer.validated_data.get('investment_amount_usd') is not None:
-                    simulation = calculator.simulate_by_investment(
-                        monthly_bill_ars=serializer.validated_data['monthly_bill_ars'],
-                        investment_amount_usd=serializer.validated_data['investment_amount_usd'],
-                        user_email=user_email,
-                        user_phone=user_phone
-                    )
-                
-                # Asociar la simulación con el usuario autenticado
-                simulation.user = request.user
+                result = _run_simulation(calculator, serializer.validated_data, user_email, user_phone)
                 
-                # Save simulation
-                simulation.save()
+                # Asociar la simulación con el usuario autenticado y guardarla
+                simulation = save_simulation(result.to_model(user=request.user), calculator)
                 
                 # Check project capacity
                 capacity_check = calculator.get_project_capacity_check(simulation.installed_power_kw)
                 
                 # Serialize response
                 response_serializer = InvestmentSimulationSerializer(simulation)
-                
-                return Response({
+                response_data = {
                     'simulation': response_serializer.data,
                     'capacity_check': capacity_check,
                     'success': True
-                }, status=status.HTTP_201_CREATED)
+                }
+                
+                # Optional multi-year projection
+                projection_options = serializer.validated_data.get('projection')
+                if projection_options is not None:
+                    response_data['projection'] = calculator.project_cash_flows(
+                        simulation.total_investment_usd,
+                        simulation.annual_savings_ars,
+                        **projection_options
+                    )[0]
+                
+                return Response(response_data, status=status.HTTP_201_CREATED)
                 
         except Exception as e:
             return Response({
@@ -231,76 +349,294 @@ def create_simulation_view(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _compare_simulations(data):
+    """
+    Response data and status of compare_simulations_view, computed once for
+    every identical concurrent request
+    """
+    try:
+        # Get required objects
+        project = get_object_or_404(SolarProject, id=data['project_id'])
+        tariff_category = get_object_or_404(
+            TariffCategory, 
+            id=data['tariff_category_id']
+        )
+        
+        # Initialize calculator
+        calculator = SolarInvestmentCalculator(project, tariff_category)
+        comparison_results = [
+            scenario
+            for block in iter_comparison_blocks(calculator, data)
+            for scenario in block
+        ]
+        
+        return {
+            'project_info': {
+                'id': project.id,
+                'name': project.name,
+                'available_power_kw': float(reservable_power(project))
+            },
+            'comparison_results': comparison_results,
+            'success': True
+        }, status.HTTP_200_OK
+        
+    except Exception as e:
+        return {
+            'error': f'Error al comparar simulaciones: {str(e)}',
+            'success': False
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+def _job_response(request, kind, data, total):
+    """
+    Queue a request too large for the web worker and answer 202 with the URLs
+    to poll it. Like stored simulations, jobs belong to an authenticated user.
+    """
+    if not request.user.is_authenticated:
+        return Response({
+            'error': 'Inicie sesión para ejecutar simulaciones de este tamaño',
+            'success': False
+        }, status=status.HTTP_401_UNAUTHORIZED)
+    job = enqueue_job(kind, data, request.user, total=total)
+    return Response({
+        'job': SimulationJobSerializer(job).data,
+        'status_url': request.build_absolute_uri(reverse('simulations:simulation-job', args=[job.id])),
+        'results_url': request.build_absolute_uri(reverse('simulations:simulation-job-results', args=[job.id])),
+        'success': True
+    }, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['POST'])
 def compare_simulations_view(request):
     """
-    API view to compare multiple simulation scenarios
+    API view to compare multiple simulation scenarios.
+    
+    Comparisons of more than SIMULATION_JOB_SYNC_MAX_SCENARIOS scenarios are
+    queued as a job: the response is 202 with the job to poll.
     """
     serializer = SimulationComparisonSerializer(data=request.data)
     
     if serializer.is_valid():
+        data = serializer.validated_data
+        scenario_count = comparison_size(data)
+        if scenario_count > sync_max_scenarios():
+            return _job_response(request, 'compare', data, scenario_count)
+        
+        response_data, status_code = simulation_flights.do(
+            ('compare_simulations', json.dumps(data, sort_keys=True, default=str)),
+            lambda: _compare_simulations(data)
+        )
+        return Response(response_data, status=status_code)
+    
+    return Response({
+        'errors': serializer.errors,
+        'success': False
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_simulation_view(request, project_id):
+    """
+    API view to simulate a whole customer list against a project.
+    
+    The body is NDJSON (one row per line) or, with Content-Type text/csv, CSV
+    with a header. Each row has monthly_bill_ars, tariff_category (code or id),
+    one of bill_coverage_percentage, number_of_panels or investment_amount_usd
+    and an optional ref. The body is read and simulated in chunks and the
+    response streams one NDJSON line per row, in input order.
+    """
+    project = get_object_or_404(SolarProject, id=project_id)
+    if not _check_project_access(request.user, project, request.query_params.get('access_code')):
+        return Response(
+            {'error': 'Acceso denegado. Verifique el código de acceso del proyecto.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    # DRF exposes the unparsed body as a stream (None when empty)
+    body = request.stream
+    lines = iter(body.readline, b'') if body is not None else iter(())
+    if request.content_type.startswith('text/csv'):
+        rows = iter_csv_rows(lines)
+    else:
+        rows = iter_ndjson_rows(lines)
+    
+    simulator = BulkSimulator(project, TariffCategory.objects.all())
+    return StreamingHttpResponse(
+        ndjson_chunks(bulk_simulate(simulator, rows)),
+        content_type='application/x-ndjson; charset=utf-8'
+    )
+
+
+def _rank_projects(data):
+    """Response data and status of rank_projects_view"""
+    tariff_category = TariffCategory.objects.filter(id=data['tariff_category_id']).first()
+    if tariff_category is None:
+        return {
+            'error': 'Categoría tarifaria no encontrada',
+            'success': False
+        }, status.HTTP_404_NOT_FOUND
+    
+    simulation_type, input_field = next(
+        (simulation_type, input_field)
+        for simulation_type, input_field in SIMULATION_INPUT_FIELDS.items()
+        if data.get(input_field) is not None
+    )
+    ranker = ProjectRanker(
+        with_reservable_power(SolarProject.objects.all()).filter(reservable_power_kw__gt=0).order_by('id'),
+        tariff_category
+    )
+    ranking = ranker.rank(
+        simulation_type,
+        float(data['monthly_bill_ars']),
+        float(data[input_field]),
+        order_by=data['order_by'],
+        limit=data.get('limit')
+    )
+    return {
+        'order_by': data['order_by'],
+        'pricing_version': ranker.pricing.version,
+        'ranking': ranking,
+        'success': True
+    }, status.HTTP_200_OK
+
+
+@api_view(['POST'])
+def rank_projects_view(request):
+    """
+    API view to simulate one bill against every project with available
+    capacity and rank them by payback, ROI or bill coverage
+    """
+    serializer = ProjectRankingSerializer(data=request.data)
+    
+    if serializer.is_valid():
+        data = serializer.validated_data
+        response_data, status_code = simulation_flights.do(
+            ('rank_projects', json.dumps(data, sort_keys=True, default=str)),
+            lambda: _rank_projects(data)
+        )
+        return Response(response_data, status=status_code)
+    
+    return Response({
+        'errors': serializer.errors,
+        'success': False
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _allocate_portfolio(data):
+    """Response data and status of portfolio_allocation_view"""
+    projects = with_reservable_power(SolarProject.objects.all()).filter(reservable_power_kw__gt=0).order_by('id')
+    if data.get('project_ids'):
+        projects = projects.filter(id__in=data['project_ids'])
+    
+    portfolio = allocate_budget(projects, data['budget_usd'])
+    portfolio['success'] = True
+    return portfolio, status.HTTP_200_OK
+
+
+@api_view(['POST'])
+def portfolio_allocation_view(request):
+    """
+    API view to split a USD budget across projects, choosing the panels per
+    project that maximize the annual savings within their available power
+    """
+    serializer = PortfolioAllocationSerializer(data=request.data)
+    
+    if serializer.is_valid():
+        data = serializer.validated_data
+        response_data, status_code = simulation_flights.do(
+            ('portfolio_allocation', json.dumps(data, sort_keys=True, default=str)),
+            lambda: _allocate_portfolio(data)
+        )
+        return Response(response_data, status=status_code)
+    
+    return Response({
+        'errors': serializer.errors,
+        'success': False
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+def risk_simulation_view(request):
+    """
+    API view to run a Monte Carlo risk simulation over exchange rate and
+    energy price paths for one simulation scenario.
+    
+    Runs of more than SIMULATION_RISK_SYNC_MAX_PATHS paths are queued as a
+    job (202) whose only result is the risk summary.
+    """
+    serializer = RiskSimulationSerializer(data=request.data)
+    
+    if serializer.is_valid():
+        data = serializer.validated_data
+        project = get_object_or_404(SolarProject, id=data['project_id'])
+        tariff_category = get_object_or_404(TariffCategory, id=data['tariff_category_id'])
+        if data['paths'] > sync_max_paths():
+            return _job_response(request, 'risk', data, 1)
+        
+        try:
+            calculator = SolarInvestmentCalculator(project, tariff_category)
+            simulation = _run_simulation(calculator, data)
+            risk = risk_analysis(calculator, simulation, data)
+        except ValueError as e:
+            return Response({
+                'error': str(e),
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'error': f'Error al simular el riesgo: {str(e)}',
+                'success': False
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            'simulation': SimulationResultSerializer(simulation).data,
+            'risk': risk,
+            'success': True
+        }, status=status.HTTP_200_OK)
+    
+    return Response({
+        'errors': serializer.errors,
+        'success': False
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+def hourly_simulation_view(request):
+    """
+    API view to simulate a number of panels with the hourly (8760 h)
+    generation and self-consumption balance
+    """
+    serializer = HourlySimulationSerializer(data=request.data)
+    
+    if serializer.is_valid():
+        data = serializer.validated_data
+        project = get_object_or_404(SolarProject, id=data['project_id'])
+        tariff_category = get_object_or_404(TariffCategory, id=data['tariff_category_id'])
+        
         try:
-            # Get required objects
-            project = get_object_or_404(SolarProject, id=serializer.validated_data['project_id'])
-            tariff_category = get_object_or_404(
-                TariffCategory, 
-                id=serializer.validated_data['tariff_category_id']
-            )
-            
-            # Initialize calculator
             calculator = SolarInvestmentCalculator(project, tariff_category)
-            monthly_bill = serializer.validated_data['monthly_bill_ars']
-            
-            comparison_results = []
-            
-            # Bill coverage percentage scenarios
-            if serializer.validated_data.get('bill_coverage_percentages'):
-                for coverage in serializer.validated_data['bill_coverage_percentages']:
-                    simulation = calculator.simulate_by_bill_coverage(monthly_bill, coverage)
-                    simulation_data = InvestmentSimulationSerializer(simulation).data
-                    comparison_results.append({
-                        'type': 'bill_coverage',
-                        'parameter': float(coverage),
-                        'simulation': simulation_data
-                    })
-            
-            # Panel quantity scenarios
-            if serializer.validated_data.get('panel_quantities'):
-                for panels in serializer.validated_data['panel_quantities']:
-                    simulation = calculator.simulate_by_panels(monthly_bill, panels)
-                    simulation_data = InvestmentSimulationSerializer(simulation).data
-                    comparison_results.append({
-                        'type': 'panels',
-                        'parameter': panels,
-                        'simulation': simulation_data
-                    })
-            
-            # Investment amount scenarios
-            if serializer.validated_data.get('investment_amounts'):
-                for amount in serializer.validated_data['investment_amounts']:
-                    simulation = calculator.simulate_by_investment(monthly_bill, amount)
-                    simulation_data = InvestmentSimulationSerializer(simulation).data
-                    comparison_results.append({
-                        'type': 'investment',
-                        'parameter': float(amount),
-                        'simulation': simulation_data
-                    })
-            
+            simulation, hourly = calculator.simulate_hourly(
+                monthly_bill_ars=data['monthly_bill_ars'],
+                number_of_panels=data['number_of_panels'],
+                injection_price_percentage=data['injection_price_percentage']
+            )
+        except ValueError as e:
             return Response({
-                'project_info': {
-                    'id': project.id,
-                    'name': project.name,
-                    'available_power_kw': float(project.available_power)
-                },
-                'comparison_results': comparison_results,
-                'success': True
-            }, status=status.HTTP_200_OK)
-            
+                'error': str(e),
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({
-                'error': f'Error al comparar simulaciones: {str(e)}',
+                'error': f'Error en la simulación horaria: {str(e)}',
                 'success': False
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response({
+            'simulation': SimulationResultSerializer(simulation).data,
+            'hourly': hourly,
+            'success': True
+        }, status=status.HTTP_200_OK)
     
     return Response({
         'errors': serializer.errors,
@@ -308,6 +644,162 @@ def compare_simulations_view(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+def goal_seek_view(request):
+    """
+    API view to find the panel count that meets a payback, ROI or bill
+    coverage target, within the bill limit and the project's capacity
+    """
+    serializer = GoalSeekSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response({
+            'errors': serializer.errors,
+            'success': False
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    project = get_object_or_404(SolarProject, id=data['project_id'])
+    tariff_category = get_object_or_404(TariffCategory, id=data['tariff_category_id'])
+    
+    try:
+        calculator = SolarInvestmentCalculator(project, tariff_category)
+        simulation = calculator.goal_seek(data['monthly_bill_ars'], data['goal'], data['target'])
+    except Exception as e:
+        return Response({
+            'error': f'Error al buscar el objetivo: {str(e)}',
+            'success': False
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    goal = {'goal': data['goal'], 'target': float(data['target'])}
+    if simulation is None:
+        return Response({
+            'goal': goal,
+            'error': 'Ninguna cantidad de paneles dentro de los límites alcanza el objetivo',
+            'success': False
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    
+    return Response({
+        'goal': goal,
+        'simulation': SimulationResultSerializer(simulation).data,
+        'capacity_check': calculator.get_project_capacity_check(simulation.installed_power_kw),
+        'success': True
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+def sensitivity_sweep_view(request):
+    """
+    API view to evaluate a project over ranges of energy price, exchange rate
+    and panel count without touching the stored prices.
+    
+    JSON responses hold each column flattened in C order with the grid shape.
+    With format=binary the body is little-endian float32: the three axes
+    followed by every column in X-Sweep-Columns order, each of X-Sweep-Shape.
+    JSON sweeps of more than SIMULATION_JOB_SYNC_MAX_CELLS cells are queued
+    as a job (202) whose results are one row per energy price and exchange rate.
+    """
+    serializer = SensitivitySweepSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response({
+            'errors': serializer.errors,
+            'success': False
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    project = get_object_or_404(SolarProject, id=data['project_id'])
+    calculator = SolarInvestmentCalculator(project, None)
+    
+    energy_prices, exchange_rates, panel_counts = sweep_axes(calculator, data)
+    shape = (len(energy_prices), len(exchange_rates), len(panel_counts))
+    
+    if shape[0] * shape[1] * shape[2] > SWEEP_MAX_CELLS:
+        return Response({
+            'error': f'La grilla excede el máximo de {SWEEP_MAX_CELLS} combinaciones',
+            'success': False
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not (energy_prices > 0).all() or not (exchange_rates > 0).all():
+        return Response({
+            'error': 'El precio de la energía y el tipo de cambio deben ser mayores a 0',
+            'success': False
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if data['format'] == 'json' and shape[0] * shape[1] * shape[2] > sync_max_cells():
+        return _job_response(request, 'sweep', data, shape[0] * shape[1])
+    
+    columns = calculator.sensitivity_sweep(
+        energy_prices, exchange_rates, panel_counts,
+        monthly_bill_ars=data.get('monthly_bill_ars')
+    )
+    column_names = sweep_column_names(data)
+    
+    if data['format'] == 'binary':
+        blocks = [energy_prices, exchange_rates, panel_counts] + [
+            np.broadcast_to(columns[column_name], shape) for column_name in column_names
+        ]
+        response = HttpResponse(
+            b''.join(np.ascontiguousarray(block, dtype='<f4').tobytes() for block in blocks),
+            content_type='application/octet-stream'
+        )
+        response['X-Sweep-Shape'] = ','.join(str(size) for size in shape)
+        response['X-Sweep-Columns'] = ','.join(column_names)
+        response['X-Pricing-Version'] = calculator.pricing.version
+        return response
+    
+    return Response({
+        'pricing_version': calculator.pricing.version,
+        'axes': {
+            'energy_price_ars_per_kwh': energy_prices.round(2).tolist(),
+            'exchange_rate': exchange_rates.round(2).tolist(),
+            'number_of_panels': panel_counts.astype(int).tolist(),
+        },
+        'shape': list(shape),
+        'columns': {
+            column_name: np.broadcast_to(columns[column_name], shape).round(2).ravel().tolist()
+            for column_name in column_names
+        },
+        'success': True
+    }, status=status.HTTP_200_OK)
+
+
+def _job_for(request, job_id):
+    """A job of the authenticated user"""
+    return get_object_or_404(SimulationJob, id=job_id, user=request.user)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def simulation_job_view(request, job_id):
+    """
+    API view to poll the status and progress of a queued comparison, sweep or risk simulation
+    """
+    job = _job_for(request, job_id)
+    return Response({
+        'job': SimulationJobSerializer(job).data,
+        'success': True
+    }, status=status.HTTP_200_OK)
+
+
+class SimulationJobResultPagination(PageNumberPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class SimulationJobResultsView(generics.ListAPIView):
+    """
+    API view to page through the results of a job, in order. Results are
+    stored as they are computed, so a running job already has the first ones.
+    """
+    serializer_class = SimulationJobResultSerializer
+    pagination_class = SimulationJobResultPagination
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        job = _job_for(self.request, self.kwargs['job_id'])
+        return job.results.order_by('index')
+
+
 class SimulationDetailView(generics.RetrieveAPIView):
     """
     API view to retrieve a specific simulation by ID (only for the owner)
@@ -319,6 +811,61 @@ class SimulationDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         # Solo simulaciones del usuario autenticado
         return InvestmentSimulation.objects.filter(user=self.request.user)
+    
+    def get_object(self):
+        simulation = super().get_object()
+        # A simulation opened on its own is likely to be opened again: keep
+        # the results of a compact one in its row
+        if getattr(settings, 'SIMULATION_MATERIALIZE_ON_READ', True):
+            materialize_results(simulation)
+        return simulation
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def simulation_as_of_view(request, id):
+    """
+    API view to re-evaluate a stored simulation (only for the owner) with the
+    energy price and exchange rate in force on ?date=YYYY-MM-DD, by default
+    the day it was created
+    """
+    simulation = get_object_or_404(
+        InvestmentSimulation.objects.select_related('project', 'tariff_category'),
+        id=id,
+        user=request.user
+    )
+    
+    as_of = simulation.created_at.date()
+    if request.query_params.get('date'):
+        try:
+            as_of = parse_date(request.query_params['date'])
+        except ValueError:
+            as_of = None
+        if as_of is None:
+            return Response({
+                'error': 'Fecha inválida, use el formato AAAA-MM-DD',
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    pricing = get_pricing_as_of(as_of)
+    calculator = SolarInvestmentCalculator(simulation.project, simulation.tariff_category, pricing=pricing)
+    
+    try:
+        result = calculator.resimulate(simulation)
+    except Exception as e:
+        return Response({
+            'error': f'Error al recalcular la simulación: {str(e)}',
+            'success': False
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'as_of': as_of.isoformat(),
+        'energy_price_ars_per_kwh': float(pricing.energy_price_ars_per_kwh),
+        'exchange_rate': float(pricing.exchange_rate),
+        'original': InvestmentSimulationSerializer(simulation).data,
+        'simulation': SimulationResultSerializer(result).data,
+        'success': True
+    }, status=status.HTTP_200_OK)
 
 
 class UserSimulationsView(generics.ListAPIView):
@@ -333,6 +880,98 @@ class UserSimulationsView(generics.ListAPIView):
         return InvestmentSimulation.objects.filter(user=self.request.user).select_related('project')
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_capacity_reservation_view(request):
+    """
+    API view to hold power of a project for the authenticated investor until
+    the hold is confirmed, released or expires (CAPACITY_RESERVATION_HOLD_SECONDS)
+    """
+    serializer = CapacityReservationInputSerializer(data=request.data)
+    
+    if not serializer.is_valid():
+        return Response({
+            'errors': serializer.errors,
+            'success': False
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    project = get_object_or_404(SolarProject, id=data['project_id'])
+    simulation = None
+    if data.get('simulation_id'):
+        simulation = get_object_or_404(
+            InvestmentSimulation, id=data['simulation_id'], user=request.user, project=project
+        )
+        power_kw = simulation.installed_power_kw
+    elif data.get('number_of_panels'):
+        power_kw = panels_power_kw(project, data['number_of_panels'])
+    else:
+        power_kw = data['power_kw']
+    
+    if not power_kw or power_kw <= 0:
+        return Response({
+            'error': 'La potencia a reservar debe ser mayor a 0',
+            'success': False
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        reservation = reserve_capacity(project, power_kw, user=request.user, simulation=simulation)
+    except CapacityUnavailable as e:
+        return Response({
+            'error': f'Capacidad insuficiente: {str(e)}',
+            'success': False
+        }, status=status.HTTP_409_CONFLICT)
+    
+    return Response({
+        'reservation': CapacityReservationSerializer(reservation).data,
+        'success': True
+    }, status=status.HTTP_201_CREATED)
+
+
+def _close_reservation(request, id, close, error):
+    reservation = get_object_or_404(CapacityReservation.objects.select_related('project'), id=id, user=request.user)
+    if not close(reservation):
+        reservation.refresh_from_db()
+        return Response({
+            'error': error,
+            'reservation': CapacityReservationSerializer(reservation).data,
+            'success': False
+        }, status=status.HTTP_409_CONFLICT)
+    return Response({
+        'reservation': CapacityReservationSerializer(reservation).data,
+        'success': True
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def confirm_capacity_reservation_view(request, id):
+    """
+    API view to turn a live hold of the authenticated user into a permanent allocation
+    """
+    return _close_reservation(request, id, confirm_reservation, 'La reserva ya no está vigente')
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def release_capacity_reservation_view(request, id):
+    """
+    API view to give back the power held by the authenticated user
+    """
+    return _close_reservation(request, id, release_reservation, 'La reserva ya no está retenida')
+
+
+class UserCapacityReservationsView(generics.ListAPIView):
+    """
+    API view to list the capacity reservations of the authenticated user
+    """
+    serializer_class = CapacityReservationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return CapacityReservation.objects.filter(user=self.request.user).select_related('project')
+
+
 @api_view(['GET'])
 def simulation_stats_view(request):
     """
@@ -341,20 +980,15 @@ def simulation_stats_view(request):
     try:
         total_simulations = InvestmentSimulation.objects.count()
         
-        # Average metrics
+        # Average metrics (compact simulations included, with their derived results)
         if total_simulations > 0:
-            from django.db.models import Avg
-            avg_investment = InvestmentSimulation.objects.aggregate(
-                avg=Avg('total_investment_usd')
-            )['avg'] or 0
-            
-            avg_payback = InvestmentSimulation.objects.aggregate(
-                avg=Avg('payback_period_years')
-            )['avg'] or 0
-            
-            avg_roi = InvestmentSimulation.objects.aggregate(
-                avg=Avg('roi_annual')
-            )['avg'] or 0
+            averages = result_averages(
+                InvestmentSimulation.objects.all(),
+                ['total_investment_usd', 'payback_period_years', 'roi_annual']
+            )
+            avg_investment = averages['total_investment_usd'] or 0
+            avg_payback = averages['payback_period_years'] or 0
+            avg_roi = averages['roi_annual'] or 0
         else:
             avg_investment = avg_payback = avg_roi = 0
         
@@ -371,4 +1005,17 @@ def simulation_stats_view(request):
         return Response(
             {'error': 'Error al obtener estadísticas'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def simulation_cache_stats_view(request):
+    """
+    API view with the counters of this worker's simulation result cache and
+    request coalescing
+    """
+    return Response({
+        'result_cache': simulation_results.stats(),
+        'coalescing': simulation_flights.stats(),
+        'success': True
+    }, status=status.HTTP_200_OK)
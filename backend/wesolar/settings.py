@@ -162,6 +162,81 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Cache generations (see simulations/caching.py): the pricing, price history
+# and engine profile generation tokens live on their own alias, which web
+# workers and management commands must all reach. Redis when REDIS_URL is set,
+# otherwise a table of the main database that each deploy creates with
+# `manage.py createcachetable`. The default cache (quote curves, shared
+# simulation results) stays in process memory unless Redis is available.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+        'generations': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'generations': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'wesolar_cache',
+        },
+    }
+PRICING_CACHE_ALIAS = 'generations'
+
+# Pricing cache: seconds between checks of the shared pricing generation key.
+# With a per-process generations backend (locmem, dummy) there is nothing to check,
+# and values are reloaded once they are PRICING_CACHE_MAX_AGE_SECONDS old.
+PRICING_CACHE_CHECK_SECONDS = config('PRICING_CACHE_CHECK_SECONDS', default=5, cast=int)
+PRICING_CACHE_MAX_AGE_SECONDS = config('PRICING_CACHE_MAX_AGE_SECONDS', default=300, cast=int)
+
+# Hourly generation and load profiles (see simulations/hourly.py)
+HOURLY_PROFILES_DIR = config('HOURLY_PROFILES_DIR', default=str(BASE_DIR / 'simulations' / 'hourly_profiles'))
+
+# Simulation storage (see simulations/storage.py): 'full' stores every result
+# column, 'compact' stores the inputs and a pricing snapshot id and derives the
+# results on read. Compact simulations opened individually are materialized.
+SIMULATION_STORAGE_MODE = config('SIMULATION_STORAGE_MODE', default='full')
+SIMULATION_MATERIALIZE_ON_READ = config('SIMULATION_MATERIALIZE_ON_READ', default=True, cast=bool)
+SIMULATION_DERIVATION_CACHE_SIZE = config('SIMULATION_DERIVATION_CACHE_SIZE', default=4096, cast=int)
+
+# Memoized simulation results (see simulations/result_cache.py): entries kept
+# per process (LRU) and, when shared, in CACHES for every worker
+SIMULATION_RESULT_CACHE_SIZE = config('SIMULATION_RESULT_CACHE_SIZE', default=2048, cast=int)
+SIMULATION_RESULT_CACHE_TIMEOUT = config('SIMULATION_RESULT_CACHE_TIMEOUT', default=3600, cast=int)
+SIMULATION_RESULT_CACHE_SHARED = config('SIMULATION_RESULT_CACHE_SHARED', default=True, cast=bool)
+
+# Seconds a request waits for an identical in-flight computation (see
+# simulations/coalescing.py) before computing on its own
+SIMULATION_COALESCING_TIMEOUT = config('SIMULATION_COALESCING_TIMEOUT', default=30, cast=float)
+
+# Simulation jobs (see simulations/jobs.py): comparisons and JSON sweeps larger
+# than these are queued for `manage.py run_simulation_jobs` instead of being
+# computed in the request
+SIMULATION_JOB_SYNC_MAX_SCENARIOS = config('SIMULATION_JOB_SYNC_MAX_SCENARIOS', default=500, cast=int)
+SIMULATION_JOB_SYNC_MAX_CELLS = config('SIMULATION_JOB_SYNC_MAX_CELLS', default=250000, cast=int)
+# Monte Carlo risk simulations with more paths than this are queued as well
+SIMULATION_RISK_SYNC_MAX_PATHS = config('SIMULATION_RISK_SYNC_MAX_PATHS', default=50000, cast=int)
+# Running jobs without a heartbeat for this long go back to the queue
+SIMULATION_JOB_STALE_SECONDS = config('SIMULATION_JOB_STALE_SECONDS', default=300, cast=int)
+SIMULATION_JOB_RETENTION_DAYS = config('SIMULATION_JOB_RETENTION_DAYS', default=7, cast=int)
+
+# Capacity reservations (see simulations/reservations.py): holds are taken from
+# per-project shards refilled from SolarProject.available_power in chunks, and
+# `manage.py sweep_capacity_reservations` expires holds and returns idle shards
+CAPACITY_RESERVATION_HOLD_SECONDS = config('CAPACITY_RESERVATION_HOLD_SECONDS', default=900, cast=int)
+CAPACITY_RESERVATION_SHARDS = config('CAPACITY_RESERVATION_SHARDS', default=8, cast=int)
+CAPACITY_SHARD_REFILL_KW = config('CAPACITY_SHARD_REFILL_KW', default=10, cast=float)
+CAPACITY_SHARD_IDLE_SECONDS = config('CAPACITY_SHARD_IDLE_SECONDS', default=60, cast=int)
+
 # API Documentation
 SPECTACULAR_SETTINGS = {
     'TITLE': 'WeSolar API',
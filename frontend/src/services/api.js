@@ -138,10 +138,18 @@ export const api = {
     return apiClient.post('/simulations/compare/', data);
   },
   
+  simulateHourly: (data) => {
+    return apiClient.post('/simulations/hourly/', data);
+  },
+  
   getSimulation: (id) => {
     return apiClient.get(`/simulations/${id}/`);
   },
   
+  getSimulationAsOf: (id, date) => {
+    return apiClient.get(`/simulations/${id}/as-of/`, { params: date ? { date } : {} });
+  },
+  
   getUserSimulations: () => {
     return apiClient.get('/simulations/user/');
   },
@@ -168,6 +176,10 @@ export const api = {
     return apiClient.post('/calculate-limits/', data);
   },
   
+  getQuoteCurve: (projectId, params = {}) => {
+    return apiClient.get(`/quote-curve/${projectId}/`, { params });
+  },
+  
   // Core endpoints
   getSiteSettings: () => {
     return apiClient.get('/settings/');